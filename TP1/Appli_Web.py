@@ -1,7 +1,22 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 #On importe l'APIRouter qui se trouve dans le fichier routes.py se trouvant dans le dossier routes 
 from routes.routes import router as library_routes
+#On importe le middleware qui mesure chaque requête (durée, taille de la réponse), exposé par /metrics
+from catalogue.metriques import MiddlewareMetriques
+#On importe le middleware qui compresse les réponses
+from catalogue.compression import MiddlewareCompression
+#On importe l'erreur levée quand toutes les connexions SQLite du worker restent occupées
+from catalogue.sqlite import PoolSature
 #Application du nom Library
 app = FastAPI(title="Library")
 #On inclut le routeur provenant de l'importation faite plus tôt, ainsi on peut utiliser nos routes(endpoint) crées
-app.include_router(library_routes) 
\ No newline at end of file
+app.include_router(library_routes)
+#Worker saturé (aucune connexion SQLite libre dans le délai) : réponse 503, le client peut réessayer un peu plus tard
+@app.exception_handler(PoolSature)
+async def pool_sature_handler(request, exc: PoolSature):
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+#Compresse les réponses (gzip, ou brotli s'il est installé) selon l'en-tête Accept-Encoding du client
+app.add_middleware(MiddlewareCompression)
+#Mesure chaque requête (voir la route /metrics), taille compressée comprise
+app.add_middleware(MiddlewareMetriques) 
\ No newline at end of file
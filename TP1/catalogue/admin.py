@@ -0,0 +1,23 @@
+import os
+import secrets
+
+# Adresses des clients locaux, seuls autorisés sur les routes d'administration quand aucun jeton n'est configuré.
+# None : adresse inconnue (socket Unix, client dans le même processus comme le client de test de Starlette)
+HOTES_LOCAUX = ("127.0.0.1", "::1", "localhost", "testclient", None)
+
+
+def autorise(jeton: str | None, hote: str | None) -> bool:
+    """
+    Indique si une requête peut utiliser les routes d'administration (profil, sauvegarde, ...).
+
+    Si la variable d'environnement LIVRES_ADMIN_JETON est définie, la requête doit fournir ce jeton (en-tête
+    X-Admin-Jeton) ; sinon, seules les requêtes venant de la machine elle-même sont acceptées.
+
+    Args:
+        jeton (str | None): Le jeton fourni par la requête.
+        hote (str | None): L'adresse du client.
+    """
+    attendu = os.environ.get("LIVRES_ADMIN_JETON")
+    if attendu:
+        return jeton is not None and secrets.compare_digest(jeton.encode(), attendu.encode())
+    return hote in HOTES_LOCAUX
@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+
+
+class CacheVersionne:
+    """
+    Cache LRU (le moins récemment utilisé est évincé en premier), borné en nombre d'entrées et en octets,
+    dont tout le contenu correspond à une même version du catalogue (voir Catalogue.version).
+
+    Dès qu'une version plus récente est demandée ou enregistrée, le cache est vidé : une réponse mise en cache
+    n'est donc jamais servie après une modification du catalogue, sans que les routes d'écriture aient à s'en occuper.
+    """
+
+    def __init__(self, taille_max: int = 256, octets_max: int = 32 * 1024 * 1024):
+        """
+        Args:
+            taille_max (int): Le nombre maximal d'entrées.
+            octets_max (int): La taille totale maximale des valeurs, en octets.
+        """
+        self.taille_max = taille_max
+        self.octets_max = octets_max
+        self.version = None
+        self.octets = 0
+        # Statistiques (lues par les métriques)
+        self.succes = 0
+        self.echecs = 0
+        self._entrees = OrderedDict()  # cle -> (valeur, taille)
+        self._verrou = threading.Lock()
+
+    def _changer_version(self, version) -> bool:
+        # Appelée avec le verrou pris : vide le cache si la version est plus récente ; False si elle est périmée
+        if self.version is not None and version < self.version:
+            return False
+        if version != self.version:
+            self._entrees.clear()
+            self.octets = 0
+            self.version = version
+        return True
+
+    def get(self, cle, version):
+        """
+        Returns:
+            La valeur enregistrée sous `cle` pour cette version du catalogue, ou None.
+        """
+        with self._verrou:
+            entree = self._entrees.get(cle) if self._changer_version(version) else None
+            if entree is None:
+                self.echecs += 1
+                return None
+            self._entrees.move_to_end(cle)
+            self.succes += 1
+            return entree[0]
+
+    def put(self, cle, version, valeur, taille: int | None = None) -> None:
+        """
+        Enregistre une valeur calculée pour une version du catalogue. Une valeur calculée pour une version
+        déjà dépassée (écriture concurrente pendant le calcul) est ignorée.
+
+        Args:
+            taille (int | None): La taille de la valeur en octets (par défaut, len(valeur)).
+        """
+        taille = len(valeur) if taille is None else taille
+        if taille > self.octets_max:
+            return
+        with self._verrou:
+            if not self._changer_version(version):
+                return
+            ancienne = self._entrees.pop(cle, None)
+            if ancienne is not None:
+                self.octets -= ancienne[1]
+            self._entrees[cle] = (valeur, taille)
+            self.octets += taille
+            while len(self._entrees) > self.taille_max or self.octets > self.octets_max:
+                _, (_, taille_evincee) = self._entrees.popitem(last=False)
+                self.octets -= taille_evincee
+
+    def __len__(self) -> int:
+        return len(self._entrees)
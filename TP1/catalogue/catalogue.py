@@ -0,0 +1,535 @@
+import os
+import secrets
+import threading
+import time
+from collections.abc import MutableMapping
+
+from .changements import FluxChangements
+from .encodage import CacheJson
+from .index import IndexValeur
+from .instantane import chemin_instantane, ecrire_instantane
+from .metriques import DUREE_CATALOGUE, chronometrer
+from .pagination import CHAMPS_TRI, IndexTrie, Page, cle_tri, decoder_curseur, encoder_curseur, tranche
+from .recherche import IndexTexte
+from .verrous import VerrousRepartis
+
+# Champs sur lesquels on peut filtrer la liste des livres
+CHAMPS_FILTRE = ("auteur", "editeur")
+# Les ID sont des entiers signés sur 64 bits (instantané, SQLite) : tout ID plus grand est refusé
+ID_MAX = 2 ** 63 - 1
+
+
+def verifier_id(id: int) -> None:
+    """
+    Raises:
+        ValueError: Si l'ID n'est pas un entier entre 1 et ID_MAX.
+    """
+    if not isinstance(id, int) or isinstance(id, bool) or not 1 <= id <= ID_MAX:
+        raise ValueError(f"L'ID doit être un entier compris entre 1 et {ID_MAX}.")
+
+
+def _raison_refus(op: str, id: int) -> str:
+    # Message d'erreur d'une opération de lot impossible (livre déjà existant ou introuvable)
+    if op == "ajouter":
+        return f"Le livre avec l'ID {id} existe déjà !"
+    return f"Le livre {id} n'existe pas."
+
+
+class Catalogue(MutableMapping):
+    """
+    Catalogue de livres se comportant comme un dictionnaire {id: livre}.
+
+    Les routes continuent d'utiliser `liste_livres[id]`, `id in liste_livres`, `del liste_livres[id]`, etc.
+    mais chaque lecture et écriture est déléguée à un stockage interchangeable (mémoire, journal, ...).
+
+    Les structures dérivées (index triés, ...) s'abonnent au catalogue comme observateurs : chaque
+    modification leur est transmise sous la forme mettre_a_jour(id, ancien, nouveau), et chaque lot
+    de modifications sous la forme appliquer_lot([(id, ancien, nouveau), ...]).
+
+    Un stockage `partage` (SQLite) peut être modifié par d'autres processus, que ces observateurs ne verraient pas :
+    les requêtes lui sont alors confiées directement.
+
+    Les écritures sur un même livre sont sérialisées par un verrou propre à cet ID (voir VerrousRepartis) : la lecture
+    de l'ancienne valeur, l'écriture et la notification des observateurs forment un tout, sinon deux modifications
+    concurrentes d'un même livre laisseraient des entrées périmées dans les index. Les écritures sur des livres
+    différents avancent en parallèle (le stockage et chaque observateur ne se verrouillent que le temps de leur
+    propre mise à jour), et les lectures ne prennent aucun de ces verrous.
+
+    Chaque modification incrémente la version du catalogue (voir version), qui sert à invalider les caches,
+    et la version du livre modifié (voir etat_livre), qui sert aux requêtes conditionnelles (ETag).
+    """
+
+    def __init__(self, stockage, dossier_sauvegardes: str | None = None):
+        """
+        Args:
+            stockage: Le stockage sous-jacent (voir catalogue.stockage).
+            dossier_sauvegardes (str | None): Le dossier des sauvegardes (voir sauvegarder).
+        """
+        self.stockage = stockage
+        self.dossier_sauvegardes = dossier_sauvegardes
+        self.partage = getattr(stockage, "partage", False)
+        self._verrous = VerrousRepartis()
+        # Protège seulement le compteur de versions, partagé par toutes les écritures
+        self._verrou_version = threading.Lock()
+        self.observateurs = []
+        # Les versions d'un catalogue non partagé repartent de 0 à chaque démarrage : l'époque (aléatoire)
+        # distingue les versions de deux démarrages successifs
+        self.epoque = secrets.token_hex(4)
+        self._version = 0
+        self._modifie = time.time()
+        # Version et instant de la dernière modification des livres modifiés depuis le démarrage ;
+        # les autres livres ont la version de base (celle du chargement ou de la dernière réécriture complète)
+        self._versions = {}
+        self._base = (0, self._modifie)
+        # Index triés servant à la pagination, un par champ de tri. Le tri par ID n'a pas besoin d'index :
+        # le stockage parcourt directement ses ID triés, sans lire les livres (voir tranche_ids)
+        self.tris = {champ: IndexTrie(champ) for champ in CHAMPS_TRI if champ != "id"}
+        self.observateurs.extend(self.tris.values())
+        # Index secondaires servant aux filtres (auteur -> ID, editeur -> ID)
+        self.index = {champ: IndexValeur(champ) for champ in CHAMPS_FILTRE}
+        self.observateurs.extend(self.index.values())
+        # Index inversé pour la recherche plein texte (nom, auteur, editeur)
+        self.texte = IndexTexte()
+        self.observateurs.append(self.texte)
+        # Encodage JSON de chaque livre, réutilisé par les réponses JSON (voir encoder_livres)
+        self.json = CacheJson(lambda: self._version, self.partage,
+                              version_livre=lambda id: self._versions.get(id, self._base)[0])
+        self.observateurs.append(self.json)
+        # Flux des changements (voir FluxChangements), lu dans la base avec un stockage partagé
+        self.changements = FluxChangements(stockage if self.partage else None)
+        self.observateurs.append(self.changements)
+
+    @property
+    def version(self) -> int:
+        """
+        Numéro croissant, modifié à chaque écriture dans le catalogue. Deux lectures qui obtiennent la même version
+        voient le même contenu : une réponse calculée pour une version reste valable tant que la version n'a pas changé.
+
+        Avec un stockage partagé, la version est tenue par le stockage lui-même (écritures de tous les workers).
+        """
+        if self.partage:
+            return self.stockage.version()
+        return self._version
+
+    def etat(self) -> tuple[str, int, float]:
+        """
+        Returns:
+            tuple[str, int, float]: L'époque, la version du catalogue et l'instant de sa dernière modification
+                (secondes depuis le 1er janvier 1970). Le couple (époque, version) identifie le contenu du catalogue.
+        """
+        if self.partage:
+            return self.stockage.etat()
+        return self.epoque, self._version, self._modifie
+
+    def etat_livre(self, id: int) -> tuple[str, int, float] | None:
+        """
+        Returns:
+            tuple[str, int, float] | None: L'époque, la version du catalogue lors de la dernière modification du livre
+                et l'instant de cette modification, ou None si le livre n'existe pas. Sans lire ni décoder le livre lui-même.
+        """
+        if self.partage:
+            return self.stockage.etat_livre(id)
+        if not self.stockage.contient(id):
+            return None
+        return (self.epoque, *self._versions.get(id, self._base))
+
+    @chronometrer(DUREE_CATALOGUE, "encoder")
+    def encoder_livres(self, livres, version) -> bytes:
+        """
+        Encode une liste de livres en JSON en mettant bout à bout l'encodage de chaque livre, gardé en mémoire
+        tant que le livre n'est pas modifié : seuls les livres encore jamais encodés (ou modifiés) sont encodés.
+
+        Args:
+            livres: Les livres, lus dans le catalogue.
+            version: La version du catalogue lue avant les livres (voir version).
+
+        Returns:
+            bytes: Le tableau JSON des livres.
+        """
+        return b"[" + b",".join(self.json.morceaux(livres, version)) + b"]"
+
+    def encoder_livre(self, livre: dict, version) -> bytes:
+        """
+        Returns:
+            bytes: L'encodage JSON d'un livre lu dans le catalogue (voir encoder_livres).
+        """
+        return self.json.morceaux((livre,), version)[0]
+
+    def _nouvelle_version(self, changements: list) -> None:
+        # Appelée sous les verrous des livres modifiés, pour une modification ou un lot : (id, ancien, nouveau)
+        with self._verrou_version:
+            self._version += 1
+            self._modifie = time.time()
+            for id, _, nouveau in changements:
+                if nouveau is None:
+                    self._versions.pop(id, None)
+                else:
+                    self._versions[id] = (self._version, self._modifie)
+
+    def _notifier(self, id: int, ancien: dict | None, nouveau: dict | None) -> None:
+        # Transmet la modification à chaque structure dérivée
+        self._nouvelle_version([(id, ancien, nouveau)])
+        for observateur in self.observateurs:
+            observateur.mettre_a_jour(id, ancien, nouveau)
+
+    @chronometrer(DUREE_CATALOGUE, "lire")
+    def __getitem__(self, id: int) -> dict:
+        livre = self.stockage.get(id)
+        if livre is None:
+            raise KeyError(id)
+        return livre
+
+    @chronometrer(DUREE_CATALOGUE, "lire_plusieurs")
+    def lire_plusieurs(self, ids: list[int]) -> tuple[list[dict], list[int]]:
+        """
+        Lit plusieurs livres en une fois (une seule requête avec SQLite), dans l'ordre des ID demandés.
+        Un ID demandé plusieurs fois n'est lu et renvoyé qu'une fois, à sa première position.
+
+        Args:
+            ids (list[int]): Les ID des livres à lire.
+
+        Returns:
+            tuple[list[dict], list[int]]: Les livres trouvés et les ID introuvables, chacun dans l'ordre de la demande.
+        """
+        ids = list(dict.fromkeys(ids))
+        trouves = self.stockage.get_plusieurs(ids)
+        return [trouves[id] for id in ids if id in trouves], [id for id in ids if id not in trouves]
+
+    def __setitem__(self, id: int, livre: dict) -> None:
+        # On distingue l'ajout de la modification pour que le stockage puisse les traiter différemment
+        verifier_id(id)
+        with self._verrous.pour(id):
+            ancien = self.stockage.get(id)
+            try:
+                if ancien is not None:
+                    self.stockage.modifier(id, livre)
+                else:
+                    self.stockage.ajouter(id, livre)
+            except KeyError:
+                # Livre supprimé entre-temps par un autre worker (stockage partagé) : il est ajouté à nouveau
+                ancien = None
+                self.stockage.ajouter(id, livre)
+            self._notifier(id, ancien, livre)
+
+    def __delitem__(self, id: int) -> None:
+        self.pop(id)
+
+    def pop(self, id: int, *defaut):
+        """
+        Supprime un livre et le renvoie, en une seule opération : deux suppressions concurrentes du même livre
+        ne peuvent pas réussir toutes les deux.
+
+        Raises:
+            KeyError: Si le livre n'existe pas et qu'aucune valeur par défaut n'est donnée.
+        """
+        with self._verrous.pour(id):
+            ancien = self.stockage.get(id)
+            if ancien is None:
+                if defaut:
+                    return defaut[0]
+                raise KeyError(id)
+            self.stockage.supprimer(id)
+            self._notifier(id, ancien, None)
+            return ancien
+
+    def modifier(self, id: int, livre: dict) -> None:
+        """
+        Modifie un livre existant sans jamais le recréer (contrairement à `catalogue[id] = livre`) : une modification
+        concurrente d'une suppression échoue au lieu de faire réapparaître le livre.
+
+        Raises:
+            KeyError: Si le livre n'existe pas.
+        """
+        verifier_id(id)
+        with self._verrous.pour(id):
+            ancien = self.stockage.get(id)
+            if ancien is None:
+                raise KeyError(id)
+            self.stockage.modifier(id, livre)
+            self._notifier(id, ancien, livre)
+
+    def __contains__(self, id: object) -> bool:
+        return self.stockage.contient(id)
+
+    def __iter__(self):
+        return self.stockage.ids()
+
+    def __len__(self) -> int:
+        return self.stockage.compter()
+
+    def figer(self):
+        """
+        Fige la version actuelle du catalogue, pour les lectures qui parcourent tout le catalogue : le cliché ne voit
+        aucune des écritures suivantes, qui ne l'attendent pas (voir stockage.Cliche, sqlite.ClicheSQLite).
+        À libérer après usage, par un bloc `with`.
+
+        Returns:
+            Cliche | ClicheSQLite: Une vue en lecture seule {id: livre}, avec lister et lister_par_lots.
+        """
+        return self.stockage.figer()
+
+    def preparer_recherche(self) -> None:
+        """
+        Construit l'index de la recherche plein texte dans un thread (voir IndexTexte.construire), pour que la première
+        recherche n'ait pas à le faire : la construction prend plusieurs secondes pour 200 000 livres. Sans effet avec
+        un stockage partagé, dont la base a son propre index (FTS5).
+        """
+        if not self.partage:
+            self.texte.construire_en_arriere_plan(self.figer)
+
+    def lots(self, taille: int = 500):
+        """
+        Parcourt tout le catalogue par lots de `taille` livres au plus, dans un cliché (voir figer) : même long, le
+        parcours voit le catalogue tel qu'il était à son début. Le cliché est libéré à la fin du parcours, ou quand
+        le générateur est fermé.
+
+        Yields:
+            list[dict]: Des lots de livres.
+        """
+        with self.figer() as cliche:
+            for lot in cliche.lister_par_lots(taille):
+                yield [livre for _, livre in lot]
+
+    def allouer_id(self) -> int:
+        """
+        Attribue un nouvel ID, jamais utilisé jusque-là, sans parcourir le catalogue.
+
+        L'allocation est faite par le stockage : avec SQLite, le compteur est dans la base et deux workers
+        ne reçoivent jamais le même ID.
+
+        Returns:
+            int: Un ID strictement supérieur à tous les ID déjà attribués.
+        """
+        return self.stockage.allouer_id()
+
+    def ajouter(self, id: int, livre: dict) -> None:
+        """
+        Ajoute un livre sans jamais écraser un livre existant (contrairement à `catalogue[id] = livre`).
+
+        Raises:
+            ValueError: Si un livre avec cet ID existe déjà, y compris s'il vient d'être ajouté par un autre worker,
+                ou si l'ID est invalide (voir verifier_id).
+        """
+        verifier_id(id)
+        with self._verrous.pour(id):
+            self.stockage.ajouter(id, livre)
+            self._notifier(id, None, livre)
+
+    def items(self):
+        # Un seul parcours du stockage au lieu d'une lecture par ID, dans un cliché : jamais à moitié modifié
+        with self.figer() as cliche:
+            return list(cliche.lister())
+
+    def values(self):
+        with self.figer() as cliche:
+            return [livre for _, livre in cliche.lister()]
+
+    def appliquer_lot(self, operations: list) -> list[tuple[int, str]]:
+        """
+        Applique un lot d'opérations de façon atomique, puis met à jour les index une seule fois pour tout le lot.
+
+        L'existence des livres est vérifiée ici, sous les verrous des livres du lot (ou dans la transaction SQLite), au moment
+        même de l'application : un ajout ne peut pas écraser un livre ajouté entre-temps par une autre requête.
+        Les opérations impossibles sont écartées et signalées, les autres sont appliquées.
+
+        Args:
+            operations (list): Des triplets (op, id, livre), op valant "ajouter", "modifier" ou "supprimer"
+                (livre vaut None pour une suppression). Le contenu des livres doit avoir été validé au préalable.
+
+        Returns:
+            list[tuple[int, str]]: Les opérations refusées : leur position dans `operations` et la raison du refus.
+        """
+        if not operations:
+            return []
+        invalides = []
+        for position, (_, id, _) in enumerate(operations):
+            try:
+                verifier_id(id)
+            except ValueError as e:
+                invalides.append((position, str(e)))
+        if invalides:
+            # Un ID hors limites ne doit jamais atteindre le journal ni la base
+            exclues = {position for position, _ in invalides}
+            positions = [position for position in range(len(operations)) if position not in exclues]
+            refusees = self.appliquer_lot([operations[position] for position in positions])
+            return sorted(invalides + [(positions[position], raison) for position, raison in refusees])
+        with self._verrous.plusieurs(id for _, id, _ in operations):
+            if self.partage:
+                # Vérification dans la transaction elle-même : elle tient compte des écritures des autres workers
+                refusees = self.stockage.appliquer_lot(operations)
+                return [(position, _raison_refus(*operations[position][:2])) for position in refusees]
+            # État de chaque livre avant son opération, en tenant compte des opérations précédentes du même lot
+            courants = {}
+            acceptees, changements, refusees = [], [], []
+            for position, (op, id, livre) in enumerate(operations):
+                ancien = courants[id] if id in courants else self.stockage.get(id)
+                if (op == "ajouter") != (ancien is None):
+                    refusees.append((position, _raison_refus(op, id)))
+                    continue
+                courants[id] = livre
+                acceptees.append((op, id, livre))
+                changements.append((id, ancien, livre))
+            if acceptees:
+                self.stockage.appliquer_lot(acceptees)
+                self._nouvelle_version(changements)
+                for observateur in self.observateurs:
+                    observateur.appliquer_lot(changements)
+            return refusees
+
+    def exclusif(self):
+        """
+        Bloque toutes les autres écritures de ce processus pour la durée d'un bloc `with`, par exemple pour lire tout
+        le catalogue puis le réécrire (remplacer_tout) sans perdre une modification faite entre les deux.
+        Les lectures ne sont pas bloquées.
+        """
+        return self._verrous.tous()
+
+    def remplacer_tout(self, livres: dict) -> None:
+        """
+        Remplace le contenu complet du catalogue en une seule opération.
+
+        Args:
+            livres (dict): Le nouveau contenu, indexé par l'ID du livre.
+        """
+        with self._verrous.tous():
+            self.stockage.remplacer(livres)
+            self._nouvelle_version([])
+            self._versions.clear()
+            self._base = (self._version, self._modifie)
+            for observateur in self.observateurs:
+                observateur.reinitialiser()
+
+    def filtrer(self, filtres: dict) -> set:
+        """
+        Renvoie les ID des livres correspondant à tous les filtres, en O(nombre de résultats).
+
+        Args:
+            filtres (dict): Les valeurs recherchées par champ, par exemple {"auteur": "Albert Camus"}.
+
+        Returns:
+            set: Les ID des livres correspondants.
+
+        Raises:
+            ValueError: Si un champ n'est pas filtrable.
+        """
+        if self.partage:
+            # Requête sur les index des filtres de la base, à jour des écritures de tous les workers
+            return self.stockage.filtrer(filtres) if filtres else set(self)
+        ensembles = []
+        for champ, valeur in filtres.items():
+            if champ not in self.index:
+                raise ValueError(f"Filtre inconnu : {champ!r}")
+            self.index[champ].construire(self.stockage.lister())
+            ensembles.append(self.index[champ].chercher(valeur))
+        if not ensembles:
+            return set(self)
+        # On part du plus petit ensemble pour que l'intersection reste proportionnelle aux résultats
+        ensembles.sort(key=len)
+        return ensembles[0].intersection(*ensembles[1:])
+
+    @chronometrer(DUREE_CATALOGUE, "rechercher")
+    def rechercher(self, requete: str, limite: int = 20) -> list[tuple[dict, float]]:
+        """
+        Recherche plein texte dans le nom, l'auteur et l'éditeur des livres (voir IndexTexte).
+
+        Args:
+            requete (str): Les mots recherchés ; le dernier peut être un début de mot.
+            limite (int): Le nombre maximal de résultats.
+
+        Returns:
+            list[tuple[dict, float]]: Les livres trouvés avec leur score, du plus pertinent au moins pertinent.
+        """
+        if self.partage:
+            return self.stockage.rechercher(requete, limite)
+        self.texte.attendre(self.figer)
+        resultats = ((self.stockage.get(id), score) for id, score in self.texte.chercher(requete, limite))
+        return [(livre, score) for livre, score in resultats if livre is not None]
+
+    @chronometrer(DUREE_CATALOGUE, "page")
+    def page(self, tri: str = "id", limite: int = 50, curseur: str | None = None, filtres: dict | None = None) -> Page:
+        """
+        Renvoie une page de livres triés, par pagination sur curseur (keyset).
+
+        Le curseur désigne la clé de tri du dernier (ou du premier) livre de la page voisine :
+        contrairement à un décalage (offset), il reste valide quand des livres sont ajoutés ou supprimés.
+        Le coût est O(log n + taille de la page).
+
+        Args:
+            tri (str): Le champ de tri (voir CHAMPS_TRI). Ignoré si un curseur est fourni.
+            limite (int): Le nombre maximal de livres dans la page.
+            curseur (str | None): Le curseur renvoyé par une page précédente, ou None pour la première page.
+            filtres (dict | None): Les filtres à appliquer (voir filtrer) ; seuls les livres correspondants sont triés.
+
+        Returns:
+            Page: Les livres de la page et les curseurs des pages suivante et précédente.
+
+        Raises:
+            ValueError: Si le champ de tri, le filtre ou le curseur est invalide.
+        """
+        cle, direction = None, "suivant"
+        if curseur is not None:
+            tri, cle, direction = decoder_curseur(curseur)
+        if tri not in CHAMPS_TRI:
+            raise ValueError(f"Tri inconnu : {tri!r}")
+        if self.partage:
+            # La base est la seule source à jour : la page est lue par une requête sur les index SQL (tri et filtres)
+            rang, total, lignes = self.stockage.tranche(tri, cle, limite, direction, filtres)
+            cles = [cle_tri(tri, id, livre) for id, livre in lignes]
+            livres = [livre for _, livre in lignes]
+        elif filtres:
+            # Avec des filtres, on ne trie que les livres correspondants : O(m log m) pour m résultats
+            trouves = ((id, self.stockage.get(id)) for id in self.filtrer(filtres))
+            cles_triees = sorted(cle_tri(tri, id, livre) for id, livre in trouves if livre is not None)
+            rang, cles = tranche(cles_triees, cle, limite, direction)
+            total = len(cles_triees)
+        elif tri == "id":
+            # Lecture directe des ID triés du stockage : rien n'est décodé (instantané projeté en mémoire)
+            rang, ids = self.stockage.tranche_ids(cle[0] if cle else None, limite, direction)
+            cles = [(id,) for id in ids]
+            total = len(self)
+        else:
+            index = self.tris[tri]
+            index.construire(self.stockage.lister())
+            rang, cles = index.tranche(cle, limite, direction)
+            total = len(index)
+        if not self.partage:
+            livres = [livre for livre in (self.stockage.get(cle[-1]) for cle in cles) if livre is not None]
+        page = Page(livres=livres, rang=rang, total=total)
+        if cles and rang + len(cles) < total:
+            page.suivant = encoder_curseur(tri, cles[-1], "suivant")
+        if cles and rang > 0:
+            page.precedent = encoder_curseur(tri, cles[0], "precedent")
+        return page
+
+    def sauvegarder(self) -> dict:
+        """
+        Écrit une sauvegarde cohérente du catalogue dans `dossier_sauvegardes`, sans interrompre les lectures ni
+        les écritures : un instantané (voir catalogue.instantane) écrit depuis un cliché, ou une copie de la base
+        SQLite faite par son API de sauvegarde. L'instantané peut être placé tel quel dans le dossier d'un stockage
+        journalisé (CATALOGUE_DOSSIER, sans journal), la copie de la base servir de CATALOGUE_SQLITE.
+
+        Returns:
+            dict: Le chemin de la sauvegarde et la version du catalogue qu'elle contient.
+
+        Raises:
+            ValueError: Si aucun dossier de sauvegarde n'est configuré.
+        """
+        if self.dossier_sauvegardes is None:
+            raise ValueError("Aucun dossier de sauvegarde n'est configuré.")
+        os.makedirs(self.dossier_sauvegardes, exist_ok=True)
+        if self.partage:
+            version = self.stockage.version()
+            chemin = os.path.join(self.dossier_sauvegardes, f"livres.{version}.{time.time_ns()}.db")
+            version = self.stockage.sauvegarder(chemin)
+        else:
+            with self.figer() as cliche:
+                version = cliche.version
+                chemin = chemin_instantane(self.dossier_sauvegardes, version)
+                ecrire_instantane(chemin, cliche, version, self.stockage.id_max())
+        return {"chemin": chemin, "version": version}
+
+    def fermer(self) -> None:
+        """
+        Ferme proprement le stockage (synchronisation des écritures en attente).
+        """
+        self.stockage.fermer()
@@ -0,0 +1,214 @@
+import asyncio
+import threading
+from collections import deque
+
+from .encodage import encoder
+
+# Nombre de changements gardés en mémoire pour les abonnés qui reprennent après une coupure
+TAILLE_TAMPON = 10_000
+# Intervalle (en secondes) entre deux lectures des changements faits par les autres workers (stockage partagé)
+INTERVALLE_PARTAGE = 0.2
+
+
+class Evenement:
+    """
+    Un changement du catalogue, encodé une seule fois, à la première lecture (personne n'écoute peut-être) :
+    tous les abonnés reçoivent ensuite les mêmes octets.
+    """
+
+    __slots__ = ("seq", "op", "id", "livre", "_json", "_sse")
+
+    def __init__(self, seq: int, op: str, id: int | None, livre: dict | None):
+        self.seq = seq
+        self.op = op
+        self.id = id
+        self.livre = livre
+        self._json = None
+        self._sse = None
+
+    @property
+    def json(self) -> bytes:
+        if self._json is None:
+            donnees = {"seq": self.seq, "op": self.op}
+            if self.id is not None:
+                donnees["id"] = self.id
+            if self.livre is not None:
+                donnees["livre"] = self.livre
+            self._json = encoder(donnees)
+        return self._json
+
+    @property
+    def sse(self) -> bytes:
+        # Trame Server-Sent Events : le champ id permet au client de reprendre (en-tête Last-Event-ID)
+        if self._sse is None:
+            self._sse = b"id: %d\nevent: %s\ndata: %s\n\n" % (self.seq, self.op.encode(), self.json)
+        return self._sse
+
+
+class FluxChangements:
+    """
+    Flux des changements du catalogue (ajout, modification, suppression), numérotés par un numéro de séquence croissant.
+
+    Les derniers changements sont gardés dans un tampon circulaire borné (deque) : un abonné peut reprendre à partir
+    du dernier numéro reçu tant que ce numéro est encore dans le tampon, sinon il est averti de la perte (et doit relire
+    le catalogue). Les abonnés attendent dans la boucle d'événements asyncio : une écriture (faite dans un thread) les
+    réveille tous d'un coup, puis chacun lit les mêmes objets Evenement dans le tampon, sans copie.
+
+    Sans stockage partagé, le flux est un observateur du catalogue, numéroté par son propre compteur.
+    Avec un stockage partagé (SQLite), les changements de tous les workers sont lus dans la base (table `changements`)
+    et numérotés par la version du catalogue : le même numéro désigne le même changement dans tous les workers.
+    """
+
+    def __init__(self, stockage=None, taille: int = TAILLE_TAMPON, intervalle: float = INTERVALLE_PARTAGE):
+        """
+        Args:
+            stockage: Le stockage partagé dont on lit les changements (None : changements transmis par le catalogue).
+            taille (int): Le nombre de changements gardés en mémoire.
+            intervalle (float): L'intervalle entre deux lectures des changements du stockage partagé.
+        """
+        self.stockage = stockage
+        self.taille = taille
+        self.intervalle = intervalle
+        self._tampon = deque(maxlen=taille)
+        self._verrou = threading.Lock()
+        self.sequence = 0  # Numéro du dernier changement
+        if stockage is not None:
+            self.sequence = stockage.version()
+            self._publier(self._lire_stockage(max(0, self.sequence - taille)))
+        # Nombre d'abonnés en attente (lu par les métriques)
+        self.abonnes = 0
+        self._boucle = None
+        self._reveil = None
+        self._reveil_prevu = False
+        self._surveillance = None
+
+    # Observateur du catalogue (voir Catalogue.observateurs)
+
+    def mettre_a_jour(self, id: int, ancien: dict | None, nouveau: dict | None) -> None:
+        self.appliquer_lot([(id, ancien, nouveau)])
+
+    def appliquer_lot(self, changements: list) -> None:
+        if self.stockage is None:
+            with self._verrou:
+                # Seuls les derniers changements d'un très gros lot tiennent dans le tampon : les autres sont seulement comptés
+                ignores = max(0, len(changements) - self.taille)
+                self.sequence += ignores
+                for id, ancien, nouveau in changements[ignores:]:
+                    op = "ajouter" if ancien is None else "supprimer" if nouveau is None else "modifier"
+                    self.sequence += 1
+                    self._tampon.append(Evenement(self.sequence, op, id, nouveau))
+        self._signaler()
+
+    def reinitialiser(self) -> None:
+        # Réécriture complète du catalogue : un seul événement, les abonnés doivent tout relire
+        if self.stockage is None:
+            with self._verrou:
+                self.sequence += 1
+                self._tampon.append(Evenement(self.sequence, "reinitialiser", None, None))
+        self._signaler()
+
+    # Lecture du tampon
+
+    def depuis(self, seq: int) -> tuple[list[Evenement], bool]:
+        """
+        Returns:
+            tuple[list[Evenement], bool]: Les changements postérieurs à `seq` encore dans le tampon, et True si des
+                changements ont été perdus (trop anciens, ou numéro inconnu de ce flux, par exemple après un redémarrage).
+        """
+        with self._verrou:
+            if seq > self.sequence:
+                # Avec un stockage partagé, le numéro peut venir d'un autre worker, plus à jour : on attend la suite
+                return [], self.stockage is None
+            if not self._tampon:
+                return [], seq < self.sequence
+            premier = self._tampon[0].seq
+            if seq < premier - 1:
+                return list(self._tampon), True
+            # Les numéros du tampon se suivent : accès direct, en partant de la fin (changements récents)
+            return [self._tampon[i] for i in range(seq - premier + 1, len(self._tampon))], False
+
+    async def attendre(self, seq: int, delai: float) -> tuple[list[Evenement], bool]:
+        """
+        Attend au plus `delai` secondes qu'un changement postérieur à `seq` soit disponible (voir depuis).
+        """
+        self._attacher()
+        fin = self._boucle.time() + delai
+        self.abonnes += 1
+        try:
+            while True:
+                # Le réveil est lu avant le tampon : un changement publié juste après la lecture le déclenchera
+                reveil = self._reveil
+                evenements, perte = self.depuis(seq)
+                restant = fin - self._boucle.time()
+                if evenements or perte or restant <= 0:
+                    return evenements, perte
+                try:
+                    await asyncio.wait_for(reveil.wait(), restant)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.abonnes -= 1
+
+    # Réveil des abonnés
+
+    def _attacher(self) -> None:
+        # Appelée dans la boucle d'événements : c'est elle que les écritures (dans d'autres threads) réveilleront
+        boucle = asyncio.get_running_loop()
+        if boucle is not self._boucle:
+            self._boucle = boucle
+            self._reveil = asyncio.Event()
+            self._reveil_prevu = False
+            self._surveillance = None
+        if self.stockage is not None and self._surveillance is None:
+            self._surveillance = boucle.create_task(self._surveiller())
+
+    def _signaler(self) -> None:
+        # Appelée depuis n'importe quel thread : un seul réveil programmé à la fois, quel que soit le nombre d'écritures
+        boucle = self._boucle
+        if boucle is None or self._reveil_prevu:
+            return
+        self._reveil_prevu = True
+        try:
+            boucle.call_soon_threadsafe(self._reveiller)
+        except RuntimeError:
+            # Boucle fermée (arrêt du serveur) : personne à réveiller
+            self._reveil_prevu = False
+
+    def _reveiller(self) -> None:
+        # Dans la boucle d'événements : réveille tous les abonnés en attente, les suivants attendront un nouvel Event
+        self._reveil_prevu = False
+        reveil, self._reveil = self._reveil, asyncio.Event()
+        reveil.set()
+
+    # Stockage partagé
+
+    def _lire_stockage(self, depuis: int) -> list[Evenement]:
+        return [Evenement(version, op, id, livre) for version, op, id, livre in self.stockage.changements_depuis(depuis, self.taille)]
+
+    def _publier(self, evenements: list[Evenement]) -> None:
+        with self._verrou:
+            if evenements and self._tampon and evenements[0].seq > self._tampon[-1].seq + 1:
+                # Changements supprimés de la base avant d'avoir été lus : la suite du tampon ne serait plus continue
+                self._tampon.clear()
+            self._tampon.extend(evenements)
+            if evenements:
+                self.sequence = evenements[-1].seq
+
+    async def _surveiller(self) -> None:
+        # Lit régulièrement les changements de tous les workers tant que quelqu'un écoute ce flux
+        boucle = self._boucle
+        while self._boucle is boucle:
+            version = await asyncio.to_thread(self.stockage.version)
+            if version > self.sequence:
+                self._publier(await asyncio.to_thread(self._lire_stockage, self.sequence))
+                self._reveiller()
+                continue
+            if self.abonnes == 0:
+                break
+            # Une écriture de ce worker réveille aussi la surveillance (voir _signaler) : inutile d'attendre l'intervalle
+            try:
+                await asyncio.wait_for(self._reveil.wait(), self.intervalle)
+            except asyncio.TimeoutError:
+                pass
+        if self._boucle is boucle:
+            self._surveillance = None
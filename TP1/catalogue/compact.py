@@ -0,0 +1,365 @@
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping, MutableMapping
+
+from .catalogue import Catalogue
+from .stockage import StockageMemoire
+
+# Champs d'un livre rangés dans les colonnes ; un livre ayant une autre forme est gardé tel quel
+CHAMPS = ("id", "nom", "auteur", "editeur")
+# Ligne d'un ID dont le livre n'est pas rangé dans les colonnes (voir Colonnes.autres)
+HORS_COLONNES = -1
+
+
+class TableChaines:
+    """
+    Table de chaînes internées : chaque valeur distincte (un auteur, un éditeur) n'est stockée qu'une fois,
+    les livres n'en gardent que le numéro (4 octets).
+    """
+
+    __slots__ = ("valeurs", "numeros")
+
+    def __init__(self):
+        self.valeurs = []
+        self.numeros = {}
+
+    def numero(self, valeur: str) -> int:
+        numero = self.numeros.get(valeur)
+        if numero is None:
+            numero = self.numeros[valeur] = len(self.valeurs)
+            self.valeurs.append(valeur)
+        return numero
+
+
+class Colonnes:
+    """
+    Le contenu de LivresCompacts, rangé par colonnes (tableaux d'entiers, sans objet Python par livre).
+
+    - ids, lignes : les ID présents, triés, et la ligne de chacun (deux tableaux parallèles) ;
+    - debuts, longueurs, auteurs, editeurs : une entrée par ligne, c'est-à-dire par version d'un livre.
+      Les noms sont encodés en UTF-8 à la suite dans un seul bytearray, auteurs et éditeurs sont internés ;
+    - autres : les livres qui n'ont pas la forme {"id", "nom", "auteur", "editeur"}, gardés tels quels ;
+    - version : impaire pendant une écriture, elle permet aux lectures de se passer de verrou (voir LivresCompacts._lire).
+
+    Une ligne n'est jamais modifiée une fois écrite : une modification ajoute une ligne, l'ancienne devient obsolète.
+    """
+
+    __slots__ = ("ids", "lignes", "debuts", "longueurs", "noms", "auteurs", "editeurs",
+                 "table_auteurs", "table_editeurs", "autres", "obsoletes", "version")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.lignes = array("q")
+        self.debuts = array("Q")
+        self.longueurs = array("I")
+        self.noms = bytearray()
+        self.auteurs = array("I")
+        self.editeurs = array("I")
+        self.table_auteurs = TableChaines()
+        self.table_editeurs = TableChaines()
+        self.autres = {}
+        self.obsoletes = 0
+        self.version = 0
+
+    def position(self, id) -> int:
+        # Rang de l'ID dans le tableau trié des ID, ou -1 s'il est absent
+        if not isinstance(id, int):
+            return -1
+        i = bisect_left(self.ids, id)
+        return i if i < len(self.ids) and self.ids[i] == id else -1
+
+    def ecrire_ligne(self, nom: bytes, auteur: str, editeur: str) -> int:
+        self.debuts.append(len(self.noms))
+        self.longueurs.append(len(nom))
+        self.noms += nom
+        self.auteurs.append(self.table_auteurs.numero(auteur))
+        self.editeurs.append(self.table_editeurs.numero(editeur))
+        return len(self.debuts) - 1
+
+    def nom(self, ligne: int) -> bytes:
+        debut = self.debuts[ligne]
+        return bytes(self.noms[debut:debut + self.longueurs[ligne]])
+
+    def livre(self, id: int, ligne: int) -> dict:
+        return {
+            "id": id,
+            "nom": self.nom(ligne).decode("utf-8"),
+            "auteur": self.table_auteurs.valeurs[self.auteurs[ligne]],
+            "editeur": self.table_editeurs.valeurs[self.editeurs[ligne]],
+        }
+
+    def chercher(self, id) -> dict | None:
+        i = self.position(id)
+        if i < 0:
+            return None
+        ligne = self.lignes[i]
+        if ligne == HORS_COLONNES:
+            return dict(self.autres[id])
+        return self.livre(id, ligne)
+
+
+def _compactable(id: int, livre: dict) -> bool:
+    # Seuls les livres de la forme {"id", "nom", "auteur", "editeur"} (avec le bon ID) vont dans les colonnes
+    return (len(livre) == len(CHAMPS) and livre.keys() == set(CHAMPS) and livre["id"] == id
+            and all(isinstance(livre[champ], str) for champ in CHAMPS[1:]))
+
+
+class LivresCompacts(MutableMapping):
+    """
+    Dictionnaire {id: livre} compact : les livres sont rangés par colonnes (voir Colonnes), sans dictionnaire
+    Python par livre. Un dictionnaire n'est recréé qu'au moment où un livre est lu.
+
+    Offre les mêmes méthodes que LivresTries (ids_apres, ids_avant, rang, id_max) : les ID sont parcourus par ordre
+    croissant. Quand plus de la moitié des lignes sont obsolètes, les colonnes sont reconstruites (compacter).
+    Comme pour LivresTries, les écritures doivent être faites une à la fois (voir StockageMemoire._verrou).
+    """
+
+    def __init__(self, livres: Mapping | None = None):
+        colonnes = Colonnes()
+        livres = livres or {}
+        # Par ID croissant : chaque ID est ajouté en fin de tableau
+        for id in sorted(livres):
+            self._ecrire(colonnes, id, livres[id])
+        self._colonnes = colonnes
+
+    def _lire(self, lecture, *args):
+        # Lecture sans verrou : on recommence si une écriture a eu lieu pendant la lecture (version modifiée)
+        while True:
+            colonnes = self._colonnes
+            version = colonnes.version
+            if version % 2 == 0:
+                try:
+                    resultat = lecture(colonnes, *args)
+                except (IndexError, KeyError):
+                    # Tableaux lus au milieu d'une écriture
+                    resultat = None
+                if colonnes.version == version:
+                    return resultat
+            time.sleep(0)
+
+    def __getitem__(self, id: int) -> dict:
+        livre = self._lire(Colonnes.chercher, id)
+        if livre is None:
+            raise KeyError(id)
+        return livre
+
+    def __contains__(self, id: object) -> bool:
+        return self._lire(Colonnes.position, id) >= 0
+
+    def __iter__(self):
+        return iter(self._colonnes.ids)
+
+    def __len__(self) -> int:
+        return len(self._colonnes.ids)
+
+    @staticmethod
+    def _ecrire(colonnes: Colonnes, id: int, livre: dict) -> None:
+        # Version impaire pendant l'écriture, même si elle échoue (sinon les lectures attendraient indéfiniment)
+        colonnes.version += 1
+        try:
+            if _compactable(id, livre):
+                ligne = colonnes.ecrire_ligne(livre["nom"].encode("utf-8"), livre["auteur"], livre["editeur"])
+            else:
+                ligne = HORS_COLONNES
+                colonnes.autres[id] = dict(livre)
+            i = bisect_left(colonnes.ids, id)
+            if i < len(colonnes.ids) and colonnes.ids[i] == id:
+                ancienne = colonnes.lignes[i]
+                colonnes.lignes[i] = ligne
+                if ancienne != HORS_COLONNES:
+                    colonnes.obsoletes += 1
+                elif ligne != HORS_COLONNES:
+                    del colonnes.autres[id]
+            elif i == len(colonnes.ids):
+                # Cas le plus courant : un nouvel ID plus grand que tous les autres
+                colonnes.lignes.append(ligne)
+                colonnes.ids.append(id)
+            else:
+                colonnes.lignes.insert(i, ligne)
+                colonnes.ids.insert(i, id)
+        finally:
+            colonnes.version += 1
+
+    def __setitem__(self, id: int, livre: dict) -> None:
+        self._ecrire(self._colonnes, id, livre)
+        self._peut_compacter()
+
+    def __delitem__(self, id: int) -> None:
+        colonnes = self._colonnes
+        i = colonnes.position(id)
+        if i < 0:
+            raise KeyError(id)
+        colonnes.version += 1
+        try:
+            ligne = colonnes.lignes[i]
+            del colonnes.ids[i]
+            del colonnes.lignes[i]
+            if ligne == HORS_COLONNES:
+                del colonnes.autres[id]
+            else:
+                colonnes.obsoletes += 1
+        finally:
+            colonnes.version += 1
+        self._peut_compacter()
+
+    def _peut_compacter(self) -> None:
+        colonnes = self._colonnes
+        if colonnes.obsoletes > 1024 and colonnes.obsoletes * 2 > len(colonnes.debuts):
+            self.compacter()
+
+    def compacter(self) -> None:
+        """
+        Reconstruit les colonnes sans les lignes obsolètes ni les auteurs et éditeurs qui ne servent plus.
+        """
+        ancien, colonnes = self._colonnes, Colonnes()
+        for id, ligne in zip(ancien.ids, ancien.lignes):
+            if ligne == HORS_COLONNES:
+                colonnes.autres[id] = ancien.autres[id]
+                ligne_copiee = HORS_COLONNES
+            else:
+                # Le nom est recopié encodé, sans passer par une chaîne Python
+                ligne_copiee = colonnes.ecrire_ligne(ancien.nom(ligne),
+                                                     ancien.table_auteurs.valeurs[ancien.auteurs[ligne]],
+                                                     ancien.table_editeurs.valeurs[ancien.editeurs[ligne]])
+            colonnes.lignes.append(ligne_copiee)
+            colonnes.ids.append(id)
+        # Les lectures en cours gardent l'ancien objet, les suivantes voient le nouveau
+        self._colonnes = colonnes
+
+    def id_max(self) -> int:
+        ids = self._colonnes.ids
+        return ids[-1] if ids else 0
+
+    def ids_apres(self, id: int | None, nombre: int) -> list[int]:
+        """
+        Returns:
+            list[int]: Au plus `nombre` ID présents, strictement supérieurs à `id` (tous si id vaut None), par ordre croissant.
+        """
+        def lecture(colonnes):
+            debut = 0 if id is None else bisect_right(colonnes.ids, id)
+            return colonnes.ids[debut:debut + nombre].tolist()
+        return self._lire(lecture)
+
+    def ids_avant(self, id: int, nombre: int) -> list[int]:
+        """
+        Returns:
+            list[int]: Au plus `nombre` ID présents, strictement inférieurs à `id` (les plus proches), par ordre croissant.
+        """
+        def lecture(colonnes):
+            fin = bisect_left(colonnes.ids, id)
+            return colonnes.ids[max(0, fin - nombre):fin].tolist()
+        return self._lire(lecture)
+
+    def rang(self, id: int) -> int:
+        """
+        Returns:
+            int: Le nombre d'ID présents strictement inférieurs à `id`.
+        """
+        return bisect_left(self._colonnes.ids, id)
+
+
+class StockageCompact(StockageMemoire):
+    """
+    Stockage en mémoire compact : même comportement que StockageMemoire (rien n'est conservé après un redémarrage),
+    mais les livres sont rangés par colonnes (voir LivresCompacts) plutôt que dans un dictionnaire par livre.
+
+    Environ 5 fois moins de mémoire par livre qu'un dictionnaire de dictionnaires (voir comparer_memoire),
+    au prix d'un dictionnaire recréé à chaque lecture d'un livre.
+    """
+
+    type_livres = LivresCompacts
+
+
+def livres_synthetiques(nombre: int, graine: int = 0) -> dict:
+    """
+    Génère un catalogue réaliste : peu d'auteurs et d'éditeurs distincts, un nom différent par livre.
+    """
+    aleatoire = random.Random(graine)
+    auteurs = [f"Auteur {i}" for i in range(max(1, nombre // 20))]
+    editeurs = [f"Éditions {i}" for i in range(100)]
+    return {
+        id: {"id": id, "nom": f"Livre numéro {id}", "auteur": aleatoire.choice(auteurs), "editeur": aleatoire.choice(editeurs)}
+        for id in range(1, nombre + 1)
+    }
+
+
+def mesurer(construire) -> int:
+    """
+    Returns:
+        int: La mémoire (en octets) allouée par construire() et encore utilisée par son résultat.
+    """
+    tracemalloc.start()
+    try:
+        avant = tracemalloc.get_traced_memory()[0]
+        resultat = construire()
+        apres = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del resultat
+    return apres - avant
+
+
+def comparer_memoire(nombre: int) -> dict:
+    """
+    Mesure la mémoire occupée par `nombre` livres synthétiques dans chaque stockage en mémoire.
+
+    Returns:
+        dict: Le nombre moyen d'octets par livre, par stockage ("memoire", "compact").
+    """
+    # Chaque stockage est construit à partir de ses propres chaînes, comme après le chargement d'un fichier
+    return {
+        "memoire": mesurer(lambda: StockageMemoire(livres_synthetiques(nombre))) / nombre,
+        "compact": mesurer(lambda: StockageCompact(livres_synthetiques(nombre))) / nombre,
+    }
+
+
+def memoire_par_worker(type_stockage: str, nombre: int) -> dict:
+    """
+    Mesure la mémoire d'un worker servant `nombre` livres synthétiques, partie par partie : le stockage, puis ce que
+    le catalogue en dérive une fois toutes ses lectures utilisées. Les index de tri et de filtres sont construits
+    à leur première utilisation, celui de la recherche au démarrage ; l'encodage JSON est gardé pour chaque livre lu.
+
+    Args:
+        type_stockage (str): "memoire" ou "compact".
+        nombre (int): Le nombre de livres.
+
+    Returns:
+        dict: Le nombre moyen d'octets par livre de chaque partie ("stockage", "tris", "filtres", "recherche", "json")
+            et de leur somme ("total").
+    """
+    classe = StockageCompact if type_stockage == "compact" else StockageMemoire
+    parties = {}
+
+    def etape(partie, construire):
+        avant = tracemalloc.get_traced_memory()[0]
+        resultat = construire()
+        parties[partie] = (tracemalloc.get_traced_memory()[0] - avant) / nombre
+        return resultat
+
+    tracemalloc.start()
+    try:
+        stockage = etape("stockage", lambda: classe(livres_synthetiques(nombre)))
+        catalogue = Catalogue(stockage)
+        etape("tris", lambda: [index.construire(stockage.lister()) for index in catalogue.tris.values()])
+        etape("filtres", lambda: [index.construire(stockage.lister()) for index in catalogue.index.values()])
+        etape("recherche", lambda: catalogue.texte.construire(catalogue.figer))
+        etape("json", lambda: [len(catalogue.encoder_livres(lot, catalogue.version)) for lot in catalogue.lots()])
+    finally:
+        tracemalloc.stop()
+    parties["total"] = sum(parties.values())
+    return parties
+
+
+#Compare la mémoire par livre des stockages en mémoire : python -m catalogue.compact [nombre de livres]
+if __name__ == "__main__":
+    nombre = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    sys.stdout.write(f"{nombre} livres, octets par livre d'un worker\n")
+    sys.stdout.write(f"{'':<8}   {'stockage':>8} {'tris':>8} {'filtres':>8} {'recherche':>9} {'json':>8} {'total':>8}\n")
+    for type_stockage in ("memoire", "compact"):
+        parties = memoire_par_worker(type_stockage, nombre)
+        sys.stdout.write(f"{type_stockage:<8} : {parties['stockage']:>8.0f} {parties['tris']:>8.0f} {parties['filtres']:>8.0f} "
+                         f"{parties['recherche']:>9.0f} {parties['json']:>8.0f} {parties['total']:>8.0f}\n")
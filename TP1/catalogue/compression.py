@@ -0,0 +1,270 @@
+import functools
+import gzip
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response, StreamingResponse
+
+from .verrous import VerrousRepartis
+
+try:
+    import brotli
+except ImportError:  # brotli est facultatif : sans lui, seul gzip est proposé
+    brotli = None
+
+# Taille (en octets) en dessous de laquelle une réponse est envoyée telle quelle : la compression n'y gagnerait presque rien
+SEUIL = 1024
+# Encodages proposés, par ordre de préférence à qualité égale dans Accept-Encoding
+ENCODAGES = ("br", "gzip") if brotli is not None else ("gzip",)
+# Niveaux de compression des réponses calculées à chaque requête (rapides), et des fichiers statiques (compressés une fois)
+NIVEAUX = {"br": 4, "gzip": 6}
+NIVEAUX_STATIQUES = {"br": 11, "gzip": 9}
+# Types de contenu compressés (les images, polices et archives le sont déjà)
+TYPES_COMPRESSIBLES = ("text/", "application/json", "application/x-ndjson", "application/javascript", "application/xml",
+                       "image/svg+xml")
+# Un flux SSE doit partir événement par événement, sans tampon de compression
+TYPES_EXCLUS = ("text/event-stream",)
+# Une réponse absente du cache n'est calculée que par une requête à la fois : les autres attendent puis la relisent
+_VERROUS_CALCUL = VerrousRepartis(16)
+
+
+@functools.lru_cache(maxsize=256)
+def choisir_encodage(accept_encoding: str) -> str | None:
+    """
+    Choisit l'encodage d'une réponse d'après l'en-tête Accept-Encoding de la requête (qualités q= comprises).
+    Les clients envoient presque toujours la même valeur : le résultat est gardé en mémoire.
+
+    Returns:
+        str | None: "br", "gzip", ou None pour envoyer la réponse telle quelle.
+    """
+    qualites = {}
+    for element in accept_encoding.lower().split(","):
+        nom, _, parametre = element.partition(";")
+        parametre = parametre.strip()
+        try:
+            qualite = float(parametre[2:]) if parametre.startswith("q=") else 1.0
+        except ValueError:
+            qualite = 0.0
+        qualites[nom.strip()] = qualite
+    meilleur, meilleure_qualite = None, 0.0
+    for encodage in ENCODAGES:
+        qualite = qualites.get(encodage, qualites.get("*", 0.0))
+        if qualite > meilleure_qualite:
+            meilleur, meilleure_qualite = encodage, qualite
+    return meilleur
+
+
+def compressible(type_contenu: str) -> bool:
+    return type_contenu.startswith(TYPES_COMPRESSIBLES) and not type_contenu.startswith(TYPES_EXCLUS)
+
+
+def compresser(corps: bytes, encodage: str, niveaux: dict = NIVEAUX) -> bytes:
+    """
+    Returns:
+        bytes: Le corps compressé en `encodage` ("br" ou "gzip"). L'en-tête gzip ne contient pas de date :
+            un même corps donne toujours les mêmes octets.
+    """
+    if encodage == "br":
+        return brotli.compress(corps, quality=niveaux["br"])
+    return gzip.compress(corps, compresslevel=niveaux["gzip"], mtime=0)
+
+
+class _CompresseurFlux:
+    """
+    Compression d'une réponse envoyée en plusieurs morceaux (export, ...) : chaque morceau compressé part aussitôt,
+    le client peut le décompresser sans attendre la suite.
+    """
+
+    def __init__(self, encodage: str):
+        self.encodage = encodage
+        if encodage == "br":
+            self._compresseur = brotli.Compressor(quality=NIVEAUX["br"])
+        else:
+            self._compresseur = zlib.compressobj(NIVEAUX["gzip"], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def morceau(self, donnees: bytes) -> bytes:
+        if self.encodage == "br":
+            return self._compresseur.process(donnees) + self._compresseur.flush()
+        return self._compresseur.compress(donnees) + self._compresseur.flush(zlib.Z_SYNC_FLUSH)
+
+    def fin(self, donnees: bytes = b"") -> bytes:
+        if self.encodage == "br":
+            return self._compresseur.process(donnees) + self._compresseur.finish()
+        return self._compresseur.compress(donnees) + self._compresseur.flush()
+
+
+def etag_encode(etag: str, encodage: str | None) -> str:
+    """
+    Returns:
+        str: L'ETag d'une représentation compressée en `encodage` : l'ETag d'origine suffixé par l'encodage
+            ('"a1b2-3"' -> '"a1b2-3-gzip"'), pour que deux représentations différentes (octets différents) n'aient
+            jamais le même ETag fort. L'ETag tel quel sans encodage.
+    """
+    if encodage is None or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encodage}"'
+
+
+def etiquette_correspondante(si_aucun: str, etag: str) -> str | None:
+    """
+    Compare l'en-tête If-None-Match d'une requête à l'ETag d'une ressource : comparaison faible (préfixe W/ ignoré),
+    qui accepte l'ETag de chacune de ses représentations, compressée ou non (voir etag_encode).
+
+    Returns:
+        str | None: L'ETag de la représentation que le client a déjà (à renvoyer dans la réponse 304), ou None.
+    """
+    for etiquette in si_aucun.split(","):
+        etiquette = etiquette.strip().removeprefix("W/")
+        if etiquette == "*":
+            return etag
+        if etiquette in (etag, etag_encode(etag, "gzip"), etag_encode(etag, "br")):
+            return etiquette
+    return None
+
+
+def _marquer_encodage(entetes: MutableHeaders, encodage: str) -> None:
+    # Une représentation compressée a son propre ETag (voir etag_encode)
+    entetes["Content-Encoding"] = encodage
+    if "etag" in entetes:
+        entetes["ETag"] = etag_encode(entetes["etag"], encodage)
+
+
+def ajouter_vary(entetes: MutableHeaders) -> None:
+    # Les caches intermédiaires doivent garder une version de la réponse par encodage
+    if "accept-encoding" not in entetes.get("vary", "").lower():
+        entetes.add_vary_header("Accept-Encoding")
+
+
+class MiddlewareCompression:
+    """
+    Middleware ASGI compressant les réponses en gzip (ou en brotli s'il est installé et que le client l'accepte),
+    selon l'en-tête Accept-Encoding de la requête. Seuls les types de contenu textuels (HTML, CSS, JSON, CSV, ...)
+    d'au moins `seuil` octets sont compressés.
+
+    Une réponse compressée porte l'ETag de la réponse d'origine suffixé par l'encodage (voir etag_encode).
+    Une réponse envoyée d'un seul bloc est compressée d'un coup ; une réponse envoyée par morceaux (export) est
+    compressée morceau par morceau, sans attendre la fin. Une réponse déjà compressée (voir reponse_en_cache,
+    statiques.FichiersStatiques) est transmise telle quelle : le middleware ne la recompresse pas.
+    """
+
+    def __init__(self, app, seuil: int = SEUIL):
+        self.app = app
+        self.seuil = seuil
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encodage = choisir_encodage(Headers(scope=scope).get("accept-encoding", ""))
+        debut = None
+        # None tant que le premier morceau n'est pas arrivé, puis False (transmis tel quel) ou le compresseur du flux
+        compresseur = None
+
+        async def envoyer(message):
+            nonlocal debut, compresseur
+            if message["type"] == "http.response.start":
+                # Les en-têtes ne sont envoyés qu'avec le premier morceau : ils dépendent de sa taille
+                debut = message
+                return
+            if message["type"] != "http.response.body" or debut is None:
+                await send(message)
+                return
+            corps, suite = message.get("body", b""), message.get("more_body", False)
+            if compresseur is None:
+                entetes = MutableHeaders(scope=debut)
+                if ("content-encoding" in entetes or debut["status"] < 200 or debut["status"] in (204, 304)
+                        or not compressible(entetes.get("content-type", ""))):
+                    compresseur = False
+                else:
+                    ajouter_vary(entetes)
+                    if encodage is None or (not suite and len(corps) < self.seuil):
+                        compresseur = False
+                    elif not suite:
+                        corps = compresser(corps, encodage)
+                        _marquer_encodage(entetes, encodage)
+                        entetes["Content-Length"] = str(len(corps))
+                        compresseur = False
+                    else:
+                        compresseur = _CompresseurFlux(encodage)
+                        _marquer_encodage(entetes, encodage)
+                        del entetes["Content-Length"]
+                await send(debut)
+            if compresseur:
+                corps = compresseur.morceau(corps) if suite else compresseur.fin(corps)
+            await send({"type": "http.response.body", "body": corps, "more_body": suite})
+
+        await self.app(scope, receive, envoyer)
+
+
+def reponse_en_cache(request, cache, cle, version, produire, media_type: str, headers: dict | None = None,
+                     seuil: int = SEUIL, en_flux: bool = False) -> Response:
+    """
+    Renvoie une réponse dont le corps, compressé selon l'en-tête Accept-Encoding, est gardé dans `cache`
+    (voir catalogue.cache.CacheVersionne) pour cette version du catalogue : tant que le catalogue ne change pas,
+    la même réponse est resservie sans être recalculée ni recompressée. Une version est gardée par encodage.
+    Des requêtes simultanées sur une réponse absente du cache ne la calculent qu'une fois.
+
+    Avec `en_flux`, une réponse absente du cache est envoyée morceau par morceau, à mesure qu'ils sont produits
+    (compressés un à un), puis mise en cache une fois entièrement envoyée. Des requêtes simultanées la produisent
+    alors chacune de leur côté.
+
+    Args:
+        request (Request): La requête.
+        cache (CacheVersionne): Le cache des corps de réponse.
+        cle: La clé de la réponse dans le cache (son URL complète, par exemple).
+        version: La version du catalogue lue avant de calculer la réponse.
+        produire: Fonction sans argument renvoyant le corps de la réponse (bytes), ou ses morceaux (itérateur de bytes)
+            avec `en_flux`, appelée seulement s'il n'est pas en cache. Elle peut lever une HTTPException avant le premier
+            morceau.
+        media_type (str): Le type de contenu de la réponse.
+        headers (dict | None): Des en-têtes à ajouter (ETag, ...).
+
+    Returns:
+        Response: La réponse, compressée si le client l'accepte et qu'elle fait au moins `seuil` octets.
+    """
+    encodage = choisir_encodage(request.headers.get("accept-encoding", ""))
+    entree = cache.get((cle, encodage), version)
+    if entree is None and en_flux:
+        return _reponse_en_flux(produire(), cache, (cle, encodage), version, encodage, media_type, headers)
+    if entree is None:
+        with _VERROUS_CALCUL.pour(hash((cle, encodage))):
+            # Peut-être calculée entre-temps par une requête simultanée
+            entree = cache.get((cle, encodage), version)
+            if entree is None:
+                corps = produire()
+                if encodage is not None and len(corps) >= seuil:
+                    entree = (encodage, compresser(corps, encodage))
+                else:
+                    entree = (None, corps)
+                cache.put((cle, encodage), version, entree, len(entree[1]))
+    encodage_corps, corps = entree
+    reponse = Response(content=corps, media_type=media_type, headers=headers)
+    ajouter_vary(reponse.headers)
+    if encodage_corps is not None:
+        _marquer_encodage(reponse.headers, encodage_corps)
+    return reponse
+
+
+def _reponse_en_flux(morceaux, cache, cle, version, encodage: str | None, media_type: str,
+                     headers: dict | None) -> StreamingResponse:
+    def envoyer():
+        compresseur = _CompresseurFlux(encodage) if encodage is not None else None
+        envoyes = []
+        for morceau in morceaux:
+            if compresseur is not None:
+                morceau = compresseur.morceau(morceau)
+            envoyes.append(morceau)
+            yield morceau
+        if compresseur is not None:
+            envoyes.append(compresseur.fin())
+            yield envoyes[-1]
+        # Réponse envoyée jusqu'au bout (client toujours connecté) : les morceaux compressés mis bout à bout forment
+        # un corps gzip (ou brotli) complet, resservi d'un bloc aux requêtes suivantes
+        corps = b"".join(envoyes)
+        cache.put(cle, version, (encodage, corps), len(corps))
+
+    reponse = StreamingResponse(envoyer(), media_type=media_type, headers=headers)
+    ajouter_vary(reponse.headers)
+    if encodage is not None:
+        _marquer_encodage(reponse.headers, encodage)
+    return reponse
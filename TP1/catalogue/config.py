@@ -0,0 +1,62 @@
+import atexit
+import json
+import os
+
+from .catalogue import Catalogue
+from .compact import StockageCompact
+from .sqlite import StockageSQLite, importer_json
+from .stockage import StockageJournal, StockageMemoire
+
+
+def creer_catalogue(chemin_json: str) -> Catalogue:
+    """
+    Crée le catalogue à partir de la configuration (variables d'environnement).
+
+    - CATALOGUE_STOCKAGE : "journal" (par défaut, durable), "memoire" (aucune écriture sur disque),
+      "compact" (comme "memoire", avec environ 5 fois moins de mémoire par livre) ou "sqlite" (base partagée
+      entre plusieurs workers).
+    - CATALOGUE_JSON : le fichier JSON du contenu initial, à la place de `chemin_json` (catalogue de test, ...).
+    - CATALOGUE_DOSSIER : le dossier de l'instantané et du journal (par défaut, celui de `chemin_json`).
+    - CATALOGUE_SEUIL_COMPACTAGE : nombre minimal d'enregistrements du journal avant compactage.
+    - CATALOGUE_SQLITE : le chemin de la base SQLite (par défaut, livres.db dans CATALOGUE_DOSSIER).
+      Si la base est vide, livres.json y est importé une seule fois.
+    - CATALOGUE_SQLITE_POOL : le nombre maximal de connexions SQLite par worker (8 par défaut).
+    - CATALOGUE_SQLITE_ATTENTE : le délai d'attente d'une connexion libre, en secondes (5 par défaut), au-delà
+      duquel la requête échoue (PoolSature, réponse 503).
+    - CATALOGUE_SAUVEGARDES : le dossier des sauvegardes (par défaut, sauvegardes/ dans CATALOGUE_DOSSIER).
+
+    Args:
+        chemin_json (str): Le fichier livres.json servant de contenu initial.
+
+    Returns:
+        Catalogue: Le catalogue prêt à l'emploi.
+
+    Raises:
+        ValueError: Si CATALOGUE_STOCKAGE ne correspond à aucun stockage connu.
+    """
+    type_stockage = os.environ.get("CATALOGUE_STOCKAGE", "journal")
+    chemin_json = os.environ.get("CATALOGUE_JSON", chemin_json)
+    dossier = os.environ.get("CATALOGUE_DOSSIER", os.path.dirname(os.path.abspath(chemin_json)))
+
+    if type_stockage in ("memoire", "compact"):
+        classe = StockageCompact if type_stockage == "compact" else StockageMemoire
+        with open(chemin_json, "r", encoding="utf-8") as f:
+            stockage = classe({k + 1: v for k, v in enumerate(json.load(f))})
+    elif type_stockage == "journal":
+        seuil = int(os.environ.get("CATALOGUE_SEUIL_COMPACTAGE", "1000"))
+        stockage = StockageJournal(dossier, chemin_initial=chemin_json, seuil_compactage=seuil)
+    elif type_stockage == "sqlite":
+        chemin_sqlite = os.environ.get("CATALOGUE_SQLITE", os.path.join(dossier, "livres.db"))
+        stockage = StockageSQLite(chemin_sqlite, taille_pool=int(os.environ.get("CATALOGUE_SQLITE_POOL", "8")),
+                                  attente_pool=float(os.environ.get("CATALOGUE_SQLITE_ATTENTE", "5")))
+        if stockage.compter() == 0:
+            # Import unique du contenu initial (INSERT OR IGNORE : sans effet si un autre worker l'a déjà fait)
+            importer_json(chemin_json, chemin_sqlite)
+    else:
+        raise ValueError(f"Stockage inconnu : {type_stockage!r} (attendu : 'journal', 'memoire', 'compact' ou 'sqlite')")
+
+    catalogue = Catalogue(stockage, os.environ.get("CATALOGUE_SAUVEGARDES", os.path.join(dossier, "sauvegardes")))
+    catalogue.preparer_recherche()
+    # Synchronise les dernières écritures du journal à l'arrêt du processus
+    atexit.register(catalogue.fermer)
+    return catalogue
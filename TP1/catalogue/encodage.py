@@ -0,0 +1,101 @@
+import json
+import threading
+
+try:
+    import orjson
+except ImportError:  # orjson est facultatif : la bibliothèque standard donne le même JSON, plus lentement
+    orjson = None
+
+# Nombre maximal de livres dont l'encodage est gardé en mémoire
+TAILLE_MAX = 1_000_000
+
+
+def encoder(valeur) -> bytes:
+    """
+    Encode une valeur en JSON compact (UTF-8, sans espaces), comme JSONResponse, avec orjson s'il est installé.
+    """
+    if orjson is not None:
+        return orjson.dumps(valeur)
+    return json.dumps(valeur, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class CacheJson:
+    """
+    Encodage JSON de chaque livre, gardé en mémoire : une liste de livres s'encode en mettant bout à bout
+    des morceaux déjà encodés, sans réencoder les livres qui n'ont pas changé.
+
+    Le cache est un observateur du catalogue : l'encodage d'un livre est oublié dès que ce livre est modifié.
+    Il ne sert que si le livre n'a pas été modifié depuis la version lue : un livre lu dans un cliché plus ancien
+    (liste figée) est encodé tel quel, plutôt que remplacé par l'encodage de son contenu actuel.
+    Un stockage partagé (SQLite) peut être modifié par un autre worker sans que le cache en soit averti :
+    tout le contenu est alors lié à une version du catalogue, et oublié dès qu'une version plus récente est lue.
+    """
+
+    def __init__(self, version_courante, partage: bool = False, taille_max: int = TAILLE_MAX, version_livre=None):
+        """
+        Args:
+            version_courante: Fonction renvoyant la version courante d'un catalogue non partagé.
+            partage (bool): Si le stockage est partagé entre plusieurs processus.
+            taille_max (int): Le nombre maximal de livres gardés ; au-delà, les autres sont encodés à chaque fois.
+            version_livre: Fonction renvoyant la version de la dernière modification d'un livre (par son ID),
+                pour un catalogue non partagé. Sans elle, l'encodage gardé sert quelle que soit la version lue.
+        """
+        self.version_courante = version_courante
+        self.version_livre = version_livre
+        self.partage = partage
+        self.taille_max = taille_max
+        # (version, {id: octets}) remplacé d'un seul coup : une lecture voit toujours un couple cohérent
+        self._etat = (None, {})
+        self._verrou = threading.Lock()
+
+    def mettre_a_jour(self, id: int, ancien: dict | None, nouveau: dict | None) -> None:
+        self.appliquer_lot([(id, ancien, nouveau)])
+
+    def appliquer_lot(self, changements: list) -> None:
+        with self._verrou:
+            octets = self._etat[1]
+            for id, _, _ in changements:
+                octets.pop(id, None)
+
+    def reinitialiser(self) -> None:
+        with self._verrou:
+            self._etat = (None, {})
+
+    def morceaux(self, livres, version) -> list[bytes]:
+        """
+        Args:
+            livres: Les livres à encoder, lus dans le catalogue à la version `version` (ou plus récente).
+            version: La version du catalogue lue avant les livres (voir Catalogue.version).
+
+        Returns:
+            list[bytes]: L'encodage JSON de chaque livre, dans l'ordre.
+        """
+        if self.partage and version != self._etat[0]:
+            with self._verrou:
+                if self._etat[0] is None or version > self._etat[0]:
+                    self._etat = (version, {})
+        version_cache, octets = self._etat
+        if self.partage and version != version_cache:
+            # Lecture d'une version déjà dépassée : rien n'est lu ni gardé
+            octets = {}
+        resultat, nouveaux = [], {}
+        for livre in livres:
+            morceau = octets.get(livre["id"])
+            if (morceau is not None and not self.partage and self.version_livre is not None
+                    and self.version_livre(livre["id"]) > version):
+                # Livre modifié après `version` : l'encodage gardé est celui de son contenu actuel, pas forcément
+                # celui du livre lu (cliché plus ancien), encodé pour cette seule réponse
+                resultat.append(encoder(livre))
+                continue
+            if morceau is None:
+                # orjson rend des octets alloués par blocs d'au moins 1 Ko : la copie gardée n'occupe que leur taille
+                morceau = nouveaux[livre["id"]] = bytes(memoryview(encoder(livre)))
+            resultat.append(morceau)
+        if nouveaux:
+            with self._verrou:
+                # Un livre lu avant une écriture n'est gardé que si aucune écriture n'a eu lieu depuis : l'écriture
+                # change la version avant d'oublier les livres modifiés, sous ce même verrou
+                valide = self._etat[1] is octets and (self.partage or self.version_courante() == version)
+                if valide and len(octets) + len(nouveaux) <= self.taille_max:
+                    octets.update(nouveaux)
+        return resultat
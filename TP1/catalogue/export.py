@@ -0,0 +1,49 @@
+import csv
+import io
+import json
+
+# Colonnes de l'export CSV, dans l'ordre
+COLONNES = ("id", "nom", "auteur", "editeur")
+
+
+def encoder_ndjson(lots):
+    """
+    Encode des lots de livres en NDJSON (un objet JSON par ligne).
+
+    Args:
+        lots: Un itérable de listes de livres (dictionnaires).
+
+    Yields:
+        bytes: Un morceau de la réponse par lot.
+    """
+    for lot in lots:
+        yield "".join(json.dumps(livre, ensure_ascii=False) + "\n" for livre in lot).encode("utf-8")
+
+
+def encoder_csv(lots):
+    """
+    Encode des lots de livres en CSV, précédés de la ligne d'en-tête.
+
+    Args:
+        lots: Un itérable de listes de livres (dictionnaires).
+
+    Yields:
+        bytes: L'en-tête, puis un morceau de la réponse par lot.
+    """
+    tampon = io.StringIO()
+    ecrivain = csv.DictWriter(tampon, fieldnames=COLONNES, extrasaction="ignore")
+    ecrivain.writeheader()
+    yield tampon.getvalue().encode("utf-8")
+    for lot in lots:
+        # On réutilise le même tampon : seul le lot courant est en mémoire
+        tampon.seek(0)
+        tampon.truncate()
+        ecrivain.writerows(lot)
+        yield tampon.getvalue().encode("utf-8")
+
+
+# Type de contenu et encodeur associés à chaque format d'export
+FORMATS = {
+    "ndjson": ("application/x-ndjson", encoder_ndjson),
+    "csv": ("text/csv; charset=utf-8", encoder_csv),
+}
@@ -0,0 +1,98 @@
+import threading
+from array import array
+from bisect import bisect_left
+
+
+def normaliser_valeur(valeur: str) -> str:
+    """
+    Normalise une valeur recherchée (espaces superflus et casse ignorés).
+    """
+    return " ".join(valeur.split()).casefold()
+
+
+class IndexValeur:
+    """
+    Index secondaire valeur -> ID des livres, sur un champ (auteur, editeur, ...).
+
+    Retrouver « tous les livres de tel auteur » coûte O(nombre de résultats) au lieu de parcourir tout le catalogue.
+    Les ID de chaque valeur sont gardés triés dans un tableau d'entiers : 8 octets par livre, au lieu d'un ensemble
+    et d'un objet int par livre (environ 60 octets).
+    Comme les index triés, il est construit à la première utilisation puis mis à jour à chaque modification du catalogue.
+    """
+
+    def __init__(self, champ: str):
+        """
+        Args:
+            champ (str): Le champ du livre indexé.
+        """
+        self.champ = champ
+        self.ids = {}
+        self.pret = False
+        self._verrou = threading.Lock()
+
+    def construire(self, items) -> None:
+        """
+        Construit l'index à partir des couples (id, livre) du catalogue, s'il ne l'est pas déjà.
+        """
+        with self._verrou:
+            if not self.pret:
+                for id, livre in items:
+                    self._ajouter(normaliser_valeur(livre[self.champ]), id)
+                self.pret = True
+
+    def _ajouter(self, valeur: str, id: int) -> None:
+        ids = self.ids.get(valeur)
+        if ids is None:
+            ids = self.ids[valeur] = array("q")
+        # Les ID arrivent le plus souvent dans l'ordre (construction, nouveaux livres)
+        if not ids or ids[-1] < id:
+            ids.append(id)
+            return
+        i = bisect_left(ids, id)
+        if i == len(ids) or ids[i] != id:
+            ids.insert(i, id)
+
+    def _retirer(self, valeur: str, id: int) -> None:
+        ids = self.ids.get(valeur)
+        if ids is None:
+            return
+        i = bisect_left(ids, id)
+        if i < len(ids) and ids[i] == id:
+            del ids[i]
+        if not ids:
+            del self.ids[valeur]
+
+    def mettre_a_jour(self, id: int, ancien: dict | None, nouveau: dict | None) -> None:
+        """
+        Répercute une modification du catalogue (ancien -> nouveau ; None pour un ajout ou une suppression).
+        """
+        self.appliquer_lot([(id, ancien, nouveau)])
+
+    def appliquer_lot(self, changements: list) -> None:
+        """
+        Répercute un lot de modifications (id, ancien, nouveau) en une seule prise du verrou.
+        """
+        with self._verrou:
+            if not self.pret:
+                return
+            for id, ancien, nouveau in changements:
+                if ancien is not None:
+                    self._retirer(normaliser_valeur(ancien[self.champ]), id)
+                if nouveau is not None:
+                    self._ajouter(normaliser_valeur(nouveau[self.champ]), id)
+
+    def reinitialiser(self) -> None:
+        """
+        Oublie le contenu de l'index, qui sera reconstruit à sa prochaine utilisation.
+        """
+        with self._verrou:
+            self.ids = {}
+            self.pret = False
+
+    def chercher(self, valeur: str) -> set:
+        """
+        Returns:
+            set: Les ID des livres dont le champ vaut `valeur` (copie, modifiable par l'appelant).
+        """
+        with self._verrou:
+            return set(self.ids.get(normaliser_valeur(valeur), ()))
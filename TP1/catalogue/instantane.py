@@ -0,0 +1,252 @@
+import glob
+import json
+import mmap
+import os
+import re
+import struct
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Mapping, MutableMapping
+
+from .journal import ecrire_atomiquement
+
+# Format d'un instantané (fichier binaire, entiers petit-boutiens) :
+#   en-tête   : signature (8 octets), nombre de livres n, numéro de séquence, plus grand ID jamais attribué (3 x uint64)
+#   ids       : n x int64, triés par ordre croissant
+#   positions : (n + 1) x uint64, début de chaque livre dans la zone de données (la dernière valeur marque la fin)
+#   données   : chaque livre encodé en JSON (UTF-8), les uns à la suite des autres
+SIGNATURE = b"LIVRES02"
+EN_TETE = struct.Struct("<8sQQQ")
+# Première version du format, sans le plus grand ID attribué (toujours lisible)
+SIGNATURE_V1 = b"LIVRES01"
+EN_TETE_V1 = struct.Struct("<8sQQ")
+MOTIF_FICHIER = re.compile(r"livres\.snapshot\.(\d+)\.cat$")
+
+
+def chemin_instantane(dossier: str, sequence: int) -> str:
+    """
+    Returns:
+        str: Le chemin de l'instantané correspondant au numéro de séquence donné.
+    """
+    return os.path.join(dossier, f"livres.snapshot.{sequence}.cat")
+
+
+def instantanes(dossier: str) -> list[tuple[int, str]]:
+    """
+    Returns:
+        list[tuple[int, str]]: Les instantanés présents dans le dossier (séquence, chemin), du plus ancien au plus récent.
+    """
+    trouves = []
+    for chemin in glob.glob(os.path.join(dossier, "livres.snapshot.*.cat")):
+        correspondance = MOTIF_FICHIER.search(os.path.basename(chemin))
+        if correspondance:
+            trouves.append((int(correspondance.group(1)), chemin))
+    return sorted(trouves)
+
+
+def ecrire_instantane(chemin: str, livres: Mapping, sequence: int, dernier_id: int = 0) -> None:
+    """
+    Écrit (de façon atomique) un instantané du catalogue au format binaire décrit ci-dessus.
+
+    Args:
+        chemin (str): Le fichier à écrire.
+        livres (Mapping): Les livres, indexés par leur ID.
+        sequence (int): Le numéro de séquence de la dernière opération contenue dans l'instantané.
+        dernier_id (int): Le plus grand ID déjà attribué, y compris à des livres supprimés depuis.
+    """
+    ids = array("q", sorted(livres))
+    positions = array("Q", [0])
+    donnees = []
+    for id in ids:
+        encode = json.dumps(livres[id], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        donnees.append(encode)
+        positions.append(positions[-1] + len(encode))
+
+    def morceaux():
+        yield EN_TETE.pack(SIGNATURE, len(ids), sequence, max(dernier_id, ids[-1] if ids else 0))
+        yield ids.tobytes()
+        yield positions.tobytes()
+        yield from donnees
+
+    ecrire_atomiquement(chemin, morceaux())
+
+
+class VueInstantane(Mapping):
+    """
+    Vue en lecture seule, de type dictionnaire {id: livre}, d'un instantané projeté en mémoire (mmap).
+
+    L'ouverture ne lit que l'en-tête : le démarrage prend un temps constant, quelle que soit la taille du catalogue.
+    Un livre n'est décodé qu'au moment où on le lit (recherche de l'ID par dichotomie, O(log n)) et n'est pas gardé
+    en mémoire ensuite : seuls les livres effectivement consultés occupent de la place dans le tas Python.
+    """
+
+    def __init__(self, chemin: str):
+        """
+        Args:
+            chemin (str): Le fichier instantané à ouvrir.
+
+        Raises:
+            ValueError: Si le fichier n'est pas un instantané valide.
+        """
+        self.chemin = chemin
+        with open(chemin, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        signature = self._mmap[:len(SIGNATURE)]
+        if signature == SIGNATURE:
+            _, nombre, self.sequence, self.dernier_id = EN_TETE.unpack_from(self._mmap, 0)
+            debut_ids = EN_TETE.size
+        elif signature == SIGNATURE_V1:
+            _, nombre, self.sequence = EN_TETE_V1.unpack_from(self._mmap, 0)
+            self.dernier_id = 0
+            debut_ids = EN_TETE_V1.size
+        else:
+            raise ValueError(f"{chemin} n'est pas un instantané du catalogue")
+        vue = memoryview(self._mmap)
+        debut_positions = debut_ids + 8 * nombre
+        self._debut_donnees = debut_positions + 8 * (nombre + 1)
+        # Tableaux lus directement dans le fichier projeté, sans copie
+        self.ids = vue[debut_ids:debut_positions].cast("q")
+        self.positions = vue[debut_positions:self._debut_donnees].cast("Q")
+        self.dernier_id = max(self.dernier_id, self.id_max())
+
+    def _position(self, id) -> int:
+        # Rang de l'ID dans le tableau trié des ID, ou -1 s'il est absent
+        if not isinstance(id, int):
+            return -1
+        i = bisect_left(self.ids, id)
+        return i if i < len(self.ids) and self.ids[i] == id else -1
+
+    def __getitem__(self, id: int) -> dict:
+        i = self._position(id)
+        if i < 0:
+            raise KeyError(id)
+        debut = self._debut_donnees + self.positions[i]
+        return json.loads(self._mmap[debut:self._debut_donnees + self.positions[i + 1]])
+
+    def __contains__(self, id: object) -> bool:
+        return self._position(id) >= 0
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def id_max(self) -> int:
+        return self.ids[-1] if len(self.ids) else 0
+
+
+class CatalogueSuperpose(MutableMapping):
+    """
+    Dictionnaire {id: livre} formé d'un instantané en lecture seule et des modifications faites depuis.
+
+    Les livres ajoutés ou modifiés sont gardés en mémoire, les ID supprimés sont masqués ; l'instantané lui-même
+    n'est jamais modifié. Le nombre de livres est tenu à jour à chaque opération (len en O(1)), et les ID ajoutés
+    depuis l'instantané sont gardés triés pour parcourir le catalogue dans l'ordre des ID (voir ids_apres).
+    """
+
+    def __init__(self, base: VueInstantane):
+        self.base = base
+        self.modifies = {}
+        self.supprimes = set()
+        self._supprimes_tries = []  # Les mêmes ID, triés (pour calculer le rang d'un ID)
+        self.ajoutes = []  # ID absents de l'instantané, triés
+        self._nombre = len(base)
+
+    def __getitem__(self, id: int) -> dict:
+        if id in self.modifies:
+            return self.modifies[id]
+        if id in self.supprimes:
+            raise KeyError(id)
+        return self.base[id]
+
+    def __contains__(self, id: object) -> bool:
+        return id in self.modifies or (id not in self.supprimes and id in self.base)
+
+    def __setitem__(self, id: int, livre: dict) -> None:
+        if id not in self:
+            self._nombre += 1
+            if id not in self.base:
+                insort(self.ajoutes, id)
+        self.modifies[id] = livre
+        if id in self.supprimes:
+            self.supprimes.discard(id)
+            del self._supprimes_tries[bisect_left(self._supprimes_tries, id)]
+
+    def __delitem__(self, id: int) -> None:
+        if id not in self:
+            raise KeyError(id)
+        self.modifies.pop(id, None)
+        if id in self.base:
+            self.supprimes.add(id)
+            insort(self._supprimes_tries, id)
+        else:
+            del self.ajoutes[bisect_left(self.ajoutes, id)]
+        self._nombre -= 1
+
+    def __iter__(self):
+        # D'abord les livres de l'instantané (dans l'ordre des ID), puis les livres ajoutés depuis
+        for id in self.base:
+            if id not in self.supprimes:
+                yield id
+        for id in list(self.modifies):
+            if id not in self.base:
+                yield id
+
+    def __len__(self) -> int:
+        return self._nombre
+
+    def id_max(self) -> int:
+        return max(self.base.id_max(), max(self.modifies, default=0))
+
+    def ids_apres(self, id: int | None, nombre: int) -> list[int]:
+        """
+        Returns:
+            list[int]: Au plus `nombre` ID présents, strictement supérieurs à `id` (tous si id vaut None), par ordre croissant.
+        """
+        ids = self.base.ids
+        i = 0 if id is None else bisect_right(ids, id)
+        j = 0 if id is None else bisect_right(self.ajoutes, id)
+        ajoutes, k = self.ajoutes[j:j + nombre], 0
+        resultat = []
+        # Fusion des ID de l'instantané (moins les supprimés) et des ID ajoutés depuis, tous deux triés
+        while len(resultat) < nombre and (i < len(ids) or k < len(ajoutes)):
+            if i < len(ids) and (k == len(ajoutes) or ids[i] < ajoutes[k]):
+                if ids[i] not in self.supprimes:
+                    resultat.append(ids[i])
+                i += 1
+            else:
+                resultat.append(ajoutes[k])
+                k += 1
+        return resultat
+
+    def ids_avant(self, id: int, nombre: int) -> list[int]:
+        """
+        Returns:
+            list[int]: Au plus `nombre` ID présents, strictement inférieurs à `id` (les plus proches), par ordre croissant.
+        """
+        ids = self.base.ids
+        i = bisect_left(ids, id) - 1
+        j = bisect_left(self.ajoutes, id)
+        ajoutes = self.ajoutes[max(0, j - nombre):j]
+        k = len(ajoutes) - 1
+        resultat = []
+        # Même fusion que ids_apres, en partant de la fin
+        while len(resultat) < nombre and (i >= 0 or k >= 0):
+            if i >= 0 and (k < 0 or ids[i] > ajoutes[k]):
+                if ids[i] not in self.supprimes:
+                    resultat.append(ids[i])
+                i -= 1
+            else:
+                resultat.append(ajoutes[k])
+                k -= 1
+        resultat.reverse()
+        return resultat
+
+    def rang(self, id: int) -> int:
+        """
+        Returns:
+            int: Le nombre d'ID présents strictement inférieurs à `id`, en O(log n).
+        """
+        return (bisect_left(self.base.ids, id) - bisect_left(self._supprimes_tries, id)
+                + bisect_left(self.ajoutes, id))
@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+
+
+class Journal:
+    """
+    Journal en ajout seul (append-only) des modifications du catalogue.
+
+    Chaque ajout, modification ou suppression est écrit sur une ligne JSON (NDJSON) avec un numéro
+    de séquence croissant. Les écritures sont envoyées au système à chaque appel, mais l'appel coûteux
+    os.fsync() est regroupé : il n'a lieu que tous les `fsync_lot` enregistrements, ou au plus tard
+    `fsync_delai` secondes après la première écriture non synchronisée.
+    """
+
+    def __init__(self, chemin: str, fsync_lot: int = 64, fsync_delai: float = 0.05):
+        """
+        Args:
+            chemin (str): Le chemin du fichier journal (créé s'il n'existe pas).
+            fsync_lot (int): Nombre d'enregistrements au-delà duquel on force un fsync.
+            fsync_delai (float): Délai maximal (en secondes) avant qu'une écriture soit synchronisée sur disque.
+        """
+        self.chemin = chemin
+        self.fsync_lot = fsync_lot
+        self.fsync_delai = fsync_delai
+        self._verrou = threading.Lock()
+        self._en_attente = 0  # Nombre d'enregistrements écrits mais pas encore synchronisés
+        self._minuteur = None
+        self._fichier = open(chemin, "ab")
+
+    def rejouer(self):
+        """
+        Relit le journal depuis le début.
+
+        Une dernière ligne incomplète (arrêt brutal pendant une écriture) est ignorée et tronquée,
+        afin que les prochains enregistrements repartent sur une ligne propre.
+
+        Yields:
+            dict: Chaque enregistrement valide du journal, dans l'ordre d'écriture.
+        """
+        taille_valide = 0
+        with open(self.chemin, "rb") as f:
+            for ligne in f:
+                if not ligne.endswith(b"\n"):
+                    break
+                try:
+                    enregistrement = json.loads(ligne)
+                except ValueError:
+                    break
+                taille_valide += len(ligne)
+                yield enregistrement
+        # Supprime la fin corrompue éventuelle
+        if taille_valide < os.path.getsize(self.chemin):
+            with self._verrou:
+                self._fichier.truncate(taille_valide)
+
+    def ecrire(self, enregistrement: dict) -> None:
+        """
+        Ajoute un enregistrement à la fin du journal.
+
+        Args:
+            enregistrement (dict): L'opération à journaliser (sérialisable en JSON).
+        """
+        ligne = json.dumps(enregistrement, ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._verrou:
+            self._fichier.write(ligne)
+            self._fichier.flush()
+            self._en_attente += 1
+            if self._en_attente >= self.fsync_lot:
+                self._synchroniser()
+            elif self._minuteur is None:
+                # Garantit qu'une écriture isolée finira sur disque après fsync_delai secondes
+                self._minuteur = threading.Timer(self.fsync_delai, self.synchroniser)
+                self._minuteur.daemon = True
+                self._minuteur.start()
+
+    def synchroniser(self) -> None:
+        """
+        Force l'écriture sur disque (fsync) des enregistrements en attente.
+        """
+        with self._verrou:
+            self._synchroniser()
+
+    def _synchroniser(self) -> None:
+        # Appelée avec le verrou déjà pris
+        if self._minuteur is not None:
+            self._minuteur.cancel()
+            self._minuteur = None
+        if self._en_attente and not self._fichier.closed:
+            os.fsync(self._fichier.fileno())
+            self._en_attente = 0
+
+    def vider(self) -> None:
+        """
+        Tronque le journal, une fois son contenu intégré dans un instantané (snapshot).
+        """
+        with self._verrou:
+            self._fichier.truncate(0)
+            self._fichier.seek(0)
+            os.fsync(self._fichier.fileno())
+            self._en_attente = 0
+
+    def fermer(self) -> None:
+        """
+        Synchronise puis ferme le fichier journal.
+        """
+        with self._verrou:
+            self._synchroniser()
+            self._fichier.close()
+
+
+def ecrire_atomiquement(chemin: str, contenu) -> None:
+    """
+    Écrit un fichier de façon atomique : fichier temporaire, fsync, puis renommage.
+
+    Args:
+        chemin (str): Le chemin du fichier de destination.
+        contenu (bytes | Iterable[bytes]): Le contenu complet du fichier, ou ses morceaux successifs.
+    """
+    temporaire = f"{chemin}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+    with open(temporaire, "wb") as f:
+        for morceau in ([contenu] if isinstance(contenu, bytes) else contenu):
+            f.write(morceau)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporaire, chemin)
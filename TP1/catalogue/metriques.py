@@ -0,0 +1,312 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+from .profileur import PROFILEUR
+
+# Bornes (en secondes) des histogrammes de durée des requêtes HTTP et du rendu des templates
+BORNES_DUREE = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Bornes (en secondes) des accès au catalogue, souvent de l'ordre de la microseconde
+BORNES_DUREE_COURTE = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)
+# Bornes (en octets) des tailles de réponse
+BORNES_TAILLE = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+# Type MIME du format texte de Prometheus
+TYPE_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _echapper(valeur) -> str:
+    # Caractères à échapper dans la valeur d'une étiquette (format texte de Prometheus)
+    return str(valeur).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquettes(noms: tuple, valeurs: tuple, supplement: str = "") -> str:
+    # {nom="valeur",...}, ou rien pour une métrique sans étiquette
+    paires = [f'{nom}="{_echapper(valeur)}"' for nom, valeur in zip(noms, valeurs)]
+    if supplement:
+        paires.append(supplement)
+    return "{" + ",".join(paires) + "}" if paires else ""
+
+
+def _nombre(valeur: float) -> str:
+    return repr(int(valeur)) if valeur == int(valeur) else repr(valeur)
+
+
+class _Famille:
+    """
+    Une métrique et ses séries (une par combinaison de valeurs d'étiquettes).
+
+    Les mesures sont enregistrées sans verrou : chaque thread incrémente son propre tableau de compteurs (threading.local),
+    qu'aucun autre thread n'écrit, et l'exposition additionne les tableaux de tous les threads. Aucune mesure n'est
+    perdue, et les threads du pool de FastAPI ne s'attendent jamais les uns les autres.
+    """
+
+    type = ""
+
+    def __init__(self, nom: str, aide: str, etiquettes: tuple = ()):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = etiquettes
+        self._series = {}  # valeurs des étiquettes -> tableaux de compteurs, un par thread
+        self._local = threading.local()
+
+    def _taille(self) -> int:
+        raise NotImplementedError
+
+    def _tableau(self, valeurs: tuple) -> list:
+        # Tableau de compteurs du thread courant pour cette série (créé à la première mesure)
+        tableaux = getattr(self._local, "tableaux", None)
+        if tableaux is None:
+            tableaux = self._local.tableaux = {}
+        tableau = tableaux.get(valeurs)
+        if tableau is None:
+            tableau = tableaux[valeurs] = [0] * self._taille()
+            # setdefault et append sont atomiques : deux threads peuvent créer la même série en même temps
+            self._series.setdefault(valeurs, []).append(tableau)
+        return tableau
+
+    def _totaux(self) -> list[tuple[tuple, list]]:
+        # Somme des tableaux de tous les threads, série par série (copies : les threads continuent d'écrire)
+        return [(valeurs, [sum(colonne) for colonne in zip(*list(tableaux))])
+                for valeurs, tableaux in sorted(list(self._series.items()), key=lambda serie: tuple(map(str, serie[0])))]
+
+    def exposer(self) -> list[str]:
+        return [f"# HELP {self.nom} {self.aide}", f"# TYPE {self.nom} {self.type}"]
+
+
+class Compteur(_Famille):
+    """
+    Compteur croissant (nombre de requêtes, ...).
+    """
+
+    type = "counter"
+
+    def _taille(self) -> int:
+        return 1
+
+    def incrementer(self, quantite: float = 1, *valeurs) -> None:
+        self._tableau(valeurs)[0] += quantite
+
+    def exposer(self) -> list[str]:
+        return super().exposer() + [f"{self.nom}{_etiquettes(self.etiquettes, valeurs)} {_nombre(total)}"
+                                    for valeurs, (total,) in self._totaux()]
+
+
+class Jauge(Compteur):
+    """
+    Valeur qui monte et descend (requêtes en cours, ...) : la somme des incréments (+1, -1) de tous les threads.
+    """
+
+    type = "gauge"
+
+
+class Histogramme(_Famille):
+    """
+    Répartition de valeurs (durées, tailles) dans des intervalles fixés à l'avance : enregistrer une mesure coûte une
+    recherche dichotomique et deux additions, sans rien allouer.
+    """
+
+    type = "histogram"
+
+    def __init__(self, nom: str, aide: str, etiquettes: tuple = (), bornes: tuple = BORNES_DUREE):
+        super().__init__(nom, aide, etiquettes)
+        self.bornes = bornes
+
+    def _taille(self) -> int:
+        # Un compteur par intervalle, un pour les valeurs au-delà de la dernière borne, puis la somme des valeurs
+        return len(self.bornes) + 2
+
+    def observer(self, valeur: float, *valeurs) -> None:
+        tableau = self._tableau(valeurs)
+        tableau[bisect_left(self.bornes, valeur)] += 1
+        tableau[-1] += valeur
+
+    def exposer(self) -> list[str]:
+        lignes = super().exposer()
+        for valeurs, tableau in self._totaux():
+            # Les intervalles de Prometheus sont cumulés : le compteur « le » compte toutes les valeurs inférieures
+            cumul = 0
+            for borne, nombre in zip((*self.bornes, "+Inf"), tableau):
+                cumul += nombre
+                le = 'le="%s"' % borne
+                lignes.append(f"{self.nom}_bucket{_etiquettes(self.etiquettes, valeurs, le)} {cumul}")
+            lignes.append(f"{self.nom}_sum{_etiquettes(self.etiquettes, valeurs)} {_nombre(tableau[-1])}")
+            lignes.append(f"{self.nom}_count{_etiquettes(self.etiquettes, valeurs)} {cumul}")
+        return lignes
+
+
+class Collecte(_Famille):
+    """
+    Valeur lue seulement au moment de l'exposition (taille d'un cache, nombre d'abonnés, ...) : rien à enregistrer
+    pendant les requêtes.
+    """
+
+    def __init__(self, nom: str, aide: str, type: str, lire):
+        """
+        Args:
+            type (str): "counter" ou "gauge".
+            lire: Fonction sans argument renvoyant la valeur.
+        """
+        super().__init__(nom, aide)
+        self.type = type
+        self.lire = lire
+
+    def exposer(self) -> list[str]:
+        return super().exposer() + [f"{self.nom} {_nombre(self.lire())}"]
+
+
+class Registre:
+    """
+    Ensemble des métriques d'un processus, exposées ensemble au format texte de Prometheus (route /metrics).
+    Chaque worker a son propre registre : Prometheus additionne les workers.
+    """
+
+    def __init__(self):
+        self._familles = {}
+
+    def _ajouter(self, famille: _Famille) -> _Famille:
+        # Une même métrique déclarée deux fois (application rechargée, tests) est remplacée
+        self._familles[famille.nom] = famille
+        return famille
+
+    def compteur(self, nom: str, aide: str, etiquettes: tuple = ()) -> Compteur:
+        return self._ajouter(Compteur(nom, aide, etiquettes))
+
+    def jauge(self, nom: str, aide: str, etiquettes: tuple = ()) -> Jauge:
+        return self._ajouter(Jauge(nom, aide, etiquettes))
+
+    def histogramme(self, nom: str, aide: str, etiquettes: tuple = (), bornes: tuple = BORNES_DUREE) -> Histogramme:
+        return self._ajouter(Histogramme(nom, aide, etiquettes, bornes))
+
+    def collecte(self, nom: str, aide: str, lire, type: str = "gauge") -> Collecte:
+        return self._ajouter(Collecte(nom, aide, type, lire))
+
+    def exposer(self) -> str:
+        """
+        Returns:
+            str: Toutes les métriques au format texte de Prometheus.
+        """
+        lignes = []
+        for famille in list(self._familles.values()):
+            lignes.extend(famille.exposer())
+        return "\n".join(lignes) + "\n"
+
+
+# Registre du processus, partagé par le catalogue et l'application
+METRIQUES = Registre()
+DUREE_REQUETES = METRIQUES.histogramme("http_requete_duree_secondes", "Durée des requêtes HTTP, jusqu'au dernier octet de la réponse",
+                                       ("methode", "route"))
+REQUETES = METRIQUES.compteur("http_requetes_total", "Nombre de requêtes HTTP terminées", ("methode", "route", "code"))
+EN_COURS = METRIQUES.jauge("http_requetes_en_cours", "Nombre de requêtes HTTP en cours de traitement")
+TAILLE_REPONSES = METRIQUES.histogramme("http_reponse_taille_octets", "Taille du corps des réponses HTTP",
+                                        ("methode", "route"), BORNES_TAILLE)
+DUREE_RENDUS = METRIQUES.histogramme("template_rendu_duree_secondes", "Durée du rendu des templates Jinja2", ("template",))
+DUREE_CATALOGUE = METRIQUES.histogramme("catalogue_lecture_duree_secondes", "Durée des lectures dans le catalogue",
+                                        ("operation",), BORNES_DUREE_COURTE)
+
+
+def chronometrer(histogramme: Histogramme, *valeurs):
+    """
+    Décorateur enregistrant la durée de chaque appel de la fonction dans `histogramme` (avec les étiquettes `valeurs`).
+    """
+    def decorateur(fonction):
+        @functools.wraps(fonction)
+        def chronometree(*args, **kwargs):
+            debut = time.perf_counter()
+            try:
+                return fonction(*args, **kwargs)
+            finally:
+                histogramme.observer(time.perf_counter() - debut, *valeurs)
+        return chronometree
+    return decorateur
+
+
+def mesurer_rendus(environnement, histogramme: Histogramme = DUREE_RENDUS) -> None:
+    """
+    Mesure la durée de rendu de chaque template d'un environnement Jinja2 (par exemple Jinja2Templates.env),
+    étiquetée par le nom du template. À appeler avant le chargement des templates.
+    """
+    class TemplateChronometre(environnement.template_class):
+        def render(self, *args, **kwargs):
+            debut = time.perf_counter()
+            try:
+                return super().render(*args, **kwargs)
+            finally:
+                histogramme.observer(time.perf_counter() - debut, self.name)
+
+        def generate(self, *args, **kwargs):
+            # Rendu en flux (voir rendu.par_morceaux) : seul le temps passé à produire les fragments est compté,
+            # pas l'attente entre deux morceaux (envoi au client)
+            fragments = super().generate(*args, **kwargs)
+            duree = 0.0
+            try:
+                while True:
+                    debut = time.perf_counter()
+                    try:
+                        fragment = next(fragments)
+                    except StopIteration:
+                        return
+                    finally:
+                        duree += time.perf_counter() - debut
+                    yield fragment
+            finally:
+                histogramme.observer(duree, self.name)
+
+    environnement.template_class = TemplateChronometre
+
+
+class MiddlewareMetriques:
+    """
+    Middleware ASGI mesurant chaque requête HTTP : durée, taille de la réponse, code de retour et nombre de requêtes
+    en cours, par méthode et par route. La route est le chemin déclaré (/livre/{id}) et non le chemin demandé :
+    le nombre de séries reste borné. Les chemins qui ne correspondent à aucune route sont comptés sous « inconnue ».
+
+    Il signale aussi au profileur (voir catalogue.profileur) le début et la fin des requêtes à profiler, seulement
+    pendant un profil : le reste du temps, il ne lit que l'attribut PROFILEUR.actif.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # Fonction (ou application montée) -> chemin déclaré, complété à la première requête de chaque route
+        self._routes = {}
+
+    def _route(self, scope: dict) -> str:
+        # Le routeur de Starlette ajoute au scope la fonction (endpoint) de la route choisie
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "inconnue"
+        route = self._routes.get(endpoint)
+        if route is None:
+            application = scope.get("app")
+            chemins = [r.path for r in getattr(application, "routes", ())
+                       if getattr(r, "endpoint", None) is endpoint or getattr(r, "app", None) is endpoint]
+            route = self._routes[endpoint] = chemins[0] if chemins else "inconnue"
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        debut = time.perf_counter()
+        code, taille = 500, 0
+
+        async def envoyer(message):
+            nonlocal code, taille
+            if message["type"] == "http.response.start":
+                code = message["status"]
+            elif message["type"] == "http.response.body":
+                taille += len(message.get("body", b""))
+            await send(message)
+
+        profilee = PROFILEUR.actif and PROFILEUR.debut_requete(scope["path"])
+        EN_COURS.incrementer(1)
+        try:
+            await self.app(scope, receive, envoyer)
+        finally:
+            EN_COURS.incrementer(-1)
+            if profilee:
+                PROFILEUR.fin_requete()
+            methode, route = scope["method"], self._route(scope)
+            DUREE_REQUETES.observer(time.perf_counter() - debut, methode, route)
+            TAILLE_REPONSES.observer(taille, methode, route)
+            REQUETES.incrementer(1, methode, route, code)
@@ -0,0 +1,235 @@
+import base64
+import binascii
+import json
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+# Champs sur lesquels on peut trier la liste des livres
+CHAMPS_TRI = ("id", "nom", "auteur", "editeur")
+
+
+def normaliser_tri(valeur: str) -> str:
+    """
+    Normalise une valeur pour le tri (insensible à la casse).
+    """
+    return valeur.casefold()
+
+
+def cle_tri(champ: str, id: int, livre: dict) -> tuple:
+    """
+    Renvoie la clé de tri d'un livre : (id,) pour le tri par ID, (valeur normalisée, id) sinon.
+    """
+    # L'ID départage les livres ayant la même valeur : chaque clé est unique
+    if champ == "id":
+        return (id,)
+    return (normaliser_tri(livre[champ]), id)
+
+
+class ClesTriees(Sequence):
+    """
+    Liste triée de clés (valeur normalisée, id), rangée en deux colonnes : les valeurs dans une liste, les ID dans
+    un tableau d'entiers. Aucun tuple n'est gardé par livre, et les livres de même valeur (même auteur, même éditeur),
+    voisins dans la liste, partagent la même chaîne : 16 octets par livre, plus une chaîne par valeur distincte
+    (contre environ 100 octets par livre pour une liste de tuples).
+
+    Se lit comme une liste de tuples (dichotomie, tranches) ; les tuples ne sont créés qu'à la lecture.
+    """
+
+    __slots__ = ("valeurs", "ids")
+
+    def __init__(self, cles=()):
+        """
+        Args:
+            cles: Des clés (valeur, id) déjà triées.
+        """
+        self.valeurs = []
+        self.ids = array("q")
+        for valeur, id in cles:
+            if self.valeurs and self.valeurs[-1] == valeur:
+                valeur = self.valeurs[-1]
+            self.valeurs.append(valeur)
+            self.ids.append(id)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(zip(self.valeurs[i], self.ids[i]))
+        return self.valeurs[i], self.ids[i]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self):
+        return zip(self.valeurs, self.ids)
+
+    def __delitem__(self, i: int) -> None:
+        del self.valeurs[i]
+        del self.ids[i]
+
+    def inserer(self, i: int, cle: tuple) -> None:
+        valeur, id = cle
+        # Une valeur égale à celle d'un voisin réutilise sa chaîne
+        for voisin in (i - 1, i):
+            if 0 <= voisin < len(self.valeurs) and self.valeurs[voisin] == valeur:
+                valeur = self.valeurs[voisin]
+                break
+        self.valeurs.insert(i, valeur)
+        self.ids.insert(i, id)
+
+
+class IndexTrie:
+    """
+    Index trié des livres sur un champ, tenu à jour à chaque modification du catalogue.
+
+    L'index est une liste triée de clés (valeur normalisée, id), rangée en colonnes (voir ClesTriees) : trouver
+    la position d'un curseur coûte O(log n) par dichotomie, puis une page se lit en O(taille de la page).
+    L'index est construit à la première utilisation, puis mis à jour de façon incrémentale.
+    """
+
+    def __init__(self, champ: str):
+        """
+        Args:
+            champ (str): Le champ du livre servant au tri (voir CHAMPS_TRI).
+        """
+        self.champ = champ
+        self.cles = ClesTriees()
+        self.pret = False
+        self._verrou = threading.Lock()
+
+    def cle(self, id: int, livre: dict) -> tuple:
+        return cle_tri(self.champ, id, livre)
+
+    def construire(self, items) -> None:
+        """
+        Construit l'index à partir des couples (id, livre) du catalogue, s'il ne l'est pas déjà.
+        """
+        with self._verrou:
+            if not self.pret:
+                self.cles = ClesTriees(sorted(self.cle(id, livre) for id, livre in items))
+                self.pret = True
+
+    def mettre_a_jour(self, id: int, ancien: dict | None, nouveau: dict | None) -> None:
+        """
+        Répercute une modification du catalogue (ancien -> nouveau ; None pour un ajout ou une suppression).
+        """
+        with self._verrou:
+            if self.pret:  # Sinon, l'index sera construit plus tard à partir de l'état courant du catalogue
+                self._mettre_a_jour(id, ancien, nouveau)
+
+    def _mettre_a_jour(self, id: int, ancien: dict | None, nouveau: dict | None) -> None:
+        if ancien is not None:
+            cle = self.cle(id, ancien)
+            i = bisect_left(self.cles, cle)
+            if i < len(self.cles) and self.cles[i] == cle:
+                del self.cles[i]
+        if nouveau is not None:
+            cle = self.cle(id, nouveau)
+            i = bisect_left(self.cles, cle)
+            if i == len(self.cles) or self.cles[i] != cle:
+                self.cles.inserer(i, cle)
+
+    def appliquer_lot(self, changements: list) -> None:
+        """
+        Répercute un lot de modifications (id, ancien, nouveau) en une seule prise du verrou.
+
+        Pour un gros lot, on refait un seul tri de la liste plutôt que des insertions une à une.
+        """
+        with self._verrou:
+            if not self.pret:
+                return
+            if len(changements) <= 64 + len(self.cles) // 16:
+                for id, ancien, nouveau in changements:
+                    self._mettre_a_jour(id, ancien, nouveau)
+                return
+            retirees = {self.cle(id, ancien) for id, ancien, _ in changements if ancien is not None}
+            ajoutees = {self.cle(id, nouveau) for id, _, nouveau in changements if nouveau is not None}
+            # La liste est déjà presque triée : le tri (Timsort) est quasi linéaire
+            self.cles = ClesTriees(sorted(set(cle for cle in self.cles if cle not in retirees) | ajoutees))
+
+    def reinitialiser(self) -> None:
+        """
+        Oublie le contenu de l'index, qui sera reconstruit à sa prochaine utilisation.
+        """
+        with self._verrou:
+            self.cles = ClesTriees()
+            self.pret = False
+
+    def tranche(self, cle: tuple | None, limite: int, direction: str) -> tuple[int, list]:
+        """
+        Renvoie les clés d'une page situées après (ou avant) la clé du curseur.
+
+        Args:
+            cle (tuple | None): La clé du curseur, ou None pour la première page.
+            limite (int): Le nombre maximal de clés renvoyées.
+            direction (str): "suivant" (clés après le curseur) ou "precedent" (clés avant le curseur).
+
+        Returns:
+            tuple[int, list]: La position de la première clé de la page dans l'index, et les clés de la page.
+        """
+        with self._verrou:
+            return tranche(self.cles, cle, limite, direction)
+
+    def __len__(self) -> int:
+        return len(self.cles)
+
+
+def tranche(cles: list, cle: tuple | None, limite: int, direction: str) -> tuple[int, list]:
+    """
+    Découpe une page dans une liste de clés triées (voir IndexTrie.tranche).
+    """
+    if cle is None:
+        debut = 0
+    elif direction == "precedent":
+        fin = bisect_left(cles, cle)
+        debut = max(0, fin - limite)
+        return debut, cles[debut:fin]
+    else:
+        debut = bisect_right(cles, cle)
+    return debut, cles[debut:debut + limite]
+
+
+@dataclass
+class Page:
+    """
+    Une page de livres et les curseurs permettant d'obtenir les pages voisines.
+    """
+    livres: list
+    rang: int  # Position (à partir de 0) du premier livre de la page dans l'ordre de tri
+    total: int
+    suivant: str | None = None
+    precedent: str | None = None
+
+
+def encoder_curseur(tri: str, cle: tuple, direction: str) -> str:
+    """
+    Encode un curseur opaque (base64 URL) désignant une position dans l'ordre de tri.
+    """
+    brut = json.dumps({"t": tri, "c": list(cle), "d": direction}, ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(brut.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decoder_curseur(curseur: str) -> tuple[str, tuple, str]:
+    """
+    Décode un curseur produit par encoder_curseur.
+
+    Returns:
+        tuple[str, tuple, str]: Le champ de tri, la clé et la direction ("suivant" ou "precedent").
+
+    Raises:
+        ValueError: Si le curseur est invalide.
+    """
+    try:
+        brut = base64.urlsafe_b64decode(curseur + "=" * (-len(curseur) % 4))
+        donnees = json.loads(brut)
+        tri, cle, direction = donnees["t"], tuple(donnees["c"]), donnees["d"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValueError("Curseur invalide")
+    if tri not in CHAMPS_TRI or direction not in ("suivant", "precedent"):
+        raise ValueError("Curseur invalide")
+    # La clé doit avoir la forme des clés de l'index : (id,) ou (valeur, id)
+    forme = (int,) if tri == "id" else (str, int)
+    if len(cle) != len(forme) or not all(isinstance(v, t) for v, t in zip(cle, forme)):
+        raise ValueError("Curseur invalide")
+    return tri, cle, direction
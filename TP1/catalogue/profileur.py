@@ -0,0 +1,164 @@
+import asyncio
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# Intervalle par défaut entre deux échantillons, en secondes
+INTERVALLE = 0.005
+# Durée maximale d'un profil, en secondes (y compris en attendant les requêtes à profiler)
+DUREE_MAX = 300
+# Modules dans lesquels un thread inactif attend (pool de threads, boucle d'événements) : ses piles sont ignorées
+MODULES_ATTENTE = ("threading", "selectors", "queue", "concurrent.futures.thread")
+
+
+def motif_route(route: str) -> re.Pattern:
+    """
+    Returns:
+        re.Pattern: L'expression régulière des chemins correspondant à une route déclarée : /livre/{id} -> ^/livre/[^/]+$.
+    """
+    morceaux = re.split(r"\{[^}]*\}", route)
+    return re.compile("^" + "[^/]+".join(re.escape(morceau) for morceau in morceaux) + "$")
+
+
+class Profileur:
+    """
+    Profileur par échantillonnage, activé à la demande (route d'administration).
+
+    Pendant un profil, un thread relève toutes les `intervalle` secondes la pile d'appels de chaque thread du processus
+    (sys._current_frames) : boucle d'événements, threads du pool qui exécutent les routes, le rendu des templates et
+    les accès au catalogue. Les piles identiques sont comptées ensemble et renvoyées au format « collapsed stacks »
+    (une ligne « thread;appelant;...;appelé nombre » par pile), lu par flamegraph.pl, speedscope ou inferno.
+
+    Le profil dure un nombre de secondes, ou jusqu'à la fin des N prochaines requêtes dont le chemin correspond à une
+    route : les échantillons ne sont alors relevés que pendant ces requêtes. Hors profil, aucun thread ne tourne et le
+    seul coût est la lecture de l'attribut `actif` par le middleware (voir MiddlewareMetriques).
+    """
+
+    def __init__(self):
+        self.actif = False
+        self._verrou = threading.Lock()
+        self._termine = threading.Event()
+        self._termine.set()
+        self._piles = Counter()
+        self._noms = {}
+        self.echantillons = 0
+        self._motif = None
+        self._requetes_restantes = None
+        self._en_cours = 0
+
+    def demarrer(self, secondes: float | None = None, requetes: int | None = None, route: str | None = None,
+                 intervalle: float = INTERVALLE) -> None:
+        """
+        Démarre un profil de `secondes` secondes, ou des `requetes` prochaines requêtes (sur la route `route`,
+        ou sur toutes les routes), dans la limite de DUREE_MAX secondes.
+
+        Raises:
+            ValueError: Si ni la durée ni le nombre de requêtes n'est donné (ou les deux), ou si un profil est déjà en cours.
+        """
+        if (secondes is None) == (requetes is None):
+            raise ValueError("Indiquez soit une durée, soit un nombre de requêtes.")
+        with self._verrou:
+            if self.actif:
+                raise ValueError("Un profil est déjà en cours.")
+            self._piles = Counter()
+            self.echantillons = 0
+            self._motif = motif_route(route) if route else None
+            self._requetes_restantes = requetes
+            self._en_cours = 0
+            self._termine.clear()
+            self.actif = True
+        fin = time.monotonic() + min(secondes if secondes is not None else DUREE_MAX, DUREE_MAX)
+        threading.Thread(target=self._echantillonner, args=(fin, intervalle), name="profileur", daemon=True).start()
+
+    # Appelées par le middleware, dans la boucle d'événements, seulement pendant un profil
+
+    def debut_requete(self, chemin: str) -> bool:
+        """
+        Returns:
+            bool: True si la requête fait partie du profil (fin_requete devra être appelée à sa fin).
+        """
+        if self._requetes_restantes is None or self._requetes_restantes <= 0:
+            return False
+        if self._motif is not None and not self._motif.match(chemin):
+            return False
+        self._requetes_restantes -= 1
+        self._en_cours += 1
+        return True
+
+    def fin_requete(self) -> None:
+        self._en_cours -= 1
+
+    # Échantillonnage
+
+    def _nom(self, cadre) -> str:
+        # « module:fonction », calculé une seule fois par fonction
+        nom = self._noms.get(cadre.f_code)
+        if nom is None:
+            nom = self._noms[cadre.f_code] = f"{cadre.f_globals.get('__name__', '?')}:{cadre.f_code.co_qualname}"
+        return nom
+
+    def _echantillonner(self, fin: float, intervalle: float) -> None:
+        moi = threading.get_ident()
+        try:
+            while time.monotonic() < fin:
+                time.sleep(intervalle)
+                if self._requetes_restantes is not None:
+                    if self._en_cours == 0:
+                        # Toutes les requêtes demandées sont terminées : fin du profil
+                        if self._requetes_restantes <= 0:
+                            break
+                        continue
+                noms_threads = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, cadre in sys._current_frames().items():
+                    if ident == moi or cadre.f_globals.get("__name__") in MODULES_ATTENTE:
+                        continue
+                    pile = []
+                    while cadre is not None:
+                        pile.append(self._nom(cadre))
+                        cadre = cadre.f_back
+                    pile.append(noms_threads.get(ident, str(ident)).replace(" ", "_"))
+                    self._piles[";".join(reversed(pile))] += 1
+                self.echantillons += 1
+        finally:
+            self.actif = False
+            self._termine.set()
+
+    def arreter(self) -> None:
+        """
+        Termine le profil en cours, s'il y en a un.
+        """
+        self._requetes_restantes = 0
+        self._en_cours = 0
+        self._termine.wait()
+
+    def resultat(self) -> str:
+        """
+        Returns:
+            str: Les piles du dernier profil au format « collapsed stacks », les plus fréquentes d'abord.
+        """
+        return "".join(f"{pile} {nombre}\n" for pile, nombre in self._piles.most_common())
+
+    async def profiler(self, secondes: float | None = None, requetes: int | None = None, route: str | None = None,
+                       intervalle: float = INTERVALLE) -> str:
+        """
+        Démarre un profil (voir demarrer) et attend sa fin sans bloquer la boucle d'événements : les requêtes
+        à profiler continuent d'être servies pendant ce temps.
+
+        Returns:
+            str: Le profil au format « collapsed stacks » (voir resultat).
+        """
+        self.demarrer(secondes, requetes, route, intervalle)
+        try:
+            while not self._termine.is_set():
+                await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            # Client déconnecté : le profil est abandonné
+            self.arreter()
+            raise
+        return self.resultat()
+
+
+# Profileur du processus, déclenché par les routes d'administration
+PROFILEUR = Profileur()
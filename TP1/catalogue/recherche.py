@@ -0,0 +1,351 @@
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+
+# Champs du livre indexés pour la recherche plein texte
+CHAMPS_TEXTE = ("nom", "auteur", "editeur")
+
+_MOT = re.compile(r"\w+")
+# Impact d'un mot dans un livre, codé dans un entier : nombre d'occurrences << 32 | longueur de la fiche
+_LONGUEUR = (1 << 32) - 1
+
+
+def tokeniser(texte: str) -> list[str]:
+    """
+    Découpe un texte en mots normalisés : sans accents, sans casse ni ponctuation.
+
+    Args:
+        texte (str): Le texte à découper.
+
+    Returns:
+        list[str]: Les mots normalisés, dans l'ordre du texte ("Préjugés" -> "prejuges").
+    """
+    # NFKD sépare les lettres de leurs accents, que l'on retire ensuite
+    decompose = unicodedata.normalize("NFKD", texte)
+    sans_accents = "".join(c for c in decompose if not unicodedata.combining(c))
+    return _MOT.findall(sans_accents.casefold())
+
+
+def _liste(couples: list) -> array:
+    # Liste d'un mot (voir IndexTexte) à partir de ses couples (id, impact), dans le désordre
+    couples.sort()
+    par_impact = sorted(couples, key=lambda couple: (couple[1], couple[0]))
+    return array("q", [id for id, _ in couples] + [impact for _, impact in couples]
+                 + [impact for _, impact in par_impact] + [id for id, _ in par_impact])
+
+
+class IndexTexte:
+    """
+    Index inversé mot -> livres sur le nom, l'auteur et l'éditeur des livres.
+
+    - Les résultats sont classés selon BM25 (pertinence tenant compte de la rareté des mots et de la longueur des fiches).
+    - Le dernier mot de la requête peut être un préfixe (autocomplétion) : le vocabulaire est gardé trié,
+      et les mots commençant par ce préfixe sont trouvés par dichotomie.
+    - Le score BM25 d'un mot dans un livre ne dépend que de son impact (nombre d'occurrences, longueur de la fiche),
+      qui prend peu de valeurs différentes : les livres d'un mot sont aussi rangés en paquets de même impact. Une
+      recherche parcourt ces paquets du meilleur au moins bon et s'arrête dès que les suivants ne peuvent plus entrer
+      dans les `limite` meilleurs résultats (élagage MaxScore), au lieu de noter tous les livres contenant un mot courant.
+    - Chaque mot a une seule liste d'entiers (array), en quatre segments de même longueur : les ID triés, l'impact de
+      chacun, puis les impacts triés et les ID correspondants (paquets par impact, ID triés dans chaque paquet).
+      Soit 32 octets par mot d'un livre, sans dictionnaire ni tuple par livre (voir compact.comparer_memoire).
+    - L'index est construit une fois à partir d'un cliché du catalogue, sans bloquer les écritures (voir construire),
+      puis mis à jour de façon incrémentale à chaque modification du catalogue.
+    """
+
+    k1 = 1.2
+    b = 0.75
+    # Nombre maximal de mots du vocabulaire pris en compte pour un préfixe (borne le temps de réponse)
+    max_expansions = 64
+
+    def __init__(self):
+        self.postings = {}
+        self.vocabulaire = []
+        self.nombre = 0
+        self.longueur_totale = 0
+        self.pret = False
+        self._verrou = threading.Lock()
+        # Signalé à la fin (réussie ou non) d'une construction, et quand l'index est réinitialisé
+        self._construit = threading.Condition(self._verrou)
+        # Modifications arrivées pendant la construction (None hors construction), rejouées à sa fin
+        self._en_attente = None
+        # Incrémenté par reinitialiser : une construction commencée avant est abandonnée
+        self._generation = 0
+
+    def _mots(self, livre: dict) -> list[str]:
+        return [mot for champ in CHAMPS_TEXTE for mot in tokeniser(livre[champ])]
+
+    def _documents(self, mot: str) -> int:
+        return len(self.postings[mot]) // 4
+
+    @staticmethod
+    def _rang_par_impact(liste: array, n: int, impact: int, id: int) -> int:
+        # Rang de (impact, id) dans les segments par impact : dans le paquet de l'impact, les ID sont triés
+        debut = bisect_left(liste, impact, 2 * n, 3 * n)
+        fin = bisect_right(liste, impact, debut, 3 * n)
+        return bisect_left(liste, id, debut + n, fin + n) - 3 * n
+
+    def _charger(self, items) -> None:
+        # Construction en bloc : la liste de chaque mot est triée une fois, au lieu d'insertions une à une
+        couples = {}
+        for id, livre in items:
+            mots = self._mots(livre)
+            for mot, nombre in Counter(mots).items():
+                couples.setdefault(mot, []).append((id, nombre << 32 | len(mots)))
+            self.nombre += 1
+            self.longueur_totale += len(mots)
+        while couples:
+            mot, couples_mot = couples.popitem()
+            self.postings[mot] = _liste(couples_mot)
+        self.vocabulaire = sorted(self.postings)
+
+    def _ajouter(self, id: int, livre: dict) -> None:
+        mots = self._mots(livre)
+        for mot, nombre in Counter(mots).items():
+            impact = nombre << 32 | len(mots)
+            liste = self.postings.get(mot)
+            if liste is None:
+                self.postings[mot] = array("q", (id, impact, impact, id))
+                insort(self.vocabulaire, mot)
+                continue
+            n = len(liste) // 4
+            i = bisect_left(liste, id, 0, n)
+            j = self._rang_par_impact(liste, n, impact, id)
+            # Du dernier segment au premier : une insertion ne décale pas les segments qui restent à modifier
+            liste.insert(3 * n + j, id)
+            liste.insert(2 * n + j, impact)
+            liste.insert(n + i, impact)
+            liste.insert(i, id)
+        self.nombre += 1
+        self.longueur_totale += len(mots)
+
+    def _retirer(self, id: int, livre: dict) -> None:
+        mots = self._mots(livre)
+        present, longueur = not mots, len(mots)
+        for mot in set(mots):
+            liste = self.postings.get(mot)
+            if liste is None:
+                continue
+            n = len(liste) // 4
+            i = bisect_left(liste, id, 0, n)
+            if i == n or liste[i] != id:
+                continue
+            impact = liste[n + i]
+            j = self._rang_par_impact(liste, n, impact, id)
+            del liste[3 * n + j]
+            del liste[2 * n + j]
+            del liste[n + i]
+            del liste[i]
+            present, longueur = True, impact & _LONGUEUR
+            if not liste:
+                del self.postings[mot]
+                del self.vocabulaire[bisect_left(self.vocabulaire, mot)]
+        if present:
+            self.nombre -= 1
+            self.longueur_totale -= longueur
+
+    def _appliquer(self, changements, cliche=None) -> None:
+        # Sans cliché, l'index contient `ancien` pour chaque changement. Avec le cliché d'une construction (rejeu des
+        # changements arrivés pendant celle-ci), le livre indexé pour un ID est celui du cliché, ou le dernier livre
+        # rejoué pour cet ID : un changement déjà vu par le cliché est ainsi rejoué sans effet.
+        actuels = {}
+        for id, ancien, nouveau in changements:
+            if cliche is not None:
+                ancien = actuels[id] if id in actuels else cliche.get(id)
+                actuels[id] = nouveau
+            if ancien is not None:
+                self._retirer(id, ancien)
+            if nouveau is not None:
+                self._ajouter(id, nouveau)
+
+    def construire(self, figer) -> None:
+        """
+        Construit l'index à partir d'un cliché du catalogue, s'il n'est ni construit ni déjà en construction.
+
+        La construction (plusieurs secondes pour 200 000 livres) se fait sans le verrou de l'index : les écritures
+        qui arrivent pendant ce temps sont mises de côté, puis rejouées sur le nouvel index avant qu'il ne remplace
+        l'ancien ; les recherches attendent la fin de la construction (voir attendre).
+
+        Args:
+            figer: Renvoie un cliché du catalogue (voir Catalogue.figer).
+        """
+        while True:
+            with self._verrou:
+                if self.pret or self._en_attente is not None:
+                    return
+                self._en_attente, generation = [], self._generation
+            try:
+                nouveau = IndexTexte()
+                with figer() as cliche:
+                    nouveau._charger(cliche.lister())
+                    with self._verrou:
+                        if generation == self._generation:
+                            nouveau._appliquer(self._en_attente, cliche)
+                            self.postings, self.vocabulaire = nouveau.postings, nouveau.vocabulaire
+                            self.nombre, self.longueur_totale = nouveau.nombre, nouveau.longueur_totale
+                            self.pret, self._en_attente = True, None
+                            self._construit.notify_all()
+                            return
+                # L'index a été réinitialisé pendant la construction : on recommence avec un nouveau cliché
+            except BaseException:
+                with self._verrou:
+                    if generation == self._generation:
+                        self._en_attente = None
+                        self._construit.notify_all()
+                raise
+
+    def construire_en_arriere_plan(self, figer) -> threading.Thread:
+        """
+        Lance la construction de l'index (voir construire) dans un thread, pour qu'aucune requête ne l'attende.
+
+        Returns:
+            threading.Thread: Le thread de construction.
+        """
+        thread = threading.Thread(target=self.construire, args=(figer,), name="index-texte", daemon=True)
+        thread.start()
+        return thread
+
+    def attendre(self, figer) -> None:
+        """
+        Attend que l'index soit prêt : attend la construction en cours, ou la fait si personne ne l'a commencée.
+        """
+        while True:
+            self.construire(figer)
+            with self._construit:
+                while self._en_attente is not None:
+                    self._construit.wait()
+                if self.pret:
+                    return
+
+    def mettre_a_jour(self, id: int, ancien: dict | None, nouveau: dict | None) -> None:
+        """
+        Répercute une modification du catalogue (ancien -> nouveau ; None pour un ajout ou une suppression).
+        """
+        self.appliquer_lot([(id, ancien, nouveau)])
+
+    def appliquer_lot(self, changements: list) -> None:
+        """
+        Répercute un lot de modifications (id, ancien, nouveau) en une seule prise du verrou.
+        """
+        with self._verrou:
+            if self.pret:
+                self._appliquer(changements)
+            elif self._en_attente is not None:
+                self._en_attente.extend(changements)
+
+    def reinitialiser(self) -> None:
+        """
+        Oublie le contenu de l'index, qui sera reconstruit à sa prochaine utilisation.
+        """
+        with self._verrou:
+            self.postings, self.vocabulaire, self.nombre, self.longueur_totale = {}, [], 0, 0
+            self.pret, self._en_attente = False, None
+            self._generation += 1
+            self._construit.notify_all()
+
+    def _prefixes(self, prefixe: str) -> list[str]:
+        # Mots du vocabulaire commençant par le préfixe, trouvés par dichotomie dans le vocabulaire trié
+        debut = bisect_left(self.vocabulaire, prefixe)
+        fin = bisect_left(self.vocabulaire, prefixe + "\U0010ffff", debut, min(len(self.vocabulaire), debut + self.max_expansions))
+        return self.vocabulaire[debut:fin]
+
+    def _bm25(self, impact: int, idf: float, moyenne: float) -> float:
+        tf, longueur = impact >> 32, impact & _LONGUEUR
+        return idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * longueur / moyenne))
+
+    def _paquets(self, mot: str, idf: float, moyenne: float):
+        # Paquets de livres de même impact d'un mot : (score, liste, début, fin), les ID étant liste[début:fin]
+        liste = self.postings[mot]
+        n = len(liste) // 4
+        debut = 2 * n
+        while debut < 3 * n:
+            fin = bisect_right(liste, liste[debut], debut, 3 * n)
+            yield self._bm25(liste[debut], idf, moyenne), liste, debut + n, fin + n
+            debut = fin
+
+    def _score(self, mots: list[str], idfs: dict, id: int, moyenne: float) -> float | None:
+        # Score d'un terme de la requête pour un livre : le meilleur de ses mots (plusieurs pour un préfixe),
+        # None si le livre ne contient aucun d'eux
+        meilleur = None
+        for mot in mots:
+            liste = self.postings[mot]
+            n = len(liste) // 4
+            i = bisect_left(liste, id, 0, n)
+            if i < n and liste[i] == id:
+                score = self._bm25(liste[n + i], idfs[mot], moyenne)
+                if meilleur is None or score > meilleur:
+                    meilleur = score
+        return meilleur
+
+    def chercher(self, requete: str, limite: int = 20, prefixe: bool = True) -> list[tuple[int, float]]:
+        """
+        Recherche les livres contenant tous les mots de la requête.
+
+        Le terme le plus rare mène le parcours : ses paquets de livres sont lus par impact décroissant, et chaque livre
+        est complété par le score des autres termes. Le parcours s'arrête dès que le meilleur score encore possible
+        (impact du paquet + impact maximal des autres termes) est inférieur au `limite`-ième score trouvé : pour un
+        mot courant, seuls les premiers paquets sont lus.
+
+        Args:
+            requete (str): Les mots recherchés (accents et casse ignorés).
+            limite (int): Le nombre maximal de résultats.
+            prefixe (bool): Si True, le dernier mot est un préfixe ("tolk" trouve "Tolkien").
+
+        Returns:
+            list[tuple[int, float]]: Les couples (id, score), du plus pertinent au moins pertinent.
+        """
+        termes = tokeniser(requete)
+        if not termes or limite <= 0:
+            return []
+        exacts, dernier = (termes[:-1], termes[-1]) if prefixe else (termes, None)
+        with self._verrou:
+            # Un terme de la requête = la liste de ses mots dans le vocabulaire (ceux du préfixe pour le dernier)
+            groupes = [[terme] if terme in self.postings else [] for terme in exacts]
+            if dernier is not None:
+                groupes.append(self._prefixes(dernier))
+            if not all(groupes):
+                return []
+            n = self.nombre
+            moyenne = self.longueur_totale / n
+            idfs = {mot: math.log(1 + (n - self._documents(mot) + 0.5) / (self._documents(mot) + 0.5))
+                    for groupe in groupes for mot in groupe}
+            groupes.sort(key=lambda groupe: sum(self._documents(mot) for mot in groupe))
+            meneur, autres = groupes[0], groupes[1:]
+            paquets = sorted((paquet for mot in meneur for paquet in self._paquets(mot, idfs[mot], moyenne)),
+                             key=lambda paquet: paquet[0], reverse=True)
+            # Borne supérieure de ce que les autres termes peuvent ajouter au score d'un livre
+            borne = sum(max(score for mot in groupe for score, *_ in self._paquets(mot, idfs[mot], moyenne))
+                        for groupe in autres)
+            # Tas des `limite` meilleurs (score, -id) trouvés : le plus petit en tête
+            meilleurs = []
+            # Un livre peut contenir plusieurs mots du préfixe : seul son premier paquet (le meilleur) compte
+            vus = set() if len(meneur) > 1 else None
+            for score_paquet, liste, debut, fin in paquets:
+                if len(meilleurs) == limite and score_paquet + borne < meilleurs[0][0]:
+                    break
+                for k in range(debut, fin):
+                    id = liste[k]
+                    if vus is not None:
+                        if id in vus:
+                            continue
+                        vus.add(id)
+                    score = score_paquet
+                    for groupe in autres:
+                        complement = self._score(groupe, idfs, id, moyenne)
+                        if complement is None:
+                            break
+                        score += complement
+                    else:
+                        cle = (score, -id)
+                        if len(meilleurs) < limite:
+                            heapq.heappush(meilleurs, cle)
+                        elif cle > meilleurs[0]:
+                            heapq.heapreplace(meilleurs, cle)
+                        elif not autres:
+                            # Même score pour tout le paquet et ID croissants : les suivants n'entreront pas non plus
+                            break
+        return [(-moins_id, score) for score, moins_id in sorted(meilleurs, reverse=True)]
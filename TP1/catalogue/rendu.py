@@ -0,0 +1,48 @@
+import os
+from collections.abc import Iterator
+
+from jinja2 import FileSystemBytecodeCache
+
+# Taille (en octets) des morceaux d'une page rendue en flux : assez grands pour ne pas multiplier les envois,
+# assez petits pour que le début de la page parte dès les premières lignes rendues
+TAILLE_MORCEAU = 16 * 1024
+
+
+def precompiler(environnement, dossier_cache: str | None = None) -> list[str]:
+    """
+    Compile au démarrage tous les templates d'un environnement Jinja2 (par exemple Jinja2Templates.env), au lieu
+    de compiler chacun à sa première requête.
+
+    Si `dossier_cache` est donné, le code compilé y est gardé (cache de bytecode) : aux démarrages suivants,
+    les templates sont chargés sans être recompilés. Un template modifié est recompilé (le cache compare le source).
+    Plusieurs workers peuvent partager le même dossier. À appeler après mesurer_rendus.
+
+    Returns:
+        list[str]: Les noms des templates compilés.
+    """
+    if dossier_cache:
+        os.makedirs(dossier_cache, exist_ok=True)
+        environnement.bytecode_cache = FileSystemBytecodeCache(dossier_cache)
+    noms = environnement.list_templates()
+    for nom in noms:
+        environnement.get_template(nom)
+    return noms
+
+
+def par_morceaux(template, contexte: dict, taille: int = TAILLE_MORCEAU) -> Iterator[bytes]:
+    """
+    Rend un template morceau par morceau (Template.generate), en UTF-8 : le premier morceau est prêt dès que les
+    `taille` premiers octets sont rendus, quelle que soit la longueur de la page.
+
+    Returns:
+        Iterator[bytes]: Les morceaux de la page, d'environ `taille` octets (le dernier peut être plus court).
+    """
+    tampon, longueur = [], 0
+    for fragment in template.generate(contexte):
+        tampon.append(fragment)
+        longueur += len(fragment)
+        if longueur >= taille:
+            yield "".join(tampon).encode("utf-8")
+            tampon, longueur = [], 0
+    if tampon:
+        yield "".join(tampon).encode("utf-8")
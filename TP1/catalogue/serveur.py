@@ -0,0 +1,51 @@
+import argparse
+import os
+
+import uvicorn
+
+# Stockages lus et écrits par tous les workers à la fois ; les autres sont propres à chaque processus
+STOCKAGES_PARTAGES = ("sqlite",)
+
+
+def lancer(application: str, workers: int = 0, hote: str = "127.0.0.1", port: int = 8000) -> None:
+    """
+    Lance l'application en production : plusieurs processus uvicorn (workers), sans rechargement automatique.
+
+    Chaque worker a son propre Catalogue, mais tous lisent et écrivent la même base SQLite (stockage par défaut
+    de ce mode, voir catalogue.config) : les lectures se répartissent sur tous les cœurs et aucun worker ne garde
+    de copie du catalogue susceptible de diverger. La version du catalogue, tenue dans la base et incrémentée
+    par chaque écriture, sert de canal de notification : les caches de chaque worker (pages rendues, JSON)
+    sont invalidés dès la requête qui suit une écriture faite par un autre worker.
+
+    Args:
+        application (str): L'application à charger dans chaque worker, par exemple "Appli_Web:app".
+        workers (int): Le nombre de workers (0 : un par cœur).
+        hote (str): L'adresse d'écoute.
+        port (int): Le port d'écoute.
+
+    Raises:
+        ValueError: Si plusieurs workers sont demandés avec un stockage propre à chaque processus (mémoire, journal) :
+            chacun aurait son propre catalogue.
+    """
+    workers = workers or os.cpu_count() or 1
+    # Les variables d'environnement sont héritées par les workers
+    stockage = os.environ.setdefault("CATALOGUE_STOCKAGE", "sqlite")
+    if workers > 1 and stockage not in STOCKAGES_PARTAGES:
+        raise ValueError(f"Le stockage {stockage!r} n'est pas partagé entre les processus : "
+                         f"utilisez CATALOGUE_STOCKAGE=sqlite ou un seul worker.")
+    uvicorn.run(application, host=hote, port=port, workers=workers, reload=False)
+
+
+def executer(application: str) -> None:
+    """
+    Point d'entrée en ligne de commande du mode production (voir lancer).
+    """
+    parser = argparse.ArgumentParser(description="Lance l'application avec plusieurs workers partageant le catalogue")
+    parser.add_argument("--workers", type=int, default=0, help="nombre de workers (par défaut, un par cœur)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    arguments = parser.parse_args()
+    try:
+        lancer(application, arguments.workers, arguments.host, arguments.port)
+    except ValueError as e:
+        parser.error(str(e))
@@ -0,0 +1,665 @@
+import json
+import os
+import queue
+import sqlite3
+import sys
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+from .index import normaliser_valeur
+from .pagination import CHAMPS_TRI, normaliser_tri
+from .recherche import tokeniser
+
+# Requêtes SQL constantes : sqlite3 garde en cache les requêtes déjà préparées pour chaque connexion,
+# elles ne sont donc analysées qu'une seule fois par connexion du pool.
+SQL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS livres (
+    id INTEGER PRIMARY KEY,
+    nom TEXT NOT NULL,
+    auteur TEXT NOT NULL,
+    editeur TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_livres_auteur ON livres(auteur);
+CREATE INDEX IF NOT EXISTS idx_livres_editeur ON livres(editeur);
+-- Index de tri (pagination par clé) : même ordre que les index triés en mémoire, (valeur sans casse, id)
+CREATE INDEX IF NOT EXISTS idx_livres_tri_nom ON livres(casefold(nom), id);
+CREATE INDEX IF NOT EXISTS idx_livres_tri_auteur ON livres(casefold(auteur), id);
+CREATE INDEX IF NOT EXISTS idx_livres_tri_editeur ON livres(casefold(editeur), id);
+-- Index des filtres : même normalisation que les index secondaires en mémoire (espaces et casse ignorés)
+CREATE INDEX IF NOT EXISTS idx_livres_filtre_auteur ON livres(normaliser(auteur));
+CREATE INDEX IF NOT EXISTS idx_livres_filtre_editeur ON livres(normaliser(editeur));
+-- Plus grand ID jamais attribué, partagé par tous les workers (une seule ligne, cle = 0)
+CREATE TABLE IF NOT EXISTS compteur_ids (
+    cle INTEGER PRIMARY KEY CHECK (cle = 0),
+    dernier INTEGER NOT NULL
+);
+-- État du catalogue (voir Catalogue.etat) : époque aléatoire de la base, version et instant de la dernière écriture.
+-- La version est incrémentée par des déclencheurs à chaque écriture de n'importe quel worker, qui notent aussi
+-- la version et l'instant de la dernière modification de chaque livre (versions_livres, voir Catalogue.etat_livre).
+CREATE TABLE IF NOT EXISTS etat_catalogue (
+    cle INTEGER PRIMARY KEY CHECK (cle = 0),
+    epoque TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    modifie REAL NOT NULL
+);
+INSERT OR IGNORE INTO etat_catalogue (cle, epoque, version, modifie)
+    VALUES (0, lower(hex(randomblob(4))), 0, (julianday('now') - 2440587.5) * 86400.0);
+CREATE TABLE IF NOT EXISTS versions_livres (
+    id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL,
+    modifie REAL NOT NULL
+);
+"""
+# Nombre de changements gardés dans la table `changements` (voir changements_depuis)
+TAILLE_CHANGEMENTS = 10_000
+# Déclencheurs des versions (voir etat_catalogue) : chaque écriture, de n'importe quel worker, incrémente la version
+# et note le changement dans la table `changements`, numéroté par cette version, où le flux des changements le lit
+# (voir catalogue.changements). Ils remplacent, une seule fois et dans une transaction d'écriture, ceux des bases
+# créées avant la table `changements`.
+SQL_DECLENCHEURS = [
+    "DROP TRIGGER IF EXISTS livres_version_ajout",
+    "DROP TRIGGER IF EXISTS livres_version_modification",
+    "DROP TRIGGER IF EXISTS livres_version_suppression",
+    "CREATE TABLE changements (version INTEGER PRIMARY KEY, op TEXT NOT NULL, id INTEGER NOT NULL, "
+    "nom TEXT, auteur TEXT, editeur TEXT)",
+    f"""CREATE TRIGGER livres_version_ajout AFTER INSERT ON livres BEGIN
+    UPDATE etat_catalogue SET version = version + 1, modifie = (julianday('now') - 2440587.5) * 86400.0 WHERE cle = 0;
+    INSERT OR REPLACE INTO versions_livres (id, version, modifie) SELECT new.id, version, modifie FROM etat_catalogue WHERE cle = 0;
+    INSERT INTO changements SELECT version, 'ajouter', new.id, new.nom, new.auteur, new.editeur FROM etat_catalogue WHERE cle = 0;
+    DELETE FROM changements WHERE version <= (SELECT version FROM etat_catalogue WHERE cle = 0) - {TAILLE_CHANGEMENTS};
+END""",
+    f"""CREATE TRIGGER livres_version_modification AFTER UPDATE ON livres BEGIN
+    UPDATE etat_catalogue SET version = version + 1, modifie = (julianday('now') - 2440587.5) * 86400.0 WHERE cle = 0;
+    INSERT OR REPLACE INTO versions_livres (id, version, modifie) SELECT new.id, version, modifie FROM etat_catalogue WHERE cle = 0;
+    INSERT INTO changements SELECT version, 'modifier', new.id, new.nom, new.auteur, new.editeur FROM etat_catalogue WHERE cle = 0;
+    DELETE FROM changements WHERE version <= (SELECT version FROM etat_catalogue WHERE cle = 0) - {TAILLE_CHANGEMENTS};
+END""",
+    f"""CREATE TRIGGER livres_version_suppression AFTER DELETE ON livres BEGIN
+    UPDATE etat_catalogue SET version = version + 1, modifie = (julianday('now') - 2440587.5) * 86400.0 WHERE cle = 0;
+    DELETE FROM versions_livres WHERE id = old.id;
+    INSERT INTO changements (version, op, id) SELECT version, 'supprimer', old.id FROM etat_catalogue WHERE cle = 0;
+    DELETE FROM changements WHERE version <= (SELECT version FROM etat_catalogue WHERE cle = 0) - {TAILLE_CHANGEMENTS};
+END""",
+]
+SQL_CHANGEMENTS_EXISTE = "SELECT 1 FROM sqlite_master WHERE name = 'changements'"
+SQL_CHANGEMENTS = ("SELECT version, op, id, nom, auteur, editeur FROM changements WHERE version > ? "
+                   "ORDER BY version LIMIT ?")
+# Index plein texte (FTS5) sur le nom, l'auteur et l'éditeur, tenu à jour par des déclencheurs.
+# Il est créé (et rempli à partir des livres existants) une seule fois, dans une transaction d'écriture.
+SQL_TEXTE = [
+    "CREATE VIRTUAL TABLE livres_texte USING fts5(nom, auteur, editeur, content='livres', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER livres_texte_ajout AFTER INSERT ON livres BEGIN "
+    "INSERT INTO livres_texte (rowid, nom, auteur, editeur) VALUES (new.id, new.nom, new.auteur, new.editeur); END",
+    "CREATE TRIGGER livres_texte_suppression AFTER DELETE ON livres BEGIN "
+    "INSERT INTO livres_texte (livres_texte, rowid, nom, auteur, editeur) VALUES ('delete', old.id, old.nom, old.auteur, old.editeur); END",
+    "CREATE TRIGGER livres_texte_modification AFTER UPDATE ON livres BEGIN "
+    "INSERT INTO livres_texte (livres_texte, rowid, nom, auteur, editeur) VALUES ('delete', old.id, old.nom, old.auteur, old.editeur); "
+    "INSERT INTO livres_texte (rowid, nom, auteur, editeur) VALUES (new.id, new.nom, new.auteur, new.editeur); END",
+    "INSERT INTO livres_texte (livres_texte) VALUES ('rebuild')",
+]
+SQL_TEXTE_EXISTE = "SELECT 1 FROM sqlite_master WHERE name = 'livres_texte'"
+# bm25() est d'autant plus petit que le livre est pertinent
+SQL_RECHERCHER = ("SELECT l.id, l.nom, l.auteur, l.editeur, -bm25(livres_texte) FROM livres_texte "
+                  "JOIN livres AS l ON l.id = livres_texte.rowid WHERE livres_texte MATCH ? ORDER BY bm25(livres_texte), l.id LIMIT ?")
+SQL_GET = "SELECT id, nom, auteur, editeur FROM livres WHERE id = ?"
+# Les ID demandés sont passés en un seul paramètre (tableau JSON) : une seule requête, quel que soit leur nombre
+SQL_GET_PLUSIEURS = "SELECT id, nom, auteur, editeur FROM livres WHERE id IN (SELECT value FROM json_each(?))"
+SQL_CONTIENT = "SELECT 1 FROM livres WHERE id = ?"
+SQL_IDS = "SELECT id FROM livres ORDER BY id"
+SQL_LISTER = "SELECT id, nom, auteur, editeur FROM livres ORDER BY id"
+SQL_LOT = "SELECT id, nom, auteur, editeur FROM livres WHERE id > ? ORDER BY id LIMIT ?"
+SQL_COMPTER = "SELECT COUNT(*) FROM livres"
+SQL_VERSION = "SELECT version FROM etat_catalogue WHERE cle = 0"
+SQL_ETAT = "SELECT epoque, version, modifie FROM etat_catalogue WHERE cle = 0"
+# Un livre sans version enregistrée (base antérieure au suivi des versions) a la version 0 et la date du catalogue
+SQL_ETAT_LIVRE = ("SELECT e.epoque, COALESCE(v.version, 0), COALESCE(v.modifie, e.modifie) FROM livres AS l "
+                  "JOIN etat_catalogue AS e ON e.cle = 0 LEFT JOIN versions_livres AS v ON v.id = l.id WHERE l.id = ?")
+SQL_ID_MAX = ("SELECT MAX((SELECT COALESCE(MAX(id), 0) FROM livres), "
+              "COALESCE((SELECT dernier FROM compteur_ids WHERE cle = 0), 0))")
+# Réserve l'ID suivant le plus grand ID attribué ; exécutée dans une transaction d'écriture, donc un seul worker à la fois
+SQL_ALLOUER = ("INSERT INTO compteur_ids (cle, dernier) VALUES (0, (" + SQL_ID_MAX + ") + 1) "
+               "ON CONFLICT (cle) DO UPDATE SET dernier = excluded.dernier RETURNING dernier")
+SQL_RETENIR_ID = ("INSERT INTO compteur_ids (cle, dernier) VALUES (0, :id) "
+                  "ON CONFLICT (cle) DO UPDATE SET dernier = MAX(dernier, excluded.dernier)")
+SQL_AJOUTER = "INSERT INTO livres (id, nom, auteur, editeur) VALUES (:id, :nom, :auteur, :editeur)"
+SQL_IMPORTER = "INSERT OR IGNORE INTO livres (id, nom, auteur, editeur) VALUES (:id, :nom, :auteur, :editeur)"
+SQL_MODIFIER = "UPDATE livres SET nom = :nom, auteur = :auteur, editeur = :editeur WHERE id = :id"
+SQL_SUPPRIMER = "DELETE FROM livres WHERE id = ?"
+SQL_VIDER = "DELETE FROM livres"
+
+
+def _ligne_vers_livre(ligne: tuple) -> dict:
+    # Convertit une ligne (id, nom, auteur, editeur) dans le format utilisé par les routes
+    return {"id": ligne[0], "nom": ligne[1], "auteur": ligne[2], "editeur": ligne[3]}
+
+
+# Champs sur lesquels on peut filtrer (voir CHAMPS_FILTRE dans catalogue.py)
+CHAMPS_FILTRE_SQL = ("auteur", "editeur")
+
+
+def _conditions_filtres(filtres: dict) -> str:
+    # Conditions SQL des filtres (valeurs passées en paramètres :filtre_<champ>), appuyées sur les index des filtres
+    for champ in filtres:
+        if champ not in CHAMPS_FILTRE_SQL:
+            raise ValueError(f"Filtre inconnu : {champ!r}")
+    return " AND ".join(f"normaliser({champ}) = :filtre_{champ}" for champ in sorted(filtres)) or "1"
+
+
+def _requetes_tranche(tri: str, direction: str, avec_cle: bool, filtres: dict) -> tuple[str, str, str]:
+    """
+    Construit les requêtes d'une page triée (pagination par clé), du rang de sa clé de départ et du total.
+
+    L'ordre est celui des index triés en mémoire, (casefold(valeur), id) ; les conditions sont écrites de sorte que
+    SQLite parcoure l'index de tri à partir de la clé du curseur, en O(log n + limite), au lieu de tout relire.
+
+    Returns:
+        tuple[str, str, str]: La requête des livres de la page, celle du nombre de livres placés avant la clé,
+            et celle du nombre total de livres correspondant aux filtres.
+    """
+    if tri not in CHAMPS_TRI:
+        raise ValueError(f"Tri inconnu : {tri!r}")
+    filtre = _conditions_filtres(filtres)
+    apres = direction == "suivant"
+    sens = "" if apres else " DESC"
+    if tri == "id":
+        ordre = f"id{sens}"
+        condition = ("id > :id" if apres else "id < :id") if avec_cle else "1"
+        avant = "id <= :id" if apres else "id < :id"
+    else:
+        expression = f"casefold({tri})"
+        ordre = f"{expression}{sens}, id{sens}"
+        if not avec_cle:
+            condition = "1"
+        elif apres:
+            condition = f"{expression} >= :valeur AND ({expression} > :valeur OR id > :id)"
+        else:
+            condition = f"{expression} <= :valeur AND ({expression} < :valeur OR id < :id)"
+        avant = (f"{expression} <= :valeur AND ({expression} < :valeur OR id <= :id)" if apres
+                 else f"{expression} <= :valeur AND ({expression} < :valeur OR id < :id)")
+    page = f"SELECT id, nom, auteur, editeur FROM livres WHERE ({condition}) AND {filtre} ORDER BY {ordre} LIMIT :limite"
+    return (page, f"SELECT COUNT(*) FROM livres WHERE ({avant}) AND {filtre}",
+            f"SELECT COUNT(*) FROM livres WHERE {filtre}")
+
+
+class PoolSature(RuntimeError):
+    """
+    Levée quand aucune connexion du pool ne s'est libérée dans le délai d'attente : le worker est saturé.
+    Les applications la traduisent en réponse 503, plutôt que de laisser la requête attendre indéfiniment.
+    """
+
+
+class PoolConnexions:
+    """
+    Pool de connexions SQLite propre au processus (un pool par worker uvicorn).
+
+    Les routes synchrones s'exécutent dans un pool de threads : chaque requête emprunte une connexion
+    libre au lieu d'en ouvrir une nouvelle, et ses requêtes préparées restent en cache.
+    """
+
+    def __init__(self, chemin: str, taille: int = 8, attente: float = 5.0):
+        """
+        Args:
+            chemin (str): Le chemin de la base SQLite.
+            taille (int): Le nombre maximal de connexions ouvertes.
+            attente (float): Le délai maximal d'attente d'une connexion libre, en secondes.
+        """
+        self.chemin = chemin
+        self.attente = attente
+        self._libres = queue.LifoQueue()
+        self._semaphore = queue.Queue(maxsize=taille)  # Compte les connexions créées
+        self._toutes = []
+
+    def _ouvrir(self) -> sqlite3.Connection:
+        connexion = sqlite3.connect(self.chemin, check_same_thread=False, cached_statements=64,
+                                    isolation_level=None)  # Transactions gérées explicitement
+        # WAL : les lecteurs ne bloquent pas l'écrivain (ni l'inverse), même entre plusieurs processus
+        connexion.execute("PRAGMA journal_mode=WAL")
+        connexion.execute("PRAGMA synchronous=NORMAL")
+        connexion.execute("PRAGMA busy_timeout=5000")
+        # Fonction utilisée par les index de tri : elle doit exister sur toute connexion qui écrit dans la table
+        connexion.create_function("casefold", 1, normaliser_tri, deterministic=True)
+        connexion.create_function("normaliser", 1, normaliser_valeur, deterministic=True)
+        return connexion
+
+    def ouvrir_dediee(self) -> sqlite3.Connection:
+        """
+        Ouvre une connexion hors du pool, que l'appelant ferme lui-même : pour les lectures longues (clichés d'un
+        export, ...), qui immobiliseraient sinon une connexion du pool pendant toute leur durée.
+        """
+        return self._ouvrir()
+
+    def _emprunter(self) -> sqlite3.Connection:
+        # Réutilise une connexion libre, en ouvre une nouvelle si la limite n'est pas atteinte, sinon attend
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self._semaphore.put_nowait(None)
+        except queue.Full:
+            try:
+                return self._libres.get(timeout=self.attente)
+            except queue.Empty:
+                raise PoolSature(f"Aucune connexion SQLite libre après {self.attente:g} s") from None
+        try:
+            connexion = self._ouvrir()
+        except sqlite3.Error:
+            self._semaphore.get_nowait()
+            raise
+        self._toutes.append(connexion)
+        return connexion
+
+    @contextmanager
+    def connexion(self):
+        """
+        Emprunte une connexion au pool pour la durée du bloc `with`.
+
+        Yields:
+            sqlite3.Connection: Une connexion ouverte sur la base.
+        """
+        connexion = self._emprunter()
+        try:
+            yield connexion
+        finally:
+            self._libres.put(connexion)
+
+    @contextmanager
+    def lecture(self):
+        """
+        Emprunte une connexion et exécute le bloc dans une transaction de lecture : toutes ses requêtes
+        voient le même état de la base (mode WAL), sans bloquer les écritures des autres workers.
+
+        Yields:
+            sqlite3.Connection: La connexion, dans une transaction de lecture.
+        """
+        with self.connexion() as connexion:
+            connexion.execute("BEGIN")
+            try:
+                yield connexion
+            finally:
+                connexion.execute("COMMIT")
+
+    @contextmanager
+    def transaction(self):
+        """
+        Emprunte une connexion et exécute le bloc dans une transaction d'écriture (BEGIN IMMEDIATE).
+
+        Yields:
+            sqlite3.Connection: La connexion, dans une transaction validée à la sortie du bloc.
+        """
+        with self.connexion() as connexion:
+            connexion.execute("BEGIN IMMEDIATE")
+            try:
+                yield connexion
+            except BaseException:
+                connexion.execute("ROLLBACK")
+                raise
+            connexion.execute("COMMIT")
+
+    def fermer(self) -> None:
+        for connexion in self._toutes:
+            connexion.close()
+        self._toutes.clear()
+
+
+class ClicheSQLite(Mapping):
+    """
+    Vue en lecture seule de la base, figée à une version (voir StockageSQLite.figer) : toutes ses lectures se font
+    dans une même transaction de lecture, qui voit la base telle qu'elle était à son début (mode WAL), sans bloquer
+    les écritures des workers.
+
+    Un cliché peut vivre aussi longtemps qu'un export : il a sa propre connexion, hors du pool, fermée à sa
+    libération. Quelques exports lents ne privent donc pas les autres requêtes de connexions.
+    """
+
+    def __init__(self, pool: PoolConnexions):
+        self._connexion = pool.ouvrir_dediee()
+        try:
+            self._connexion.execute("BEGIN")
+            # La première lecture fixe l'état de la base vu par toute la transaction
+            self.version = self._connexion.execute(SQL_VERSION).fetchone()[0]
+        except BaseException:
+            self._connexion.close()
+            raise
+        self._nombre = None
+
+    def get(self, id: int, defaut=None):
+        ligne = self._connexion.execute(SQL_GET, (id,)).fetchone()
+        return _ligne_vers_livre(ligne) if ligne is not None else defaut
+
+    def __getitem__(self, id: int) -> dict:
+        livre = self.get(id)
+        if livre is None:
+            raise KeyError(id)
+        return livre
+
+    def __iter__(self):
+        return iter([ligne[0] for ligne in self._connexion.execute(SQL_IDS)])
+
+    def __len__(self) -> int:
+        # COUNT(*) parcourt la table : compté seulement si on le demande
+        if self._nombre is None:
+            self._nombre = self._connexion.execute(SQL_COMPTER).fetchone()[0]
+        return self._nombre
+
+    def lister(self):
+        for lot in self.lister_par_lots(1000):
+            yield from lot
+
+    def lister_par_lots(self, taille: int):
+        dernier = 0
+        while True:
+            lignes = self._connexion.execute(SQL_LOT, (dernier, taille)).fetchall()
+            if not lignes:
+                return
+            yield [(ligne[0], _ligne_vers_livre(ligne)) for ligne in lignes]
+            dernier = lignes[-1][0]
+
+    def liberer(self) -> None:
+        if self._connexion is not None:
+            connexion, self._connexion = self._connexion, None
+            try:
+                connexion.execute("COMMIT")
+            finally:
+                connexion.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.liberer()
+
+
+class StockageSQLite:
+    """
+    Stockage des livres dans une base SQLite partagée par tous les workers.
+
+    Offre la même interface que StockageMemoire (get, ids, lister, lister_par_lots, compter, id_max, allouer_id, ajouter, modifier, supprimer, appliquer_lot),
+    plus l'état du catalogue et de chaque livre (version, etat, etat_livre), mais les données ne sont plus dupliquées dans chaque processus : tous les workers lisent et écrivent
+    le même catalogue.
+
+    Comme la base peut être modifiée par d'autres workers, les index en mémoire d'un processus seraient vite périmés :
+    le stockage est déclaré `partage` et le catalogue lui confie aussi les requêtes (pages triées, ...), exécutées en SQL.
+    """
+
+    partage = True
+
+    def __init__(self, chemin: str, taille_pool: int = 8, attente_pool: float = 5.0):
+        """
+        Args:
+            chemin (str): Le chemin de la base SQLite (créée si nécessaire).
+            taille_pool (int): Le nombre maximal de connexions ouvertes par ce processus.
+            attente_pool (float): Le délai maximal d'attente d'une connexion libre (voir PoolSature), en secondes.
+        """
+        dossier = os.path.dirname(os.path.abspath(chemin))
+        os.makedirs(dossier, exist_ok=True)
+        self.pool = PoolConnexions(chemin, taille_pool, attente_pool)
+        with self.pool.connexion() as connexion:
+            connexion.executescript(SQL_SCHEMA)
+        with self.pool.transaction() as connexion:
+            if connexion.execute(SQL_CHANGEMENTS_EXISTE).fetchone() is None:
+                for requete in SQL_DECLENCHEURS:
+                    connexion.execute(requete)
+            if connexion.execute(SQL_TEXTE_EXISTE).fetchone() is None:
+                for requete in SQL_TEXTE:
+                    connexion.execute(requete)
+
+    def get(self, id: int) -> dict | None:
+        with self.pool.connexion() as connexion:
+            ligne = connexion.execute(SQL_GET, (id,)).fetchone()
+        return _ligne_vers_livre(ligne) if ligne is not None else None
+
+    def get_plusieurs(self, ids: list[int]) -> dict[int, dict]:
+        with self.pool.connexion() as connexion:
+            lignes = connexion.execute(SQL_GET_PLUSIEURS, (json.dumps(ids),)).fetchall()
+        return {ligne[0]: _ligne_vers_livre(ligne) for ligne in lignes}
+
+    def contient(self, id: int) -> bool:
+        with self.pool.connexion() as connexion:
+            return connexion.execute(SQL_CONTIENT, (id,)).fetchone() is not None
+
+    def ids(self):
+        with self.pool.connexion() as connexion:
+            return iter([ligne[0] for ligne in connexion.execute(SQL_IDS)])
+
+    def lister(self):
+        with self.pool.connexion() as connexion:
+            return iter([(ligne[0], _ligne_vers_livre(ligne)) for ligne in connexion.execute(SQL_LISTER)])
+
+    def lister_par_lots(self, taille: int):
+        # Pagination par clé : chaque lot est une requête courte, la connexion n'est pas gardée entre deux lots
+        dernier = 0
+        while True:
+            with self.pool.connexion() as connexion:
+                lignes = connexion.execute(SQL_LOT, (dernier, taille)).fetchall()
+            if not lignes:
+                return
+            yield [(ligne[0], _ligne_vers_livre(ligne)) for ligne in lignes]
+            dernier = lignes[-1][0]
+
+    def compter(self) -> int:
+        with self.pool.connexion() as connexion:
+            return connexion.execute(SQL_COMPTER).fetchone()[0]
+
+    def filtrer(self, filtres: dict) -> set:
+        """
+        Renvoie les ID des livres correspondant à tous les filtres (voir Catalogue.filtrer).
+
+        Raises:
+            ValueError: Si un champ n'est pas filtrable.
+        """
+        requete = f"SELECT id FROM livres WHERE {_conditions_filtres(filtres)}"
+        parametres = {f"filtre_{champ}": normaliser_valeur(valeur) for champ, valeur in filtres.items()}
+        with self.pool.connexion() as connexion:
+            return {ligne[0] for ligne in connexion.execute(requete, parametres)}
+
+    def rechercher(self, requete: str, limite: int = 20, prefixe: bool = True) -> list[tuple[dict, float]]:
+        """
+        Recherche plein texte dans l'index FTS5 de la base (voir Catalogue.rechercher) : tous les mots doivent être
+        présents, le dernier peut être un début de mot, et les résultats sont classés par BM25.
+        """
+        termes = tokeniser(requete)
+        if not termes:
+            return []
+        # Chaque mot normalisé est cité tel quel : la requête de l'utilisateur ne peut pas injecter de syntaxe FTS5
+        expression = " ".join(f'"{terme}"' for terme in termes) + ("*" if prefixe else "")
+        with self.pool.connexion() as connexion:
+            lignes = connexion.execute(SQL_RECHERCHER, (expression, limite)).fetchall()
+        return [(_ligne_vers_livre(ligne), ligne[4]) for ligne in lignes]
+
+    def tranche(self, tri: str, cle: tuple | None, limite: int, direction: str,
+                filtres: dict | None = None) -> tuple[int, int, list]:
+        """
+        Lit une page de livres triés après (ou avant) la clé d'un curseur, comme IndexTrie.tranche.
+
+        Args:
+            tri (str): Le champ de tri (voir CHAMPS_TRI).
+            cle (tuple | None): La clé du curseur, (id,) ou (valeur normalisée, id), ou None pour la première page.
+            limite (int): Le nombre maximal de livres.
+            direction (str): "suivant" ou "precedent".
+            filtres (dict | None): Les filtres à appliquer, par exemple {"auteur": "Albert Camus"}.
+
+        Returns:
+            tuple[int, int, list]: Le rang du premier livre de la page, le nombre total de livres (filtrés),
+                et les couples (id, livre) de la page dans l'ordre de tri.
+
+        Raises:
+            ValueError: Si le champ de tri ou un filtre est invalide.
+        """
+        filtres = filtres or {}
+        requete_page, requete_rang, requete_total = _requetes_tranche(tri, direction, cle is not None, filtres)
+        parametres = {"limite": limite}
+        parametres.update({f"filtre_{champ}": normaliser_valeur(valeur) for champ, valeur in filtres.items()})
+        if cle is not None:
+            parametres.update({"id": cle[-1], "valeur": cle[0]})
+        # Une seule transaction de lecture : la page, son rang et le total sont cohérents entre eux
+        with self.pool.lecture() as connexion:
+            lignes = connexion.execute(requete_page, parametres).fetchall()
+            total = connexion.execute(requete_total, parametres).fetchone()[0]
+            avant = connexion.execute(requete_rang, parametres).fetchone()[0] if cle is not None else 0
+        if direction == "precedent":
+            lignes.reverse()
+            avant -= len(lignes)
+        return avant, total, [(ligne[0], _ligne_vers_livre(ligne)) for ligne in lignes]
+
+    def version(self) -> int:
+        # Une seule ligne lue par sa clé primaire : assez rapide pour être appelée à chaque requête
+        with self.pool.connexion() as connexion:
+            return connexion.execute(SQL_VERSION).fetchone()[0]
+
+    def etat(self) -> tuple[str, int, float]:
+        with self.pool.connexion() as connexion:
+            return tuple(connexion.execute(SQL_ETAT).fetchone())
+
+    def etat_livre(self, id: int) -> tuple[str, int, float] | None:
+        with self.pool.connexion() as connexion:
+            ligne = connexion.execute(SQL_ETAT_LIVRE, (id,)).fetchone()
+        return tuple(ligne) if ligne is not None else None
+
+    def changements_depuis(self, version: int, limite: int) -> list[tuple[int, str, int, dict | None]]:
+        """
+        Returns:
+            list[tuple[int, str, int, dict | None]]: Au plus `limite` changements postérieurs à `version`, faits par
+                n'importe quel worker, par version croissante : (version, op, id, livre), livre valant None pour une
+                suppression. Seuls les TAILLE_CHANGEMENTS derniers changements sont gardés dans la base.
+        """
+        with self.pool.connexion() as connexion:
+            lignes = connexion.execute(SQL_CHANGEMENTS, (version, limite)).fetchall()
+        return [(ligne[0], ligne[1], ligne[2], _ligne_vers_livre(ligne[2:]) if ligne[3] is not None else None)
+                for ligne in lignes]
+
+    def id_max(self) -> int:
+        # MAX sur la clé primaire : lecture directe de la fin de l'index, sans parcourir la table
+        with self.pool.connexion() as connexion:
+            return connexion.execute(SQL_ID_MAX).fetchone()[0]
+
+    def allouer_id(self) -> int:
+        # Le compteur est dans la base : deux workers ne peuvent pas recevoir le même ID
+        with self.pool.transaction() as connexion:
+            return connexion.execute(SQL_ALLOUER).fetchone()[0]
+
+    def ajouter(self, id: int, livre: dict) -> None:
+        # INSERT simple : si un autre worker a déjà ajouté ce livre, l'ajout échoue au lieu de l'écraser
+        try:
+            with self.pool.transaction() as connexion:
+                connexion.execute(SQL_AJOUTER, {**livre, "id": id})
+                connexion.execute(SQL_RETENIR_ID, {"id": id})
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Le livre avec l'ID {id} existe déjà !")
+
+    def modifier(self, id: int, livre: dict) -> None:
+        # UPDATE simple : un livre supprimé entre-temps par un autre worker n'est pas recréé
+        with self.pool.transaction() as connexion:
+            if connexion.execute(SQL_MODIFIER, {**livre, "id": id}).rowcount == 0:
+                raise KeyError(id)
+
+    def supprimer(self, id: int) -> None:
+        with self.pool.transaction() as connexion:
+            if connexion.execute(SQL_SUPPRIMER, (id,)).rowcount == 0:
+                raise KeyError(id)
+
+    def appliquer_lot(self, operations: list) -> list[int]:
+        """
+        Applique un lot d'opérations dans une seule transaction.
+
+        Returns:
+            list[int]: La position des opérations refusées : ajout d'un ID déjà présent, modification ou suppression
+                d'un livre absent (éventuellement à cause d'un autre worker). Les autres opérations sont appliquées.
+        """
+        refusees = []
+        with self.pool.transaction() as connexion:
+            for position, (op, id, livre) in enumerate(operations):
+                if op == "ajouter":
+                    try:
+                        connexion.execute(SQL_AJOUTER, {**livre, "id": id})
+                    except sqlite3.IntegrityError:
+                        # Seule l'instruction fautive est annulée, la transaction continue
+                        refusees.append(position)
+                        continue
+                    connexion.execute(SQL_RETENIR_ID, {"id": id})
+                elif op == "modifier":
+                    if connexion.execute(SQL_MODIFIER, {**livre, "id": id}).rowcount == 0:
+                        refusees.append(position)
+                elif connexion.execute(SQL_SUPPRIMER, (id,)).rowcount == 0:
+                    refusees.append(position)
+        return refusees
+
+    def remplacer(self, livres: dict) -> None:
+        with self.pool.transaction() as connexion:
+            connexion.execute(SQL_VIDER)
+            connexion.executemany(SQL_AJOUTER, ({**livre, "id": id} for id, livre in livres.items()))
+
+    def importer(self, livres: dict) -> int:
+        """
+        Importe des livres en une seule transaction, en ignorant les ID déjà présents.
+
+        Args:
+            livres (dict): Les livres à importer, indexés par leur ID.
+
+        Returns:
+            int: Le nombre de livres effectivement ajoutés.
+        """
+        with self.pool.transaction() as connexion:
+            avant = connexion.total_changes
+            connexion.executemany(SQL_IMPORTER, ({**livre, "id": id} for id, livre in livres.items()))
+            return connexion.total_changes - avant
+
+    def figer(self) -> ClicheSQLite:
+        """
+        Returns:
+            ClicheSQLite: Une vue de la base figée à sa version actuelle, à libérer après usage (bloc `with`).
+        """
+        return ClicheSQLite(self.pool)
+
+    def sauvegarder(self, chemin: str) -> int:
+        """
+        Copie la base dans `chemin` pendant que les workers continuent de lire et d'écrire (API de sauvegarde
+        de SQLite) : la copie est cohérente, elle correspond à un seul état de la base.
+
+        Returns:
+            int: La version du catalogue contenue dans la copie.
+        """
+        temporaire = chemin + ".tmp"
+        with self.pool.lecture() as connexion:
+            version = connexion.execute(SQL_VERSION).fetchone()[0]
+            destination = sqlite3.connect(temporaire)
+            try:
+                connexion.backup(destination)
+            finally:
+                destination.close()
+        os.replace(temporaire, chemin)
+        return version
+
+    def fermer(self) -> None:
+        self.pool.fermer()
+
+
+def importer_json(chemin_json: str, chemin_sqlite: str) -> int:
+    """
+    Importe (une seule fois) le contenu d'un fichier livres.json dans une base SQLite.
+
+    L'import est idempotent : relancé sur une base déjà remplie, il n'ajoute que les ID absents.
+
+    Args:
+        chemin_json (str): Le fichier JSON contenant la liste des livres.
+        chemin_sqlite (str): La base SQLite de destination.
+
+    Returns:
+        int: Le nombre de livres ajoutés.
+    """
+    with open(chemin_json, "r", encoding="utf-8") as f:
+        # Comme pour les autres stockages, l'ID d'un livre est sa position dans le fichier en partant de 1
+        livres = {k + 1: {**v, "id": k + 1} for k, v in enumerate(json.load(f))}
+    stockage = StockageSQLite(chemin_sqlite, taille_pool=1)
+    try:
+        return stockage.importer(livres)
+    finally:
+        stockage.fermer()
+
+
+#Permet d'importer livres.json à la main : python -m catalogue.sqlite data/livres.json livres.db
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("Usage : python -m catalogue.sqlite <livres.json> <base.db>")
+    print(f"{importer_json(sys.argv[1], sys.argv[2])} livre(s) importé(s) dans {sys.argv[2]}")
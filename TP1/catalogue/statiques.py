@@ -0,0 +1,139 @@
+import hashlib
+import os
+import posixpath
+from mimetypes import guess_type
+
+from jinja2 import pass_context
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+
+from .compression import (ENCODAGES, NIVEAUX_STATIQUES, choisir_encodage, compresser, compressible, etag_encode,
+                          etiquette_correspondante)
+
+# Nombre de caractères hexadécimaux de l'empreinte (SHA-256 du contenu) ajoutée au nom des fichiers
+TAILLE_EMPREINTE = 12
+# Un fichier dont le nom contient l'empreinte de son contenu ne change jamais : les navigateurs le gardent un an
+# sans jamais le redemander. Sous son nom d'origine, il est revalidé à chaque fois (réponse 304 par l'ETag).
+CACHE_IMMUABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDE = "no-cache"
+
+
+def empreinte(contenu: bytes) -> str:
+    """
+    Returns:
+        str: L'empreinte d'un contenu : le début de son SHA-256, en hexadécimal.
+    """
+    return hashlib.sha256(contenu).hexdigest()[:TAILLE_EMPREINTE]
+
+
+def nom_avec_empreinte(chemin: str, empreinte: str) -> str:
+    """
+    Returns:
+        str: Le chemin d'un fichier avec l'empreinte de son contenu avant l'extension : css/style.css -> css/style.3f2a9c1b7e4d.css.
+    """
+    racine, extension = posixpath.splitext(chemin)
+    return f"{racine}.{empreinte}{extension}"
+
+
+class FichiersStatiques:
+    """
+    Application ASGI servant les fichiers d'un dossier (CSS, images, ...) depuis la mémoire, à monter à la place de
+    StaticFiles (app.mount("/static", FichiersStatiques("static"), name="static")).
+
+    Au démarrage, chaque fichier est lu une fois, reçoit une empreinte de son contenu (voir nom_avec_empreinte) et,
+    s'il est textuel, est compressé au niveau maximal en gzip (et brotli) ; les en-têtes de chaque réponse sont
+    préparés. Une requête ne touche plus au disque : ni stat, ni lecture, ni compression.
+
+    Les templates obtiennent l'URL avec empreinte par url_statique (voir installer) : servie avec
+    Cache-Control immutable, elle change dès que le contenu du fichier change. Un fichier modifié n'est pris en compte
+    qu'au redémarrage de l'application.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory (str): Le dossier des fichiers à servir.
+        """
+        self.directory = directory
+        # Chemin d'origine -> chemin avec empreinte
+        self.empreintes = {}
+        # (chemin demandé, encodage ou None) -> (en-têtes, octets) ; chemin demandé -> ETag
+        self._reponses = {}
+        self._etags = {}
+        for dossier, _, noms in os.walk(directory):
+            for nom in sorted(noms):
+                complet = os.path.join(dossier, nom)
+                with open(complet, "rb") as f:
+                    contenu = f.read()
+                chemin = os.path.relpath(complet, directory).replace(os.sep, "/")
+                self._ajouter(chemin, contenu)
+
+    def _ajouter(self, chemin: str, contenu: bytes) -> None:
+        signature = empreinte(contenu)
+        avec_empreinte = nom_avec_empreinte(chemin, signature)
+        self.empreintes[chemin] = avec_empreinte
+        type_contenu = guess_type(chemin)[0] or "application/octet-stream"
+        if type_contenu.startswith("text/"):
+            type_contenu += "; charset=utf-8"
+        versions = {None: contenu}
+        if compressible(type_contenu):
+            for encodage in ENCODAGES:
+                compresse = compresser(contenu, encodage, NIVEAUX_STATIQUES)
+                # Une version compressée n'est gardée que si elle est plus petite
+                if len(compresse) < len(contenu):
+                    versions[encodage] = compresse
+        etag = f'"{signature}"'
+        for demande, cache in ((chemin, CACHE_REVALIDE), (avec_empreinte, CACHE_IMMUABLE)):
+            self._etags[demande] = etag
+            for encodage, octets in versions.items():
+                entetes = [(b"content-type", type_contenu.encode("latin-1")), (b"content-length", str(len(octets)).encode()),
+                           (b"etag", etag_encode(etag, encodage).encode()), (b"cache-control", cache.encode())]
+                if len(versions) > 1:
+                    entetes.append((b"vary", b"Accept-Encoding"))
+                if encodage is not None:
+                    entetes.append((b"content-encoding", encodage.encode()))
+                self._reponses[demande, encodage] = (entetes, octets)
+
+    def chemin_avec_empreinte(self, chemin: str) -> str:
+        """
+        Returns:
+            str: Le chemin avec empreinte d'un fichier du dossier (le chemin tel quel si le fichier n'existe pas).
+        """
+        chemin = chemin.lstrip("/")
+        return self.empreintes.get(chemin, chemin)
+
+    @pass_context
+    def url_statique(self, contexte, chemin: str) -> str:
+        """
+        Fonction des templates : {{ url_statique('style.css') }} donne l'URL du fichier avec son empreinte,
+        comme {{ url_for('static', path='/style.css') }} donnait celle du fichier.
+        """
+        return str(contexte["request"].url_for("static", path="/" + self.chemin_avec_empreinte(chemin)))
+
+    def installer(self, environnement) -> None:
+        """
+        Rend url_statique disponible dans les templates d'un environnement Jinja2 (par exemple Jinja2Templates.env).
+        """
+        environnement.globals["url_statique"] = self.url_statique
+
+    async def __call__(self, scope, receive, send):
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        chemin = scope["path"].removeprefix(scope.get("root_path", "")).lstrip("/")
+        etag = self._etags.get(chemin)
+        if etag is None:
+            raise HTTPException(status_code=404)
+        entetes_requete = Headers(scope=scope)
+        si_aucun = entetes_requete.get("if-none-match")
+        correspondante = etiquette_correspondante(si_aucun, etag) if si_aucun is not None else None
+        if correspondante is not None:
+            entetes, _ = self._reponses[chemin, None]
+            await send({"type": "http.response.start", "status": 304,
+                        "headers": [(b"etag", correspondante.encode())]
+                                   + [entete for entete in entetes if entete[0] in (b"cache-control", b"vary")]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        encodage = choisir_encodage(entetes_requete.get("accept-encoding", ""))
+        entetes, octets = self._reponses.get((chemin, encodage)) or self._reponses[chemin, None]
+        await send({"type": "http.response.start", "status": 200, "headers": entetes})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else octets})
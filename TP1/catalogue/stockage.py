@@ -0,0 +1,587 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from collections.abc import Mapping
+from contextlib import contextmanager
+from itertools import chain
+
+from .instantane import CatalogueSuperpose, VueInstantane, chemin_instantane, ecrire_instantane, instantanes
+from .journal import Journal
+
+# Nombre d'ID lus à la fois lors d'un parcours complet du stockage (voir ids, lister)
+TAILLE_TRANCHE = 1000
+
+
+class LivresTries(dict):
+    """
+    Dictionnaire {id: livre} qui tient aussi à jour la liste triée de ses ID.
+
+    Les lectures restent celles d'un dict ; la liste triée permet de parcourir le catalogue par ID croissant,
+    un lot après l'autre (pagination par clé), sans copier toutes les clés (voir ids_apres).
+
+    Les écritures sont faites une à la fois (verrou du stockage). La liste triée est lue sans verrou, comme les
+    colonnes de LivresCompacts : une lecture pendant laquelle la liste a changé est recommencée (un ID supprimé
+    avant la position cherchée décale tous les suivants, la tranche lue en sauterait un).
+    """
+
+    def __init__(self, livres=()):
+        super().__init__(livres)
+        self.ids_tries = sorted(self)
+        # Nombre de modifications de la liste triée, impair pendant une modification
+        self._ecritures = 0
+
+    def __setitem__(self, id: int, livre: dict) -> None:
+        if id not in self:
+            self._ecritures += 1
+            try:
+                # Les nouveaux ID sont presque toujours les plus grands : ajout en fin de liste
+                if not self.ids_tries or id > self.ids_tries[-1]:
+                    self.ids_tries.append(id)
+                else:
+                    insort(self.ids_tries, id)
+            finally:
+                self._ecritures += 1
+        super().__setitem__(id, livre)
+
+    def __delitem__(self, id: int) -> None:
+        super().__delitem__(id)
+        self._ecritures += 1
+        try:
+            del self.ids_tries[bisect_left(self.ids_tries, id)]
+        finally:
+            self._ecritures += 1
+
+    def _lire(self, lecture):
+        # Lecture sans verrou : on recommence si la liste triée a été modifiée pendant la lecture
+        while True:
+            ecritures = self._ecritures
+            if ecritures % 2 == 0:
+                resultat = lecture(self.ids_tries)
+                if self._ecritures == ecritures:
+                    return resultat
+            time.sleep(0)
+
+    def pop(self, id: int, *defaut):
+        if id in self:
+            livre = self[id]
+            del self[id]
+            return livre
+        if defaut:
+            return defaut[0]
+        raise KeyError(id)
+
+    def ids_apres(self, id: int | None, nombre: int) -> list[int]:
+        """
+        Returns:
+            list[int]: Au plus `nombre` ID présents, strictement supérieurs à `id` (tous si id vaut None), par ordre croissant.
+        """
+        def lecture(ids):
+            debut = 0 if id is None else bisect_right(ids, id)
+            return ids[debut:debut + nombre]
+        return self._lire(lecture)
+
+    def ids_avant(self, id: int, nombre: int) -> list[int]:
+        """
+        Returns:
+            list[int]: Au plus `nombre` ID présents, strictement inférieurs à `id` (les plus proches), par ordre croissant.
+        """
+        def lecture(ids):
+            fin = bisect_left(ids, id)
+            return ids[max(0, fin - nombre):fin]
+        return self._lire(lecture)
+
+    def rang(self, id: int) -> int:
+        """
+        Returns:
+            int: Le nombre d'ID présents strictement inférieurs à `id`.
+        """
+        return bisect_left(self.ids_tries, id)
+
+
+class Cliche(Mapping):
+    """
+    Vue en lecture seule d'un stockage en mémoire, figée à une version (voir StockageMemoire.figer) : tant qu'elle
+    n'est pas libérée, ses lectures ignorent toutes les écritures faites après sa création, sans les empêcher ni
+    les retarder. Un parcours complet (liste, export, sauvegarde) voit donc un catalogue cohérent, jamais à moitié
+    modifié, même s'il dure longtemps.
+
+    Le cliché ne copie rien : il lit les livres actuels du stockage et, pour ceux modifiés depuis sa version,
+    l'ancienne valeur conservée par le stockage (voir StockageMemoire._historique).
+    """
+
+    def __init__(self, stockage, version: int, nombre: int):
+        self.stockage = stockage
+        self.version = version
+        self._nombre = nombre
+        self._libere = False
+
+    def get(self, id: int, defaut=None):
+        # Valeur actuelle lue avant l'historique : une écriture conserve l'ancienne valeur avant de la remplacer
+        livre = self.stockage.livres.get(id)
+        anciens = self.stockage._historique.get(id)
+        if anciens:
+            for version, ancien in anciens:
+                # La première écriture postérieure au cliché a conservé la valeur qu'il doit voir
+                if version > self.version:
+                    livre = ancien
+                    break
+        return defaut if livre is None else livre
+
+    def __getitem__(self, id: int) -> dict:
+        livre = self.get(id)
+        if livre is None:
+            raise KeyError(id)
+        return livre
+
+    def __contains__(self, id: object) -> bool:
+        return self.get(id) is not None
+
+    def __iter__(self):
+        for lot in self.lister_par_lots(TAILLE_TRANCHE):
+            for id, _ in lot:
+                yield id
+
+    def __len__(self) -> int:
+        return self._nombre
+
+    def lister(self):
+        """
+        Returns:
+            Iterator[tuple[int, dict]]: Les couples (id, livre) du cliché par ID croissant.
+        """
+        for lot in self.lister_par_lots(TAILLE_TRANCHE):
+            yield from lot
+
+    def lister_par_lots(self, taille: int):
+        """
+        Parcourt le cliché par lots de `taille` livres au plus, par ID croissant (voir StockageMemoire.lister_par_lots).
+
+        Yields:
+            list[tuple[int, dict]]: Des lots de couples (id, livre).
+        """
+        dernier = None
+        while True:
+            livres = self.stockage.livres
+            ids = livres.ids_apres(dernier, taille)
+            borne = ids[-1] if len(ids) == taille else None
+            # Valeurs actuelles lues avant l'historique (voir get) : seuls les livres modifiés depuis le cliché sont relus
+            lot = {id: livres.get(id) for id in ids}
+            historique = self.stockage._historique
+            if historique:
+                # Livres modifiés depuis le cliché dans cette tranche d'ID, y compris ceux supprimés depuis
+                for id in list(historique):
+                    if (dernier is None or id > dernier) and (borne is None or id <= borne):
+                        lot[id] = self.get(id)
+                lot = dict(sorted(lot.items()))
+            paires = [(id, livre) for id, livre in lot.items() if livre is not None]
+            for debut in range(0, len(paires), taille):
+                yield paires[debut:debut + taille]
+            if borne is None:
+                return
+            dernier = borne
+
+    def liberer(self) -> None:
+        """
+        Libère le cliché : les anciennes valeurs qu'il était le seul à lire peuvent être oubliées.
+        """
+        if not self._libere:
+            self._libere = True
+            self.stockage._liberer(self.version)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.liberer()
+
+
+class StockageMemoire:
+    """
+    Stockage des livres en mémoire, dans un dictionnaire indexé par l'ID du livre.
+
+    C'est le comportement historique de l'application : rien n'est conservé après un redémarrage.
+    Les autres stockages reprennent la même interface (get, contient, ids, lister, lister_par_lots, compter, id_max, allouer_id,
+    ajouter, modifier, supprimer, appliquer_lot).
+
+    Les écritures sont faites une à la fois (verrou du stockage, pris le temps de l'écriture seulement) ; les lectures
+    n'en prennent aucun. Les parcours (ids, lister) avancent par tranches d'ID triés : une écriture concurrente ne les
+    interrompt jamais, chaque livre est vu tel qu'il était avant ou après elle.
+
+    Chaque écriture crée une nouvelle version du stockage. Un lecteur qui doit voir un état cohérent de tout le
+    catalogue (liste complète, export, sauvegarde) fige une version (voir figer) : tant qu'un cliché est ouvert,
+    les écritures conservent l'ancienne valeur des livres qu'elles remplacent (copie à l'écriture, sans copier les
+    livres eux-mêmes), et ces anciennes valeurs sont oubliées dès que plus aucun cliché ne peut les lire.
+    """
+
+    # Le dictionnaire {id: livre} utilisé (voir StockageCompact pour une représentation plus compacte)
+    type_livres = LivresTries
+
+    def __init__(self, livres: dict | None = None):
+        """
+        Args:
+            livres (dict | None): Les livres initiaux, indexés par leur ID.
+        """
+        self.livres = self.type_livres(livres or {})
+        self._verrou = threading.RLock()
+        # Plus grand ID jamais utilisé : permet d'allouer un nouvel ID sans parcourir le dictionnaire
+        self.dernier_id = max(self.livres, default=0)
+        # Versions : numéro de la dernière écriture, clichés ouverts par version, anciennes valeurs des livres modifiés
+        # depuis le plus ancien cliché ouvert {id: [(version de l'écriture, valeur remplacée ou None), ...]}
+        self._verrou_versions = threading.Lock()
+        self.derniere_version = 0
+        self._cliches = Counter()
+        self._historique = {}
+
+    def get(self, id: int) -> dict | None:
+        """
+        Returns:
+            dict | None: Le livre correspondant à l'ID, ou None s'il n'existe pas.
+        """
+        return self.livres.get(id)
+
+    def get_plusieurs(self, ids: list[int]) -> dict[int, dict]:
+        """
+        Returns:
+            dict[int, dict]: Les livres trouvés parmi `ids`, par ID ; les ID absents sont omis.
+        """
+        livres = self.livres
+        return {id: livre for id, livre in ((id, livres.get(id)) for id in ids) if livre is not None}
+
+    def contient(self, id: int) -> bool:
+        return id in self.livres
+
+    def ids(self):
+        """
+        Returns:
+            Iterator[int]: Les ID des livres par ordre croissant.
+        """
+        dernier = None
+        while True:
+            ids = self.livres.ids_apres(dernier, TAILLE_TRANCHE)
+            if not ids:
+                return
+            yield from ids
+            dernier = ids[-1]
+
+    def lister(self):
+        """
+        Returns:
+            Iterator[tuple[int, dict]]: Les couples (id, livre) par ID croissant.
+        """
+        for lot in self.lister_par_lots(TAILLE_TRANCHE):
+            yield from lot
+
+    def lister_par_lots(self, taille: int):
+        """
+        Parcourt le catalogue par lots, sans jamais construire la liste complète des livres.
+
+        Args:
+            taille (int): Le nombre maximal de livres par lot.
+
+        Yields:
+            list[tuple[int, dict]]: Des lots de couples (id, livre), par ID croissant.
+        """
+        # Pagination par clé sur les ID triés : un seul lot d'ID en mémoire à la fois, et le catalogue
+        # peut être modifié entre deux lots (on repart simplement du dernier ID envoyé)
+        dernier = None
+        while True:
+            ids = self.livres.ids_apres(dernier, taille)
+            if not ids:
+                return
+            lot = [(id, livre) for id, livre in ((id, self.livres.get(id)) for id in ids) if livre is not None]
+            if lot:
+                yield lot
+            dernier = ids[-1]
+
+    def compter(self) -> int:
+        return len(self.livres)
+
+    def tranche_ids(self, cle: int | None, limite: int, direction: str) -> tuple[int, list[int]]:
+        """
+        Renvoie une page d'ID croissants après (ou avant) l'ID d'un curseur, comme IndexTrie.tranche pour le tri par ID,
+        mais directement à partir des ID triés du stockage : aucun livre n'est lu ni décodé.
+
+        Returns:
+            tuple[int, list[int]]: Le rang du premier ID de la page et les ID de la page.
+        """
+        if cle is not None and direction == "precedent":
+            ids = self.livres.ids_avant(cle, limite)
+        else:
+            ids = self.livres.ids_apres(cle, limite)
+        return (self.livres.rang(ids[0]) if ids else 0), ids
+
+    def id_max(self) -> int:
+        """
+        Returns:
+            int: Le plus grand ID attribué depuis le chargement (0 si le catalogue est vide).
+        """
+        return self.dernier_id
+
+    def allouer_id(self) -> int:
+        """
+        Returns:
+            int: Un ID strictement supérieur à tous les ID déjà attribués, réservé pour un prochain ajout.
+        """
+        with self._verrou:
+            self.dernier_id += 1
+            return self.dernier_id
+
+    def ajouter(self, id: int, livre: dict) -> None:
+        """
+        Raises:
+            ValueError: Si un livre avec cet ID existe déjà (il n'est jamais écrasé).
+        """
+        with self._verrou:
+            if id in self.livres:
+                raise ValueError(f"Le livre avec l'ID {id} existe déjà !")
+            with self._nouvelle_version((id,)):
+                self.livres[id] = livre
+            self.dernier_id = max(self.dernier_id, id)
+
+    def modifier(self, id: int, livre: dict) -> None:
+        with self._verrou, self._nouvelle_version((id,)):
+            self.livres[id] = livre
+
+    def supprimer(self, id: int) -> None:
+        with self._verrou:
+            if id not in self.livres:
+                raise KeyError(id)
+            with self._nouvelle_version((id,)):
+                del self.livres[id]
+
+    def appliquer_lot(self, operations: list) -> None:
+        """
+        Applique un lot d'opérations d'un seul coup.
+
+        Args:
+            operations (list): Des triplets (op, id, livre) où op vaut "ajouter", "modifier" ou "supprimer"
+                (livre vaut None pour une suppression). Les opérations ont déjà été validées.
+        """
+        with self._verrou, self._nouvelle_version(id for _, id, _ in operations):
+            for op, id, livre in operations:
+                if op == "supprimer":
+                    self.livres.pop(id, None)
+                else:
+                    self.livres[id] = livre
+                    self.dernier_id = max(self.dernier_id, id)
+
+    def remplacer(self, livres: dict) -> None:
+        """
+        Remplace l'ensemble du catalogue (utilisé pour les réécritures complètes).
+        """
+        with self._verrou:
+            nouveaux = self.type_livres(livres)
+            with self._nouvelle_version(chain(self.ids(), nouveaux)):
+                self.livres = nouveaux
+            self.dernier_id = max(self.livres, default=0)
+
+    def fermer(self) -> None:
+        pass
+
+    def figer(self) -> Cliche:
+        """
+        Fige la version actuelle du stockage, à libérer après usage (bloc `with`, ou Cliche.liberer).
+
+        Returns:
+            Cliche: La vue du stockage à cette version, qui ne voit aucune des écritures suivantes.
+        """
+        with self._verrou_versions:
+            self._cliches[self.derniere_version] += 1
+            return Cliche(self, self.derniere_version, len(self.livres))
+
+    def _liberer(self, version: int) -> None:
+        with self._verrou_versions:
+            self._cliches[version] -= 1
+            if not self._cliches[version]:
+                del self._cliches[version]
+            if not self._cliches:
+                self._historique = {}
+                return
+            # Les valeurs remplacées avant (ou à) la version du plus ancien cliché ouvert ne seront plus lues
+            plus_ancien = min(self._cliches)
+            historique = {}
+            for id, anciens in self._historique.items():
+                anciens = [ancien for ancien in anciens if ancien[0] > plus_ancien]
+                if anciens:
+                    historique[id] = anciens
+            self._historique = historique
+
+    @contextmanager
+    def _nouvelle_version(self, ids):
+        # Entoure l'application d'une écriture sur les livres `ids` (un itérable parcouru seulement si un cliché est
+        # ouvert) : les anciennes valeurs sont conservées avant d'être remplacées, puis la version est publiée.
+        # Un cliché ne peut pas être créé pendant ce temps : il voit l'écriture entière ou pas du tout.
+        with self._verrou_versions:
+            if self._cliches:
+                version = self.derniere_version + 1
+                for id in ids:
+                    self._historique.setdefault(id, []).append((version, self.livres.get(id)))
+            yield
+            self.derniere_version += 1
+
+
+class StockageJournal(StockageMemoire):
+    """
+    Stockage en mémoire rendu durable par un journal en ajout seul et des instantanés périodiques.
+
+    - Chaque mutation écrit un seul enregistrement dans le journal : le coût en E/S est O(1),
+      et non O(taille du catalogue) comme une réécriture complète de livres.json.
+    - Quand le journal devient plus long que le catalogue lui-même (et au moins `seuil_compactage`),
+      il est compacté : le catalogue est écrit dans un instantané puis le journal est vidé.
+    - L'instantané est un fichier binaire projeté en mémoire (voir catalogue.instantane) : au démarrage on n'en lit
+      que l'en-tête, puis on rejoue la fin du journal. Les livres sont décodés à la demande, seuls les livres modifiés
+      depuis le dernier instantané sont gardés en mémoire.
+    """
+
+    def __init__(self, dossier: str, chemin_initial: str | None = None, seuil_compactage: int = 1000,
+                 fsync_lot: int = 64, fsync_delai: float = 0.05):
+        """
+        Args:
+            dossier (str): Le dossier contenant l'instantané et le journal.
+            chemin_initial (str | None): Le fichier JSON (liste de livres) utilisé si aucun instantané n'existe.
+            seuil_compactage (int): Nombre minimal d'enregistrements du journal avant compactage.
+            fsync_lot (int): Voir Journal.
+            fsync_delai (float): Voir Journal.
+        """
+        super().__init__()
+        os.makedirs(dossier, exist_ok=True)
+        self.dossier = dossier
+        self.seuil_compactage = seuil_compactage
+        self.sequence = 0  # Numéro de séquence de la dernière opération appliquée
+        self._taille_journal = 0  # Nombre d'enregistrements présents dans le journal
+
+        sequence_instantane = self._charger_instantane(chemin_initial)
+        self.journal = Journal(os.path.join(dossier, "livres.journal"), fsync_lot, fsync_delai)
+        for enregistrement in self.journal.rejouer():
+            self._taille_journal += 1
+            # Les opérations déjà contenues dans l'instantané sont ignorées (arrêt entre le renommage et la troncature)
+            if enregistrement["seq"] > sequence_instantane:
+                self._appliquer(enregistrement)
+                self.sequence = enregistrement["seq"]
+        self.dernier_id = max(self.dernier_id, self.livres.id_max())
+
+    def _charger_instantane(self, chemin_initial: str | None) -> int:
+        # Projette en mémoire le dernier instantané. S'il n'y en a pas encore, on convertit une seule fois
+        # l'ancien instantané JSON ou le fichier JSON initial : les démarrages suivants n'auront plus à le lire.
+        existants = instantanes(self.dossier)
+        if not existants:
+            ancien = os.path.join(self.dossier, "livres.snapshot.json")
+            livres = {}
+            if os.path.exists(ancien):
+                with open(ancien, "r", encoding="utf-8") as f:
+                    instantane = json.load(f)
+                livres = {id: livre for id, livre in instantane["livres"]}
+                self.sequence = instantane["seq"]
+            elif chemin_initial is not None:
+                with open(chemin_initial, "r", encoding="utf-8") as f:
+                    # Comme auparavant, l'ID d'un livre est sa position dans le fichier en partant de 1
+                    livres = {k + 1: v for k, v in enumerate(json.load(f))}
+            ecrire_instantane(chemin_instantane(self.dossier, self.sequence), livres, self.sequence)
+            existants = instantanes(self.dossier)
+        vue = VueInstantane(existants[-1][1])
+        self.livres = CatalogueSuperpose(vue)
+        self.sequence = vue.sequence
+        # Le plus grand ID attribué survit aux suppressions et aux redémarrages : un ID n'est jamais réutilisé
+        self.dernier_id = vue.dernier_id
+        return self.sequence
+
+    def _appliquer(self, enregistrement: dict) -> None:
+        # Applique une opération relue du journal ; les opérations sont idempotentes
+        if enregistrement["op"] == "lot":
+            for operation in enregistrement["ops"]:
+                self._appliquer(operation)
+        elif enregistrement["op"] == "del":
+            self.livres.pop(enregistrement["id"], None)
+        else:
+            self.livres[enregistrement["id"]] = enregistrement["livre"]
+            self.dernier_id = max(self.dernier_id, enregistrement["id"])
+
+    def _journaliser(self, op: str, id: int, livre: dict | None = None) -> None:
+        # Écrit l'opération dans le journal avant qu'elle ne soit visible en mémoire
+        self.sequence += 1
+        enregistrement = {"seq": self.sequence, "op": op, "id": id}
+        if livre is not None:
+            enregistrement["livre"] = livre
+        self.journal.ecrire(enregistrement)
+        self._taille_journal += 1
+
+    def _peut_compacter(self) -> None:
+        if self._taille_journal >= max(self.seuil_compactage, len(self.livres)):
+            self.compacter()
+
+    def ajouter(self, id: int, livre: dict) -> None:
+        with self._verrou:
+            if id in self.livres:
+                raise ValueError(f"Le livre avec l'ID {id} existe déjà !")
+            self._journaliser("put", id, livre)
+            with self._nouvelle_version((id,)):
+                self.livres[id] = livre
+            self.dernier_id = max(self.dernier_id, id)
+            self._peut_compacter()
+
+    def modifier(self, id: int, livre: dict) -> None:
+        with self._verrou:
+            self._journaliser("put", id, livre)
+            with self._nouvelle_version((id,)):
+                self.livres[id] = livre
+            self._peut_compacter()
+
+    def supprimer(self, id: int) -> None:
+        with self._verrou:
+            if id not in self.livres:
+                raise KeyError(id)
+            self._journaliser("del", id)
+            with self._nouvelle_version((id,)):
+                del self.livres[id]
+            self._peut_compacter()
+
+    def appliquer_lot(self, operations: list) -> None:
+        # Tout le lot tient dans un seul enregistrement du journal : après un arrêt brutal,
+        # il est soit entièrement rejoué, soit entièrement ignoré (ligne incomplète)
+        with self._verrou:
+            self.sequence += 1
+            ops = [{"op": "del", "id": id} if op == "supprimer" else {"op": "put", "id": id, "livre": livre}
+                   for op, id, livre in operations]
+            self.journal.ecrire({"seq": self.sequence, "op": "lot", "ops": ops})
+            self._taille_journal += len(ops)
+            super().appliquer_lot(operations)
+            self._peut_compacter()
+
+    def remplacer(self, livres: dict) -> None:
+        # Une réécriture complète ne passe pas par le journal : on écrit directement un nouvel instantané
+        with self._verrou:
+            nouveaux = LivresTries(livres)
+            with self._nouvelle_version(chain(self.ids(), nouveaux)):
+                self.livres = nouveaux
+            self.dernier_id = max(self.livres, default=0)
+            self.sequence += 1
+            self.compacter()
+
+    def compacter(self) -> None:
+        """
+        Écrit le catalogue complet dans un nouvel instantané puis vide le journal.
+        """
+        with self._verrou:
+            chemin = chemin_instantane(self.dossier, self.sequence)
+            # Un instantané de même séquence a forcément le même contenu : inutile de le réécrire
+            if not os.path.exists(chemin):
+                ecrire_instantane(chemin, self.livres, self.sequence, self.dernier_id)
+            # Les lectures suivantes passent par le nouvel instantané ; les modifications en mémoire sont libérées
+            self.livres = CatalogueSuperpose(VueInstantane(chemin))
+            self.journal.vider()
+            self._taille_journal = 0
+            # Les anciens instantanés ne servent plus (sous Windows, un fichier encore projeté ne peut pas être supprimé)
+            for _, ancien in instantanes(self.dossier)[:-1]:
+                try:
+                    os.remove(ancien)
+                except OSError:
+                    pass
+            ancien_json = os.path.join(self.dossier, "livres.snapshot.json")
+            if os.path.exists(ancien_json):
+                os.remove(ancien_json)
+
+    def fermer(self) -> None:
+        self.journal.fermer()
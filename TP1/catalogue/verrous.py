@@ -0,0 +1,65 @@
+import threading
+from contextlib import contextmanager
+
+
+class VerrousRepartis:
+    """
+    Verrous d'écriture répartis par ID : un nombre fixe de verrous, chaque ID utilisant toujours le même (id % nombre).
+
+    Deux écritures sur un même livre sont sérialisées ; des écritures sur des livres différents avancent en parallèle,
+    sauf si leurs ID tombent sur le même verrou. Les lectures n'en prennent aucun.
+    Plusieurs verrous sont toujours pris par ordre croissant : deux lots qui se chevauchent ne peuvent pas s'interbloquer.
+    """
+
+    def __init__(self, nombre: int = 64):
+        """
+        Args:
+            nombre (int): Le nombre de verrous.
+        """
+        # Réentrants : une opération qui tient déjà tous les verrous peut en reprendre un (voir Catalogue.exclusif)
+        self._verrous = [threading.RLock() for _ in range(nombre)]
+
+    def pour(self, id: int) -> threading.RLock:
+        """
+        Returns:
+            threading.RLock: Le verrou protégeant les écritures sur le livre `id`.
+        """
+        return self._verrous[id % len(self._verrous)]
+
+    @contextmanager
+    def plusieurs(self, ids):
+        """
+        Prend les verrous de tous les ID donnés (chacun une seule fois, par ordre croissant) pour la durée du bloc.
+        """
+        positions = sorted({id % len(self._verrous) for id in ids})
+        self._prendre(positions)
+        try:
+            yield
+        finally:
+            self._rendre(positions)
+
+    @contextmanager
+    def tous(self):
+        """
+        Prend tous les verrous pour la durée du bloc : aucune autre écriture ne peut avoir lieu.
+        """
+        positions = range(len(self._verrous))
+        self._prendre(positions)
+        try:
+            yield
+        finally:
+            self._rendre(positions)
+
+    def _prendre(self, positions) -> None:
+        prises = []
+        try:
+            for position in positions:
+                self._verrous[position].acquire()
+                prises.append(position)
+        except BaseException:
+            self._rendre(prises)
+            raise
+
+    def _rendre(self, positions) -> None:
+        for position in reversed(positions):
+            self._verrous[position].release()
@@ -0,0 +1,4 @@
+import os
+
+# Les tests ne doivent jamais écrire dans data/ : le catalogue de l'application est gardé en mémoire
+os.environ.setdefault("CATALOGUE_STOCKAGE", "memoire")
@@ -1,4 +1,4 @@
 import uvicorn
-#Lance l'application FastAPI qui se trouve dans le fichier appli_web.py
+#Lance l'application FastAPI qui se trouve dans le fichier appli_web.py (développement ; en production, voir production.py)
 if __name__ == "__main__":
     uvicorn.run("Appli_Web:app", host="127.0.0.1", port=8000, reload=True)#le reload pour qu'il enregistre les modifications qu'on fait dans le code
@@ -0,0 +1,6 @@
+#Lance l'application en production : plusieurs workers partageant le même catalogue (base SQLite)
+#python production.py [--workers N] [--host 0.0.0.0] [--port 8000]
+from catalogue.serveur import executer
+
+if __name__ == "__main__":
+    executer("Appli_Web:app")
@@ -1,42 +1,274 @@
-from fastapi import APIRouter,HTTPException,Path
+from fastapi import APIRouter,Depends,Header,HTTPException,Path,Query,Request,Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+import json
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Literal
 #On importe la class Livre
 from classes.dataclass_Livre import Livre
 from dataclasses import asdict
 #On importe la liste des livres
 from data.data_livres import liste_livres
+#On importe les encodeurs utilisés pour l'export (NDJSON, CSV)
+from catalogue.export import FORMATS
+#On importe l'ID maximal accepté (entier signé sur 64 bits)
+from catalogue.catalogue import ID_MAX
+#On importe le registre des métriques (voir /metrics)
+from catalogue.metriques import METRIQUES, TYPE_PROMETHEUS
+#On importe le profileur à la demande et le contrôle d'accès des routes d'administration
+from catalogue.profileur import DUREE_MAX, PROFILEUR
+from catalogue.admin import autorise
+#On importe le cache lié à la version du catalogue et les réponses compressées gardées en cache
+from catalogue.cache import CacheVersionne
+from catalogue.compression import etiquette_correspondante, reponse_en_cache
  
  
 #Permet de définir les différentes routes (endpoint) avec sous titre = tags
 router = APIRouter(tags=["Routes[GET/POST]"])
  
+# Nombre de livres par page quand un curseur est fourni sans limite
+LIMITE_PAR_DEFAUT = 50
+ 
+# Liste complète des livres déjà encodée (et compressée, une entrée par encodage) pour la version courante du catalogue
+cache_reponses = CacheVersionne(taille_max=16)
+ 
+ 
+def reponse_si_non_modifie(request: Request, response: Response, etag: str, modifie: float) -> Response | None:
+    """
+    Gère les requêtes conditionnelles (If-None-Match, If-Modified-Since) à partir de la version de la ressource,
+    avant tout accès aux livres eux-mêmes : un client qui a déjà la bonne version reçoit une réponse 304 vide.
+ 
+    Args:
+        request (Request): La requête, avec ses en-têtes conditionnels éventuels.
+        response (Response): La réponse, dans laquelle on ajoute les en-têtes ETag et Last-Modified.
+        etag (str): L'ETag (fort) de la version courante de la ressource.
+        modifie (float): L'instant de sa dernière modification (secondes depuis le 1er janvier 1970).
+ 
+    Returns:
+        Response | None: La réponse 304 à renvoyer, ou None si la ressource doit être envoyée.
+    """
+    entetes = {"ETag": etag, "Last-Modified": formatdate(modifie, usegmt=True)}
+    response.headers.update(entetes)
+    si_aucun = request.headers.get("if-none-match")
+    if si_aucun is not None:
+        # If-None-Match est prioritaire sur If-Modified-Since (RFC 9110) ; comparaison faible, qui accepte aussi l'ETag
+        # d'une représentation compressée (suffixé par l'encodage, voir etag_encode)
+        correspondante = etiquette_correspondante(si_aucun, etag)
+        return None if correspondante is None else Response(status_code=304, headers={**entetes, "ETag": correspondante})
+    si_modifie = request.headers.get("if-modified-since")
+    if si_modifie is not None:
+        try:
+            depuis = parsedate_to_datetime(si_modifie).timestamp()
+        except (TypeError, ValueError):
+            return None
+        # Last-Modified n'est précis qu'à la seconde près
+        if int(modifie) <= depuis:
+            return Response(status_code=304, headers=entetes)
+    return None
+ 
+ 
+def etag_catalogue() -> tuple[str, float, int]:
+    """
+    Returns:
+        tuple[str, float, int]: L'ETag de la version courante du catalogue, l'instant de sa dernière modification
+            et cette version.
+    """
+    epoque, version, modifie = liste_livres.etat()
+    return f'"{epoque}-{version}"', modifie, version
+ 
+ 
+def reponse_livres(contenu: bytes, response: Response) -> Response:
+    """
+    Renvoie des livres lus dans le catalogue tels quels, sans les reconstruire en objets Livre ni les faire revalider
+    par FastAPI (response_model) : ils ont déjà été validés au moment de leur écriture (voir create_livre, valider_ligne).
+ 
+    Args:
+        contenu (bytes): Le JSON d'un livre ou d'une liste de livres, encodé par le catalogue (voir encoder_livres).
+        response (Response): La réponse dont on reprend les en-têtes déjà ajoutés (Link, ETag, ...).
+ 
+    Returns:
+        Response: La réponse JSON.
+    """
+    return Response(content=contenu, media_type="application/json", headers=dict(response.headers))
+ 
 # Endpoint pour récupérer la liste de tous les livres
-@router.get("/Livres")
-def get_all_Livres() -> list[Livre]:
+@router.get("/Livres", response_model=list[Livre])
+def get_all_Livres(request: Request,
+                   response: Response,
+                   limit: int | None = Query(None, ge=1, le=1000),#Nombre maximal de livres renvoyés (pagination)
+                   cursor: str | None = None,#Curseur opaque renvoyé dans l'en-tête Link de la page précédente
+                   sort: Literal["id", "nom", "auteur", "editeur"] | None = None,#Champ de tri
+                   auteur: str | None = None,#Ne renvoie que les livres de cet auteur
+                   editeur: str | None = None,#Ne renvoie que les livres de cet éditeur
+                   ) -> Response:
     """
-    Récupère la liste complète de tous les livres.
+    Récupère la liste des livres, complète ou page par page.
+ 
+    Sans paramètre, renvoie tous les livres comme auparavant. Avec `limit`, `cursor` ou `sort`, les livres sont lus
+    dans un index trié tenu à jour par le catalogue : une page coûte O(log n + limit) au lieu de parcourir tout le catalogue.
+    Les liens vers les pages voisines sont donnés dans l'en-tête HTTP Link (rel="next" / rel="prev").
+    Les filtres `auteur` et `editeur` (insensibles à la casse) utilisent les index secondaires du catalogue :
+    leur coût est proportionnel au nombre de livres trouvés.
+    La réponse porte l'ETag de la version du catalogue : si le client l'a déjà (If-None-Match), une réponse 304 est renvoyée
+    sans lire aucun livre.
+ 
+    Args:
+        request (Request): La requête, utilisée pour construire les liens vers les pages voisines.
+        response (Response): La réponse, dans laquelle on ajoute l'en-tête Link.
+        limit (int | None): Le nombre maximal de livres renvoyés.
+        cursor (str | None): Le curseur de la page à renvoyer.
+        sort (str | None): Le champ de tri : id, nom, auteur ou editeur.
+        auteur (str | None): L'auteur recherché.
+        editeur (str | None): L'éditeur recherché.
  
     Returns:
-        list[Livre]: Une liste contenant tous les livres sous forme d'objets Livre.
+        Response: Une liste JSON contenant les livres (de la page), au format Livre.
+ 
+    Raises:
+        HTTPException: Si le curseur est invalide, une exception HTTP 400 est levée.
     """
-    # Initialise une liste vide pour stocker les livres à retourner
-    res = []
-   
-    # Parcourt chaque ID de livre dans le dictionnaire liste_livres
-    for id in liste_livres:
-        # Crée un objet Livre à partir des données de chaque livre dans le dictionnaire et l'ajoute à la liste des résultats
-        res.append(Livre(**liste_livres[id]))
-   
-    # Retourne la liste complète des livres
-    return res
+    # Version lue avant les livres : au pire, l'ETag est plus ancien que le contenu (jamais l'inverse)
+    etag, modifie, version = etag_catalogue()
+    non_modifie = reponse_si_non_modifie(request, response, etag, modifie)
+    if non_modifie is not None:
+        return non_modifie
+    # Filtres demandés (auteur, editeur)
+    filtres = {champ: valeur for champ, valeur in (("auteur", auteur), ("editeur", editeur)) if valeur is not None}
+    # Lecture paginée et/ou filtrée à partir des index du catalogue
+    if limit is not None or cursor is not None or sort is not None or filtres:
+        if limit is None:
+            # Sans limite : tous les livres demandés, ou une page de taille par défaut si l'on suit un curseur
+            limit = LIMITE_PAR_DEFAUT if cursor else max(len(liste_livres), 1)
+        try:
+            page = liste_livres.page(tri=sort or "id", limite=limit, curseur=cursor, filtres=filtres)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Ajoute les liens vers les pages voisines, en conservant les autres paramètres de la requête
+        liens = []
+        if page.suivant:
+            liens.append(f'<{request.url.include_query_params(cursor=page.suivant)}>; rel="next"')
+        if page.precedent:
+            liens.append(f'<{request.url.include_query_params(cursor=page.precedent)}>; rel="prev"')
+        if liens:
+            response.headers["Link"] = ", ".join(liens)
+        return reponse_livres(liste_livres.encoder_livres(page.livres, version), response)
+ 
+    # Retourne la liste complète des livres, lue en une seule fois dans un cliché du catalogue. Tant que le catalogue
+    # ne change pas, la même réponse (compressée selon Accept-Encoding) est resservie sans relire ni réencoder les livres
+    return reponse_en_cache(request, cache_reponses, "/Livres", version,
+                            lambda: liste_livres.encoder_livres(liste_livres.values(), version),
+                            "application/json", dict(response.headers))
+ 
+# Nombre de livres encodés et envoyés à la fois lors d'un export
+TAILLE_LOT_EXPORT = 500
+ 
+# Endpoint pour exporter tout le catalogue
+@router.get("/Livres/export")
+async def export_livres(request: Request, format: Literal["ndjson", "csv"] = "ndjson") -> StreamingResponse:
+    """
+    Exporte tout le catalogue en NDJSON ou en CSV, sous forme de flux.
+ 
+    Les livres sont lus, encodés et envoyés par lots de TAILLE_LOT_EXPORT : la mémoire utilisée ne dépend pas de la taille
+    du catalogue et le premier octet part sans attendre la fin de la lecture. L'export s'arrête dès que le client se déconnecte.
+ 
+    Args:
+        request (Request): La requête, utilisée pour détecter la déconnexion du client.
+        format (str): Le format d'export : "ndjson" (par défaut) ou "csv".
+ 
+    Returns:
+        StreamingResponse: Le catalogue, envoyé lot par lot.
+    """
+    type_contenu, encodeur = FORMATS[format]
+ 
+    async def flux():
+        # Chaque lot est lu et encodé dans le pool de threads pour ne pas bloquer la boucle d'événements
+        async for morceau in iterate_in_threadpool(encodeur(liste_livres.lots(TAILLE_LOT_EXPORT))):
+            if await request.is_disconnected():
+                break
+            yield morceau
+ 
+    return StreamingResponse(flux(), media_type=type_contenu,
+                             headers={"Content-Disposition": f'attachment; filename="livres.{format}"'})
+ 
+# Durée maximale (en secondes) sans rien envoyer sur un flux SSE : un commentaire garde la connexion ouverte
+ATTENTE_SSE = 15
+ 
+# Endpoint pour suivre les changements du catalogue
+@router.get("/livres/changes")
+async def suivre_changements(request: Request,
+                             depuis: int | None = Query(None, ge=0),#Numéro du dernier changement déjà reçu
+                             attente: float = Query(25, ge=0, le=60),#Attente maximale d'une requête longue (long polling)
+                             last_event_id: str | None = Header(None),#Reprise automatique d'un client SSE
+                             ) -> Response:
+    """
+    Envoie les ajouts, modifications et suppressions de livres, numérotés par un numéro de séquence croissant (`seq`).
+ 
+    Avec l'en-tête `Accept: text/event-stream`, la réponse est un flux Server-Sent Events qui reste ouvert. Sinon, la
+    requête attend (au plus `attente` secondes) qu'au moins un changement soit disponible et renvoie un objet JSON
+    {"seq": ..., "perte": ..., "evenements": [...]} : le client repasse `seq` dans `depuis` à la requête suivante.
+    Un client peut reprendre après le dernier changement reçu (`depuis`, ou l'en-tête Last-Event-ID d'un client SSE)
+    tant qu'il est encore gardé en mémoire ; sinon `perte` est signalée et il doit relire le catalogue.
+    Les changements sont encodés une seule fois, quel que soit le nombre de clients.
+ 
+    Args:
+        request (Request): La requête, utilisée pour choisir le format et détecter la déconnexion du client.
+        depuis (int | None): Le numéro du dernier changement reçu (par défaut, seuls les changements à venir sont envoyés).
+        attente (float): L'attente maximale d'une requête longue, en secondes.
+        last_event_id (str | None): Le numéro du dernier changement reçu par un client SSE qui se reconnecte.
+ 
+    Returns:
+        Response: Le flux SSE, ou les changements au format JSON.
+    """
+    changements = liste_livres.changements
+    if depuis is None and last_event_id is not None and last_event_id.isdigit():
+        depuis = int(last_event_id)
+    seq = changements.sequence if depuis is None else depuis
+ 
+    if "text/event-stream" not in request.headers.get("accept", ""):
+        evenements, perte = await changements.attendre(seq, attente)
+        if evenements:
+            seq = evenements[-1].seq
+        elif perte:
+            seq = changements.sequence
+        corps = b'{"seq":%d,"perte":%s,"evenements":[%s]}' % (seq, b"true" if perte else b"false",
+                                                              b",".join(evenement.json for evenement in evenements))
+        return Response(content=corps, media_type="application/json")
+ 
+    async def flux(seq):
+        # Délai de reconnexion conseillé au client, en millisecondes
+        yield b"retry: 1000\n\n"
+        while not await request.is_disconnected():
+            evenements, perte = await changements.attendre(seq, ATTENTE_SSE)
+            if perte:
+                yield b"event: perte\ndata: {}\n\n"
+                seq = changements.sequence
+            # Chaque trame est envoyée telle quelle : les octets sont partagés par tous les clients
+            for evenement in evenements:
+                yield evenement.sse
+            if evenements:
+                seq = evenements[-1].seq
+            elif not perte:
+                yield b": ping\n\n"
+ 
+    return StreamingResponse(flux(seq), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
  
 @router.get("/total_livres")
-def get_total_livres() -> dict:
+def get_total_livres(request: Request, response: Response) -> dict:
     """
     Récupère le nombre total de livres disponibles.
  
+    Args:
+        request (Request): La requête, avec ses en-têtes conditionnels éventuels.
+        response (Response): La réponse, dans laquelle on ajoute les en-têtes ETag et Last-Modified.
+ 
     Returns:
         dict: Un dictionnaire contenant le nombre total de livres.
     """
+    etag, modifie, _ = etag_catalogue()
+    non_modifie = reponse_si_non_modifie(request, response, etag, modifie)
+    if non_modifie is not None:
+        return non_modifie
     # Utilise la fonction len() pour obtenir le nombre d'éléments dans le dictionnaire liste_livres
     # Cela représente le nombre total de livres
     total_livres = len(liste_livres)
@@ -45,27 +277,163 @@ def get_total_livres() -> dict:
     return {"total": total_livres}
  
  
-@router.get("/livre/{id}")
-def get_livre_by_id(id: int = Path(ge=1)) -> Livre:
+# Endpoint pour la recherche plein texte
+@router.get("/recherche")
+def rechercher_livres(q: str = Query("", max_length=200),#Les mots recherchés ; le dernier peut être un début de mot
+                      limit: int = Query(20, ge=1, le=100),#Nombre maximal de résultats
+                      ) -> dict:
+    """
+    Recherche plein texte dans le nom, l'auteur et l'éditeur des livres.
+ 
+    La recherche ignore les accents et la casse, le dernier mot peut être incomplet (autocomplétion), et les résultats
+    sont classés par pertinence (BM25). Elle utilise l'index inversé du catalogue (ou l'index FTS5 de la base avec SQLite).
+ 
+    Args:
+        q (str): Les mots recherchés.
+        limit (int): Le nombre maximal de résultats.
+ 
+    Returns:
+        dict: La requête, le nombre de résultats et les livres trouvés avec leur score, du plus pertinent au moins pertinent.
+    """
+    resultats = liste_livres.rechercher(q, limit)
+    return {"q": q, "total": len(resultats), "resultats": [{**livre, "score": round(score, 4)} for livre, score in resultats]}
+ 
+ 
+@router.get("/livre/{id}", response_model=Livre)
+def get_livre_by_id(request: Request, response: Response, id: int = Path(ge=1, le=ID_MAX)) -> Response:
     """
     Récupère un livre par son ID.
  
+    La réponse porte l'ETag de la version du livre (et non du catalogue) : il ne change que si ce livre est modifié.
+ 
     Args:
+        request (Request): La requête, avec ses en-têtes conditionnels éventuels.
+        response (Response): La réponse, dans laquelle on ajoute les en-têtes ETag et Last-Modified.
         id (int): L'ID du livre à récupérer. Par défaut, doit être supérieur ou égal à 1.
  
     Returns:
-        Livre: Les informations sur le livre récupéré.
+        Response: Les informations sur le livre récupéré, au format Livre.
  
     Raises:
         HTTPException: Si le livre avec l'ID spécifié n'est pas trouvé, une exception HTTP 404 est levée.
     """
-    # Vérifie si l'ID du livre est présent dans le dictionnaire des livres.
-    if id not in liste_livres:
+    # Vérifie si l'ID du livre est présent dans le catalogue, en lisant seulement sa version.
+    etat = liste_livres.etat_livre(id)
+    livre = None
+    if etat is not None:
+        epoque, version, modifie = etat
+        non_modifie = reponse_si_non_modifie(request, response, f'"{epoque}-{id}-{version}"', modifie)
+        if non_modifie is not None:
+            return non_modifie
+        version = liste_livres.version
+        livre = liste_livres.get(id)
+    if livre is None:
         # Si l'ID du livre n'est pas trouvé, lève une exception HTTP 404 avec un message d'erreur.
         raise HTTPException(status_code=404, detail="Le livre demandé n'a pas été trouvé. Veuillez vérifier l'ID du livre et réessayer.")
    
-    # Si l'ID du livre est trouvé, retourne les informations sur le livre correspondant.
-    return Livre(**liste_livres[id])
+    # Si l'ID du livre est trouvé, retourne les informations sur le livre correspondant (déjà validées à l'écriture).
+    return reponse_livres(liste_livres.encoder_livre(livre, version), response)
+ 
+ 
+# Nombre maximal d'ID demandés en une requête (GET /livres?ids=..., POST /livres/batch-get)
+MAX_IDS_PAR_REQUETE = 1000
+ 
+def convertir_ids(valeurs: list) -> list[int]:
+    """
+    Vérifie une liste d'ID demandés par un client.
+ 
+    Args:
+        valeurs (list): Les ID, en entiers (corps JSON) ou en chaînes (paramètre de requête).
+ 
+    Returns:
+        list[int]: Les ID, dans le même ordre.
+ 
+    Raises:
+        ValueError: Si la liste est vide ou trop longue, ou si un ID n'est pas un entier entre 1 et ID_MAX.
+    """
+    if not valeurs:
+        raise ValueError("Indiquez au moins un ID.")
+    if len(valeurs) > MAX_IDS_PAR_REQUETE:
+        raise ValueError(f"Au plus {MAX_IDS_PAR_REQUETE} ID par requête.")
+    ids = []
+    for valeur in valeurs:
+        # isdecimal et non isdigit : "²" est un chiffre, mais int() le refuse
+        if isinstance(valeur, str) and valeur.strip().isdecimal():
+            valeur = int(valeur)
+        if not isinstance(valeur, int) or isinstance(valeur, bool) or not 1 <= valeur <= ID_MAX:
+            raise ValueError(f"L'ID doit être un entier compris entre 1 et {ID_MAX} : {valeur!r}.")
+        ids.append(valeur)
+    return ids
+ 
+ 
+def reponse_plusieurs_livres(ids: list[int]) -> Response:
+    """
+    Lit plusieurs livres en une fois (voir Catalogue.lire_plusieurs) et renvoie {"livres": [...], "manquants": [...]}.
+    Les livres sont encodés comme la liste complète (encodage de chaque livre gardé en mémoire), sans objets Livre.
+ 
+    Returns:
+        Response: Les livres trouvés et les ID introuvables, dans l'ordre de la demande.
+    """
+    version = liste_livres.version
+    livres, manquants = liste_livres.lire_plusieurs(ids)
+    contenu = b'{"livres":' + liste_livres.encoder_livres(livres, version) + b',"manquants":' + json.dumps(manquants).encode() + b"}"
+    return Response(content=contenu, media_type="application/json")
+ 
+ 
+# Endpoint pour récupérer plusieurs livres choisis par leur ID
+@router.get("/livres")
+def get_plusieurs_livres(ids: list[str] = Query([])) -> Response:#ID séparés par des virgules (ids=3,1,2), ou répétés (ids=3&ids=1)
+    """
+    Récupère plusieurs livres par leur ID en une seule requête, au lieu d'une requête GET /livre/{id} par livre.
+ 
+    Les livres sont lus en une seule fois dans le catalogue (une seule requête avec SQLite). Un ID introuvable
+    ne provoque pas d'erreur 404 : il est signalé dans la liste "manquants".
+ 
+    Args:
+        ids (list[str]): Les ID des livres, au plus MAX_IDS_PAR_REQUETE.
+ 
+    Returns:
+        Response: {"livres": [...], "manquants": [...]}, dans l'ordre des ID demandés (un ID répété n'est renvoyé qu'une fois).
+ 
+    Raises:
+        HTTPException: Si un ID est invalide ou s'il y en a trop, une exception HTTP 400 est levée.
+    """
+    try:
+        ids = convertir_ids([id for valeur in ids for id in valeur.split(",") if id.strip()])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return reponse_plusieurs_livres(ids)
+ 
+ 
+# Variante de GET /livres?ids=... avec les ID dans le corps (listes trop longues pour une URL)
+@router.post("/livres/batch-get")
+async def batch_get_livres(request: Request) -> Response:
+    """
+    Récupère plusieurs livres par leur ID, comme GET /livres?ids=..., les ID étant donnés dans le corps de la requête.
+ 
+    Args:
+        request (Request): La requête, dont le corps est {"ids": [3, 1, 2]} (ou directement le tableau [3, 1, 2]).
+ 
+    Returns:
+        Response: {"livres": [...], "manquants": [...]}, dans l'ordre des ID demandés.
+ 
+    Raises:
+        HTTPException: Si le corps n'est pas un tableau d'ID valide, une exception HTTP 400 est levée.
+    """
+    try:
+        corps = json.loads(await request.body())
+    except ValueError:
+        corps = None
+    if isinstance(corps, dict):
+        corps = corps.get("ids")
+    if not isinstance(corps, list):
+        raise HTTPException(status_code=400, detail="Le corps doit être {\"ids\": [...]} ou un tableau JSON d'ID.")
+    try:
+        ids = convertir_ids(corps)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Lecture dans le pool de threads : avec SQLite, elle ne bloque pas la boucle d'événements
+    return await run_in_threadpool(reponse_plusieurs_livres, ids)
  
  
 def validate_string(string: str) -> bool:
@@ -83,7 +451,7 @@ def validate_string(string: str) -> bool:
 # Endpoint pour créer un livre
 @router.post("/livre/{id}")
 def create_livre(livre: Livre,
-                 id: int = Path(ge=1),#ID doit obligatoirement être supérieur ou égal à 1
+                 id: int = Path(ge=1, le=ID_MAX),#ID doit obligatoirement être supérieur ou égal à 1
                  nom: str = "",#Nom est égal à "", doit être modifier par utilisateur sinon HTTPException suite à validate_String
                  auteur: str = "",#Auteur est égal à "", doit être modifier par utilisateur sinon HTTPException suite à validate_String
                  editeur: str = "",#Editeur est égal à "", doit être modifier par utilisateur sinon HTTPException suite à validate_String
@@ -116,13 +484,13 @@ def create_livre(livre: Livre,
     livre.auteur = auteur
     livre.editeur = editeur
    
-    # Vérifie si un livre avec le même ID existe déjà dans la liste
-    if id in liste_livres:
+    # Ajoute le livre à la liste des livres. L'ajout échoue (sans rien écraser) si un livre avec le même ID existe déjà,
+    # même s'il vient d'être ajouté par une autre requête ou un autre worker
+    try:
+        liste_livres.ajouter(id, asdict(livre))
+    except ValueError as e:
         # Si oui, lève une exception HTTP 400 avec un message d'erreur approprié
-        raise HTTPException(status_code=400, detail=f"Le livre avec l'ID {id} existe déjà !")
-   
-    # Ajoute le livre à la liste des livres
-    liste_livres[id] = asdict(livre)
+        raise HTTPException(status_code=400, detail=str(e))
    
     # Retourne les informations sur le livre ajouté
     return livre
@@ -131,7 +499,7 @@ def create_livre(livre: Livre,
 # Endpoint pour mettre à jour un livre
 @router.put("/livre/{id}")
 def update_livre(livre: Livre,
-                 id: int = Path(ge=1),#ID doit obligatoirement être supérieur ou égal à 1
+                 id: int = Path(ge=1, le=ID_MAX),#ID doit obligatoirement être supérieur ou égal à 1
                  nom: str = "",#Nom est égal à "", doit être modifier par utilisateur sinon HTTPException suite à validate_String
                  auteur: str = "",#Auteur est égal à "", doit être modifier par utilisateur sinon HTTPException suite à validate_String
                  editeur: str = "",#Editeur est égal à "", doit être modifier par utilisateur sinon HTTPException suite à validate_String
@@ -156,18 +524,18 @@ def update_livre(livre: Livre,
         # Si l'une des conditions n'est pas remplie, lève une exception HTTP 400 avec un message d'erreur approprié
         raise HTTPException(status_code=400, detail="Le nom, l'auteur et l'éditeur ne peuvent pas être vides ou ne contenir que des espaces.")
    
-    # Vérifie si le livre avec l'ID spécifié existe dans la liste des livres
-    if id not in liste_livres:
-        # Si le livre n'est pas trouvé, lève une exception HTTP 404 avec un message d'erreur approprié
-        raise HTTPException(status_code=404, detail=f"Désolé, nous n'avons pas pu trouver le livre {id} que vous cherchez. Veuillez vérifier l'ID et réessayer.")
-   
     # Assurez-vous que l'ID du livre à mettre à jour correspond à l'ID de l'URL
     livre.id = id  # pour qu'on puisse pas modifier l'ID de livre (pour éviter d'avoir un même ID mais des livres différents)
     livre.nom = nom #Associe le nouveau nom introduit par l'utilisateur à l'ancien nom du livre en question
     livre.auteur = auteur #Associe le nouveau nom introduit par l'utilisateur à l'ancien auteur du livre en question
     livre.editeur = editeur #Associe le nouveau nom introduit par l'utilisateur à l'ancien editeur du livre en question
-    # Met à jour les informations du livre avec les nouvelles données
-    liste_livres[id] = asdict(livre)
+    # Met à jour les informations du livre avec les nouvelles données, s'il existe : la vérification et l'écriture
+    # forment une seule opération, un livre supprimé entre-temps par une autre requête n'est pas recréé
+    try:
+        liste_livres.modifier(id, asdict(livre))
+    except KeyError:
+        # Si le livre n'est pas trouvé, lève une exception HTTP 404 avec un message d'erreur approprié
+        raise HTTPException(status_code=404, detail=f"Désolé, nous n'avons pas pu trouver le livre {id} que vous cherchez. Veuillez vérifier l'ID et réessayer.")
    
     # Retourne les informations sur le livre mis à jour
     return livre
@@ -176,7 +544,7 @@ def update_livre(livre: Livre,
  
 # Endpoint pour supprimer un livre
 @router.delete("/livre/{id}")
-def delete_livre(id: int = Path(ge=1)) -> Livre:
+def delete_livre(id: int = Path(ge=1, le=ID_MAX)) -> Livre:
     """
     Endpoint pour supprimer un livre de la liste des livres.
  
@@ -189,14 +557,233 @@ def delete_livre(id: int = Path(ge=1)) -> Livre:
     Raises:
         HTTPException: Si le livre avec l'ID spécifié n'est pas trouvé, une exception HTTP 404 est levée.
     """
-    # Vérifie si le livre avec l'ID spécifié existe dans la liste des livres
-    if id in liste_livres:
-        # Si le livre existe, crée un objet Livre à partir de ses données
-        livre = Livre(**liste_livres[id])
-        # Supprime le livre de la liste des livres
-        del liste_livres[id]
+    # Supprime le livre et récupère ses données en une seule opération : si deux requêtes suppriment le même livre
+    # en même temps, une seule réussit
+    livre = liste_livres.pop(id, None)
+    if livre is not None:
         # Retourne les informations sur le livre supprimé
-        return livre
+        return Livre(**livre)
     # Si le livre n'existe pas, lève une exception HTTP 404 avec un message d'erreur
     raise HTTPException(status_code=404, detail=f"Le livre {id} n'existe pas.")
- 
\ No newline at end of file
+ 
+ 
+ 
+# Nombre de lignes validées puis appliquées ensemble lors d'un import en masse
+TAILLE_LOT_IMPORT = 1000
+ 
+def valider_ligne(ligne) -> tuple:
+    """
+    Valide une ligne d'un import en masse et la convertit en opération (op, id, livre).
+ 
+    Seul le contenu de la ligne est vérifié ici : l'existence du livre est vérifiée par le catalogue au moment
+    d'appliquer le lot (voir Catalogue.appliquer_lot).
+ 
+    Args:
+        ligne: La ligne décodée : {"op": "ajouter" | "modifier" | "supprimer", "id": ..., "nom": ..., "auteur": ..., "editeur": ...}.
+            "op" vaut "ajouter" par défaut ; l'ID est facultatif pour un ajout (il est alors attribué automatiquement).
+ 
+    Returns:
+        tuple: L'opération validée (op, id, livre) ; livre vaut None pour une suppression.
+ 
+    Raises:
+        ValueError: Si la ligne est invalide, avec un message décrivant l'erreur.
+    """
+    if not isinstance(ligne, dict):
+        raise ValueError("Chaque ligne doit être un objet JSON.")
+    op = ligne.get("op", "ajouter")
+    if op not in ("ajouter", "modifier", "supprimer"):
+        raise ValueError(f"Opération inconnue : {op!r}.")
+    id = ligne.get("id")
+    if id is None and op == "ajouter":
+        id = liste_livres.allouer_id()
+    if not isinstance(id, int) or isinstance(id, bool) or not 1 <= id <= ID_MAX:
+        raise ValueError(f"L'ID doit être un entier compris entre 1 et {ID_MAX}.")
+    livre = None
+    if op != "supprimer":
+        champs = [ligne.get(champ) for champ in ("nom", "auteur", "editeur")]
+        if not all(isinstance(valeur, str) and validate_string(valeur) for valeur in champs):
+            raise ValueError("Le nom, l'auteur et l'éditeur ne peuvent pas être vides ou ne contenir que des espaces.")
+        livre = asdict(Livre(id, *champs))
+    return op, id, livre
+ 
+ 
+def traiter_lot(lignes: list) -> tuple[int, list]:
+    """
+    Décode, valide puis applique un lot de lignes d'un import en masse.
+ 
+    Exécutée dans le pool de threads : l'attribution des ID et l'écriture (journal, SQLite) ne bloquent pas la boucle d'événements.
+ 
+    Args:
+        lignes (list): Les couples (numéro de ligne, ligne brute ou déjà décodée).
+ 
+    Returns:
+        tuple[int, list]: Le nombre d'opérations appliquées et les erreurs du lot (numéro de ligne et message).
+    """
+    operations, numeros, erreurs = [], [], []
+    for numero, ligne in lignes:
+        try:
+            if isinstance(ligne, bytes):
+                ligne = json.loads(ligne)
+            operations.append(valider_ligne(ligne))
+            numeros.append(numero)
+        except ValueError as e:
+            erreurs.append({"ligne": numero, "erreur": str(e)})
+    # Les opérations impossibles au moment de l'application (livre ajouté ou supprimé entre-temps) sont signalées aussi
+    refusees = liste_livres.appliquer_lot(operations)
+    erreurs.extend({"ligne": numeros[position], "erreur": raison} for position, raison in refusees)
+    erreurs.sort(key=lambda erreur: erreur["ligne"])
+    return len(operations) - len(refusees), erreurs
+ 
+ 
+async def lignes_ndjson(request: Request):
+    """
+    Lit le corps de la requête ligne par ligne (NDJSON), au fur et à mesure de sa réception.
+ 
+    Yields:
+        bytes: Chaque ligne non vide du corps.
+    """
+    reste = b""
+    async for morceau in request.stream():
+        reste += morceau
+        *lignes, reste = reste.split(b"\n")
+        for ligne in lignes:
+            if ligne.strip():
+                yield ligne
+    if reste.strip():
+        yield reste
+ 
+ 
+# Endpoint pour ajouter, modifier ou supprimer des livres en masse
+@router.post("/livres/bulk")
+async def bulk_livres(request: Request) -> dict:
+    """
+    Applique en masse des ajouts, modifications et suppressions de livres.
+ 
+    Le corps est soit un tableau JSON, soit un flux NDJSON (Content-Type: application/x-ndjson, une ligne par opération),
+    lu au fur et à mesure. Les lignes sont validées par lots de TAILLE_LOT_IMPORT ; les lignes valides d'un lot sont
+    appliquées ensemble de façon atomique (un seul enregistrement du journal ou une seule transaction SQLite) et les index
+    sont mis à jour une seule fois par lot. Les lignes invalides (ou impossibles au moment de l'application, par exemple
+    l'ajout d'un ID créé entre-temps par une autre requête) sont ignorées et signalées une par une.
+ 
+    Args:
+        request (Request): La requête contenant les opérations.
+ 
+    Returns:
+        dict: Le nombre d'opérations appliquées et la liste des erreurs (numéro de ligne à partir de 1 et message).
+ 
+    Raises:
+        HTTPException: Si le corps n'est pas un tableau JSON valide, une exception HTTP 400 est levée.
+    """
+    if "ndjson" in request.headers.get("content-type", ""):
+        lignes = lignes_ndjson(request)
+    else:
+        try:
+            tableau = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Le corps doit être un tableau JSON ou un flux NDJSON.")
+        if not isinstance(tableau, list):
+            raise HTTPException(status_code=400, detail="Le corps doit être un tableau JSON ou un flux NDJSON.")
+ 
+        async def lignes_tableau():
+            for ligne in tableau:
+                yield ligne
+        lignes = lignes_tableau()
+ 
+    appliquees, erreurs, numero = 0, [], 0
+    lot = []
+ 
+    async def appliquer():
+        # Validation et écritures (catalogue, journal, SQLite) se font dans le pool de threads
+        nonlocal appliquees, lot
+        nombre, erreurs_lot = await run_in_threadpool(traiter_lot, lot)
+        appliquees += nombre
+        erreurs.extend(erreurs_lot)
+        lot = []
+ 
+    async for ligne in lignes:
+        numero += 1
+        lot.append((numero, ligne))
+        if len(lot) == TAILLE_LOT_IMPORT:
+            await appliquer()
+    await appliquer()
+ 
+    return {"appliquees": appliquees, "erreurs": erreurs}
+ 
+ 
+# Valeurs lues seulement quand les métriques sont demandées
+METRIQUES.collecte("catalogue_version", "Version du catalogue (incrémentée à chaque écriture)", lambda: liste_livres.version)
+METRIQUES.collecte("changements_abonnes", "Nombre de clients en attente de changements (/livres/changes)",
+                   lambda: liste_livres.changements.abonnes)
+METRIQUES.collecte("cache_reponses_succes_total", "Listes complètes resservies depuis le cache", lambda: cache_reponses.succes, "counter")
+METRIQUES.collecte("cache_reponses_echecs_total", "Listes complètes absentes du cache (encodées)", lambda: cache_reponses.echecs, "counter")
+ 
+@router.get("/metrics", include_in_schema=False)
+async def get_metriques() -> Response:
+    """
+    Expose les métriques du processus au format texte de Prometheus : durée, taille et nombre des requêtes par route,
+    requêtes en cours, durée des lectures dans le catalogue (voir catalogue.metriques).
+ 
+    Returns:
+        Response: Les métriques, au format texte de Prometheus.
+    """
+    return Response(content=METRIQUES.exposer(), media_type=TYPE_PROMETHEUS)
+ 
+ 
+def verifier_admin(request: Request, x_admin_jeton: str | None = Header(None)) -> None:
+    """
+    Dépendance des routes d'administration : jeton LIVRES_ADMIN_JETON exigé, ou client local (voir catalogue.admin).
+ 
+    Raises:
+        HTTPException: Une exception est levée avec un code d'erreur 403 si la requête n'est pas autorisée.
+    """
+    if not autorise(x_admin_jeton, request.client.host if request.client else None):
+        raise HTTPException(status_code=403, detail="Accès réservé à l'administration.")
+ 
+@router.post("/admin/profil", dependencies=[Depends(verifier_admin)])
+async def profiler(secondes: float | None = Query(None, gt=0, le=DUREE_MAX),
+                   requetes: int | None = Query(None, ge=1, le=100_000),
+                   route: str | None = Query(None, max_length=200),
+                   intervalle_ms: float = Query(5, ge=1, le=1000)) -> Response:
+    """
+    Profile l'application par échantillonnage pendant `secondes` secondes, ou pendant les `requetes` prochaines requêtes
+    (seulement celles de `route` si elle est donnée, par exemple /livre/{id}), puis renvoie le profil.
+    Les routes, l'encodage JSON et les accès au catalogue apparaissent dans les piles relevées (voir catalogue.profileur).
+ 
+    Args:
+        secondes (float | None): La durée du profil.
+        requetes (int | None): Le nombre de requêtes à profiler (à la place d'une durée).
+        route (str | None): La route déclarée des requêtes à profiler (par défaut, toutes).
+        intervalle_ms (float): L'intervalle entre deux échantillons, en millisecondes.
+ 
+    Raises:
+        HTTPException: Une exception est levée avec un code d'erreur 400 si ni la durée ni le nombre de requêtes n'est donné
+            (ou les deux), et 409 si un profil est déjà en cours.
+ 
+    Returns:
+        Response: Les piles d'appels au format « collapsed stacks » (flamegraph.pl, speedscope, ...).
+    """
+    if (secondes is None) == (requetes is None):
+        raise HTTPException(status_code=400, detail="Indiquez soit secondes, soit requetes.")
+    try:
+        profil = await PROFILEUR.profiler(secondes, requetes, route, intervalle_ms / 1000)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(content=profil, media_type="text/plain; charset=utf-8",
+                    headers={"X-Echantillons": str(PROFILEUR.echantillons)})
+ 
+@router.post("/admin/sauvegarde", dependencies=[Depends(verifier_admin)])
+def sauvegarder() -> dict:
+    """
+    Écrit une sauvegarde cohérente du catalogue, sans interrompre les lectures ni les écritures (voir Catalogue.sauvegarder) :
+    un instantané écrit depuis un cliché du catalogue, ou une copie de la base SQLite en mode production.
+ 
+    Raises:
+        HTTPException: Une exception est levée avec un code d'erreur 409 si aucun dossier de sauvegarde n'est configuré.
+ 
+    Returns:
+        dict: Le chemin de la sauvegarde et la version du catalogue qu'elle contient.
+    """
+    try:
+        return liste_livres.sauvegarder()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from Appli_Web import app
+from data.data_livres import liste_livres
+from routes import routes
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def livre(id, nom="Nom"):
+    return {"id": id, "nom": nom, "auteur": "Auteur", "editeur": "Éditeur"}
+
+
+def test_les_lignes_invalides_sont_signalees_et_les_autres_appliquees(client):
+    lignes = [
+        livre(1001),
+        {"op": "ajouter", "id": 1001, "nom": "Doublon", "auteur": "A", "editeur": "E"},
+        {"op": "modifier", **livre(1001, "Renommé")},
+        {"op": "supprimer", "id": 999999},
+        {"op": "ajouter", "id": 1002, "nom": "  ", "auteur": "A", "editeur": "E"},
+        {"op": "inconnue", "id": 1003},
+        "pas un objet",
+        {"op": "supprimer", "id": 1001},
+    ]
+    reponse = client.post("/livres/bulk", json=lignes)
+    assert reponse.status_code == 200
+    resultat = reponse.json()
+    assert resultat["appliquees"] == 3
+    assert [erreur["ligne"] for erreur in resultat["erreurs"]] == [2, 4, 5, 6, 7]
+    assert "existe déjà" in resultat["erreurs"][0]["erreur"]
+    assert 1001 not in liste_livres
+
+
+def test_ndjson_avec_ligne_illisible(client):
+    corps = b"\n".join([json.dumps(livre(1010)).encode(), b"{pas du json", json.dumps(livre(1011)).encode()])
+    reponse = client.post("/livres/bulk", content=corps, headers={"Content-Type": "application/x-ndjson"})
+    assert reponse.json()["appliquees"] == 2
+    assert [erreur["ligne"] for erreur in reponse.json()["erreurs"]] == [2]
+    for id in (1010, 1011):
+        del liste_livres[id]
+
+
+def test_un_livre_ajoute_entre_validation_et_application_n_est_pas_ecrase(client, monkeypatch):
+    # Simule une requête concurrente qui crée le livre juste après la validation de la ligne
+    valider = routes.valider_ligne
+
+    def valider_puis_creer(ligne):
+        operation = valider(ligne)
+        liste_livres.ajouter(1020, livre(1020, "Créé entre-temps"))
+        return operation
+
+    monkeypatch.setattr(routes, "valider_ligne", valider_puis_creer)
+    reponse = client.post("/livres/bulk", json=[livre(1020, "Import")])
+    assert reponse.json()["appliquees"] == 0
+    assert [erreur["ligne"] for erreur in reponse.json()["erreurs"]] == [1]
+    assert liste_livres[1020]["nom"] == "Créé entre-temps"
+    del liste_livres[1020]
@@ -0,0 +1,50 @@
+from catalogue.cache import CacheVersionne
+from catalogue.catalogue import Catalogue
+from catalogue.sqlite import StockageSQLite
+from catalogue.stockage import StockageMemoire
+
+LIVRE = {"id": 1, "nom": "Le Hobbit", "auteur": "J.R.R. Tolkien", "editeur": "Christian Bourgois Éditeur"}
+
+
+def test_eviction_du_moins_recemment_utilise():
+    cache = CacheVersionne(taille_max=2, octets_max=10)
+    cache.put("a", 0, b"aaa")
+    cache.put("b", 0, b"bbb")
+    assert cache.get("a", 0) == b"aaa"
+    cache.put("c", 0, b"ccc")
+    assert cache.get("b", 0) is None and cache.get("a", 0) == b"aaa"
+    # Limite en octets : une grosse valeur évince les autres
+    cache.put("d", 0, b"dddddddd")
+    assert len(cache) == 1 and cache.octets == 8
+
+
+def test_une_nouvelle_version_vide_le_cache():
+    cache = CacheVersionne()
+    cache.put("page", 1, b"v1")
+    assert cache.get("page", 2) is None
+    # Une valeur calculée pour une version dépassée n'est pas enregistrée
+    cache.put("page", 1, b"v1")
+    assert cache.get("page", 2) is None
+    assert (cache.succes, cache.echecs) == (0, 2)
+
+
+def test_chaque_ecriture_change_la_version():
+    catalogue = Catalogue(StockageMemoire({1: LIVRE}))
+    versions = [catalogue.version]
+    catalogue[1] = {**LIVRE, "nom": "Bilbo le Hobbit"}
+    versions.append(catalogue.version)
+    catalogue.appliquer_lot([("ajouter", 2, {**LIVRE, "id": 2})])
+    versions.append(catalogue.version)
+    del catalogue[2]
+    versions.append(catalogue.version)
+    assert versions == sorted(set(versions))
+
+
+def test_version_partagee_entre_workers(tmp_path):
+    chemin = str(tmp_path / "livres.db")
+    worker_a, worker_b = Catalogue(StockageSQLite(chemin)), Catalogue(StockageSQLite(chemin))
+    avant = worker_b.version
+    worker_a.ajouter(1, LIVRE)
+    assert worker_b.version > avant
+    worker_a.fermer()
+    worker_b.fermer()
@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from catalogue.catalogue import Catalogue
+from catalogue.stockage import StockageMemoire
+
+
+def test_modifications_concurrentes_d_un_meme_livre():
+    catalogue = Catalogue(StockageMemoire({1: {"id": 1, "nom": "n", "auteur": "a", "editeur": "e"}}))
+    catalogue.filtrer({"auteur": "a"})  # Construit l'index des auteurs
+
+    def modifier(numero):
+        for i in range(500):
+            catalogue[1] = {"id": 1, "nom": "n", "auteur": f"auteur {numero}-{i}", "editeur": "e"}
+
+    threads = [threading.Thread(target=modifier, args=(numero,)) for numero in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # L'index ne doit connaître que l'auteur actuel du livre
+    entrees = {valeur: ids for valeur, ids in catalogue.index["auteur"].ids.items() if ids}
+    assert len(entrees) == 1
+    assert catalogue.filtrer({"auteur": catalogue[1]["auteur"]}) == {1}
+
+
+def test_ecritures_paralleles_sur_des_livres_differents_et_lectures():
+    catalogue = Catalogue(StockageMemoire({}))
+    catalogue.filtrer({"auteur": "a"})
+    erreurs = []
+
+    def ecrire(numero):
+        for i in range(300):
+            id = numero * 1000 + i + 1
+            catalogue.ajouter(id, {"id": id, "nom": "n", "auteur": f"a{numero}", "editeur": "e"})
+            catalogue.modifier(id, {"id": id, "nom": "m", "auteur": f"a{numero}", "editeur": "e"})
+            if i % 2:
+                del catalogue[id]
+
+    def lire():
+        # Les parcours ne sont jamais interrompus par les écritures concurrentes
+        try:
+            for _ in range(50):
+                assert all(livre["id"] == id for id, livre in catalogue.items())
+                list(catalogue)
+        except Exception as e:
+            erreurs.append(e)
+
+    threads = [threading.Thread(target=ecrire, args=(numero,)) for numero in range(4)]
+    threads += [threading.Thread(target=lire) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not erreurs
+    assert len(catalogue) == 4 * 150 and list(catalogue) == sorted(catalogue)
+    assert all(livre["nom"] == "m" for livre in catalogue.values())
+    assert catalogue.filtrer({"auteur": "a2"}) == {2000 + i + 1 for i in range(0, 300, 2)}
+    assert catalogue.version == 4 * 300 * 2 + 4 * 150
+
+
+def test_suppression_et_modification_concurrentes():
+    catalogue = Catalogue(StockageMemoire({1: {"id": 1, "nom": "n", "auteur": "a", "editeur": "e"}}))
+    resultats = []
+
+    def supprimer():
+        resultats.append(catalogue.pop(1, None))
+
+    threads = [threading.Thread(target=supprimer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Une seule suppression réussit, et une modification ne recrée pas le livre
+    assert sum(resultat is not None for resultat in resultats) == 1
+    with pytest.raises(KeyError):
+        catalogue.modifier(1, {"id": 1, "nom": "n", "auteur": "a", "editeur": "e"})
+    assert 1 not in catalogue
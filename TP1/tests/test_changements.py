@@ -0,0 +1,78 @@
+import asyncio
+import json
+import threading
+
+from fastapi.testclient import TestClient
+
+from Appli_Web import app
+from catalogue.catalogue import Catalogue
+from catalogue.changements import FluxChangements
+from catalogue.sqlite import StockageSQLite
+
+LIVRE = {"id": 1, "nom": "Le Hobbit", "auteur": "J.R.R. Tolkien", "editeur": "Christian Bourgois Éditeur"}
+
+
+def test_reprise_dans_le_tampon_circulaire():
+    flux = FluxChangements(taille=3)
+    for id in range(1, 6):
+        flux.mettre_a_jour(id, None, {**LIVRE, "id": id})
+    evenements, perte = flux.depuis(3)
+    assert [evenement.seq for evenement in evenements] == [4, 5] and not perte
+    assert json.loads(evenements[0].json) == {"seq": 4, "op": "ajouter", "id": 4, "livre": {**LIVRE, "id": 4}}
+    assert evenements[0].sse.startswith(b"id: 4\nevent: ajouter\ndata: {")
+    # Changements 2 et 3 sortis du tampon : la perte est signalée
+    evenements, perte = flux.depuis(1)
+    assert [evenement.seq for evenement in evenements] == [3, 4, 5] and perte
+    # Numéro inconnu (redémarrage) : perte aussi
+    assert flux.depuis(9) == ([], True)
+    assert flux.depuis(5) == ([], False)
+
+
+def test_abonnes_reveilles_par_une_ecriture_dans_un_autre_thread():
+    flux = FluxChangements()
+
+    async def ecouter():
+        ecrivain = threading.Timer(0.05, flux.mettre_a_jour, (1, LIVRE, None))
+        ecrivain.start()
+        resultats = await asyncio.gather(*(flux.attendre(0, 5) for _ in range(100)))
+        ecrivain.join()
+        return resultats
+
+    resultats = asyncio.run(ecouter())
+    # Tous les abonnés reçoivent le même objet, encodé une seule fois
+    assert all(evenements == resultats[0][0] and not perte for evenements, perte in resultats)
+    assert resultats[0][0][0].op == "supprimer" and all(r[0][0] is resultats[0][0][0] for r in resultats)
+
+
+def test_attente_sans_changement():
+    flux = FluxChangements()
+    assert asyncio.run(flux.attendre(0, 0.01)) == ([], False)
+
+
+def test_changements_des_autres_workers(tmp_path):
+    chemin = str(tmp_path / "livres.db")
+    lecteur, ecrivain = Catalogue(StockageSQLite(chemin)), Catalogue(StockageSQLite(chemin))
+    lecteur.changements.intervalle = 0.01
+    depart = lecteur.changements.sequence
+
+    async def ecouter():
+        ecrire = asyncio.to_thread(ecrivain.ajouter, 1, LIVRE)
+        return (await asyncio.gather(lecteur.changements.attendre(depart, 5), ecrire))[0]
+
+    evenements, perte = asyncio.run(ecouter())
+    assert not perte and [(e.seq, e.op, e.id, e.livre) for e in evenements] == [(ecrivain.version, "ajouter", 1, LIVRE)]
+    lecteur.fermer()
+    ecrivain.fermer()
+
+
+def test_route_attente_longue():
+    client = TestClient(app)
+    seq = client.get("/livres/changes", params={"attente": 0}).json()["seq"]
+    reponse = client.post("/livre/900001", params={"nom": "n", "auteur": "a", "editeur": "e"},
+                          json={"id": 900001, "nom": "n", "auteur": "a", "editeur": "e"})
+    assert reponse.status_code == 200
+    client.delete("/livre/900001")
+    corps = client.get("/livres/changes", params={"depuis": seq}).json()
+    assert [(e["op"], e["id"]) for e in corps["evenements"]] == [("ajouter", 900001), ("supprimer", 900001)]
+    assert corps["seq"] == seq + 2 and not corps["perte"]
+    assert client.get("/livres/changes", params={"depuis": seq + 1000, "attente": 0}).json()["perte"]
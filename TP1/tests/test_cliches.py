@@ -0,0 +1,165 @@
+import sqlite3
+import sys
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from Appli_Web import app
+from catalogue.catalogue import Catalogue
+from catalogue.instantane import VueInstantane
+from catalogue.sqlite import PoolSature, StockageSQLite
+from catalogue.stockage import LivresTries, StockageJournal, StockageMemoire
+
+
+def livre(id, nom=None):
+    return {"id": id, "nom": nom or f"Livre {id}", "auteur": "Émile Zola", "editeur": "Gallimard"}
+
+
+def test_cliche_ignore_les_ecritures_suivantes():
+    stockage = StockageMemoire({id: livre(id) for id in range(1, 6)})
+    with stockage.figer() as cliche:
+        stockage.ajouter(6, livre(6))
+        stockage.modifier(2, livre(2, "Modifié"))
+        stockage.supprimer(3)
+        stockage.appliquer_lot([("supprimer", 4, None), ("ajouter", 7, livre(7))])
+        assert list(cliche) == [1, 2, 3, 4, 5] and len(cliche) == 5
+        assert cliche[2]["nom"] == "Livre 2" and 3 in cliche and 6 not in cliche
+        assert [id for lot in cliche.lister_par_lots(2) for id, _ in lot] == [1, 2, 3, 4, 5]
+        # Un second cliché voit la nouvelle version
+        with stockage.figer() as suivant:
+            assert list(suivant) == [1, 2, 5, 6, 7] and suivant.version > cliche.version
+            stockage.remplacer({10: livre(10)})
+            assert list(cliche) == [1, 2, 3, 4, 5] and list(suivant) == [1, 2, 5, 6, 7]
+    # Plus aucun cliché : les anciennes versions sont libérées
+    assert stockage._historique == {} and not stockage._cliches
+
+
+def test_historique_seulement_pendant_un_cliche():
+    stockage = StockageMemoire({1: livre(1)})
+    stockage.modifier(1, livre(1, "A"))
+    assert stockage._historique == {}
+    ancien = stockage.figer()
+    stockage.modifier(1, livre(1, "B"))
+    recent = stockage.figer()
+    stockage.modifier(1, livre(1, "C"))
+    assert (ancien[1]["nom"], recent[1]["nom"], stockage.get(1)["nom"]) == ("A", "B", "C")
+    # L'ancien cliché libéré, seule la version vue par le récent reste conservée
+    ancien.liberer()
+    assert [len(versions) for versions in stockage._historique.values()] == [1]
+    assert recent[1]["nom"] == "B"
+    recent.liberer()
+    assert stockage._historique == {}
+
+
+def test_tranche_d_ids_pendant_les_suppressions():
+    # Les suppressions d'ID plus petits décalent la liste triée : la tranche lue ne doit sauter aucun ID
+    livres = LivresTries({id: livre(id) for id in range(1, 40_001)})
+    intervalle = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    suppression = threading.Thread(target=lambda: [livres.pop(id) for id in range(1, 20_000)])
+    suppression.start()
+    try:
+        while suppression.is_alive():
+            assert livres.ids_apres(30_000, 3) == [30_001, 30_002, 30_003]
+    finally:
+        suppression.join()
+        sys.setswitchinterval(intervalle)
+
+
+def test_parcours_coherent_pendant_les_ecritures():
+    catalogue = Catalogue(StockageMemoire({id: livre(id) for id in range(1, 2001)}))
+    arret = threading.Event()
+
+    def ecrire():
+        id = 2001
+        while not arret.is_set():
+            catalogue[id] = livre(id)
+            del catalogue[id - 2000]
+            id += 1
+
+    # Changements de thread très fréquents : l'écrivain s'intercale au milieu des lectures
+    intervalle = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    ecrivain = threading.Thread(target=ecrire)
+    ecrivain.start()
+    try:
+        for _ in range(20):
+            # Une version entière : des livres consécutifs, sans trou ni doublon (2001 entre un ajout et la suppression)
+            ids = [livre["id"] for lot in catalogue.lots(100) for livre in lot]
+            assert len(ids) in (2000, 2001) and ids == list(range(ids[0], ids[0] + len(ids)))
+    finally:
+        arret.set()
+        ecrivain.join()
+        sys.setswitchinterval(intervalle)
+    assert catalogue.stockage._historique == {}
+
+
+def test_cliche_journal(tmp_path):
+    stockage = StockageJournal(str(tmp_path), seuil_compactage=2)
+    stockage.ajouter(1, livre(1))
+    with stockage.figer() as cliche:
+        for id in range(2, 6):
+            stockage.ajouter(id, livre(id))
+        stockage.supprimer(1)
+        assert dict(cliche) == {1: livre(1)}
+    stockage.fermer()
+
+
+def test_cliche_sqlite(tmp_path):
+    stockage = StockageSQLite(str(tmp_path / "livres.db"))
+    stockage.remplacer({id: livre(id) for id in range(1, 4)})
+    with stockage.figer() as cliche:
+        stockage.ajouter(4, livre(4))
+        stockage.supprimer(1)
+        assert list(cliche) == [1, 2, 3] and len(cliche) == 3 and cliche[1] == livre(1)
+        assert [id for lot in cliche.lister_par_lots(2) for id, _ in lot] == [1, 2, 3]
+    assert [id for id, _ in stockage.lister()] == [2, 3, 4]
+    stockage.fermer()
+
+
+def test_les_cliches_sqlite_n_occupent_pas_le_pool(tmp_path):
+    stockage = StockageSQLite(str(tmp_path / "livres.db"), taille_pool=1, attente_pool=0.05)
+    stockage.remplacer({1: livre(1)})
+    cliches = [stockage.figer() for _ in range(3)]
+    # Trois exports en cours et une seule connexion dans le pool : les requêtes sont toujours servies
+    assert stockage.get(1) == livre(1)
+    for cliche in cliches:
+        assert list(cliche) == [1]
+        cliche.liberer()
+    stockage.fermer()
+
+
+def test_pool_sature(tmp_path, monkeypatch):
+    stockage = StockageSQLite(str(tmp_path / "livres.db"), taille_pool=1, attente_pool=0.05)
+    monkeypatch.setattr("routes.routes.liste_livres", Catalogue(stockage))
+    with stockage.pool.connexion():
+        # Le délai écoulé, l'emprunt échoue au lieu d'attendre indéfiniment
+        with pytest.raises(PoolSature):
+            stockage.get(1)
+        # Les routes répondent 503, avec un délai avant de réessayer
+        reponse = TestClient(app).get("/livre/1")
+        assert reponse.status_code == 503 and reponse.headers["retry-after"] == "1"
+    assert stockage.get(1) is None
+    stockage.fermer()
+
+
+def test_sauvegarde_sqlite(tmp_path):
+    catalogue = Catalogue(StockageSQLite(str(tmp_path / "livres.db")), str(tmp_path / "sauvegardes"))
+    catalogue.stockage.remplacer({1: livre(1), 2: livre(2)})
+    sauvegarde = catalogue.sauvegarder()
+    assert sauvegarde["version"] == catalogue.stockage.version()
+    with sqlite3.connect(sauvegarde["chemin"]) as connexion:
+        assert connexion.execute("SELECT COUNT(*) FROM livres").fetchone()[0] == 2
+    catalogue.fermer()
+
+
+def test_route_admin_sauvegarde(tmp_path, monkeypatch):
+    from data.data_livres import liste_livres
+    monkeypatch.setattr(liste_livres, "dossier_sauvegardes", str(tmp_path))
+    reponse = TestClient(app).post("/admin/sauvegarde")
+    assert reponse.status_code == 200
+    vue = VueInstantane(reponse.json()["chemin"])
+    assert dict(vue) == dict(liste_livres.items()) and vue.sequence == reponse.json()["version"]
+    monkeypatch.setattr(liste_livres, "dossier_sauvegardes", None)
+    assert TestClient(app).post("/admin/sauvegarde").status_code == 409
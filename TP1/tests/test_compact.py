@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from catalogue.catalogue import Catalogue
+from catalogue.compact import LivresCompacts, StockageCompact, memoire_par_worker
+from catalogue.stockage import StockageMemoire
+
+
+def livre(id, n=0):
+    return {"id": id, "nom": f"Livre n°{n} — {id}", "auteur": f"Auteur {n % 7}", "editeur": "Gallimard"}
+
+
+def test_meme_contenu_que_le_stockage_memoire():
+    aleatoire = random.Random(0)
+    memoire, compact = Catalogue(StockageMemoire({})), Catalogue(StockageCompact({}))
+    for n in range(20000):
+        id = aleatoire.randint(1, 500)
+        tirage = aleatoire.random()
+        if tirage < 0.5:
+            nouveau = livre(id, n)
+        elif tirage < 0.55:
+            # Un livre d'une autre forme est gardé tel quel, hors des colonnes
+            nouveau = dict(livre(id, n), annee=2000 + n % 20)
+        elif id in memoire:
+            del memoire[id]
+            del compact[id]
+            continue
+        else:
+            continue
+        memoire[id] = nouveau
+        compact[id] = nouveau
+    assert list(compact) == sorted(memoire)
+    assert dict(compact.stockage.lister()) == dict(memoire.stockage.lister())
+    for tri in ("id", "nom", "auteur"):
+        assert compact.page(tri, 30).livres == memoire.page(tri, 30).livres
+    assert sorted(compact.filtrer({"auteur": "auteur 3"})) == sorted(memoire.filtrer({"auteur": "auteur 3"}))
+
+
+def test_ids_tries_et_compactage():
+    livres = LivresCompacts({id: livre(id) for id in range(1, 3001)})
+    for id in range(1, 3001, 3):
+        del livres[id]
+    for n in range(2):
+        for id in range(2, 3001, 3):
+            livres[id] = livre(id, n)
+    # Plus de la moitié des lignes étaient obsolètes : les colonnes ont été reconstruites
+    assert len(livres._colonnes.debuts) < 3000
+    assert livres[2] == livre(2, 1) and livres[3] == livre(3) and 1 not in livres
+    assert livres.ids_apres(None, 3) == [2, 3, 5] and livres.ids_avant(8, 2) == [5, 6]
+    assert livres.rang(5) == 2 and livres.id_max() == 3000 and len(livres) == 2000
+
+
+def test_stockage_compact_ajout_strict():
+    stockage = StockageCompact({1: livre(1)})
+    assert stockage.allouer_id() == 2
+    with pytest.raises(ValueError):
+        stockage.ajouter(1, livre(1, 5))
+    assert stockage.get(1) == livre(1) and stockage.get(2) is None
+
+
+def test_memoire_par_worker_avec_les_index():
+    # Stockage, index de tri, de filtres et de recherche, encodage JSON : le tout tient en moins de 1 Ko par livre
+    parties = memoire_par_worker("compact", 5000)
+    assert parties["stockage"] < 100
+    assert parties["tris"] + parties["filtres"] + parties["recherche"] < 700
+    assert parties["json"] < 250
+    assert parties["total"] == pytest.approx(sum(valeur for partie, valeur in parties.items() if partie != "total"))
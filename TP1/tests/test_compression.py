@@ -0,0 +1,56 @@
+import gzip
+import json
+
+from fastapi.testclient import TestClient
+
+from Appli_Web import app
+from catalogue.compression import choisir_encodage
+from routes.routes import cache_reponses
+
+GZIP = {"Accept-Encoding": "gzip"}
+IDENTITE = {"Accept-Encoding": "identity"}
+
+
+def brut(client: TestClient, url: str, headers: dict):
+    # Réponse sans décompression automatique par le client, pour lire les octets réellement envoyés
+    with client.stream("GET", url, headers=headers) as reponse:
+        return reponse, b"".join(reponse.iter_raw())
+
+
+def test_choix_de_l_encodage():
+    assert choisir_encodage("gzip, deflate") == "gzip"
+    assert choisir_encodage("") is None and choisir_encodage("identity") is None
+    assert choisir_encodage("gzip;q=0") is None and choisir_encodage("*") is not None
+    assert choisir_encodage("*;q=0.5, gzip;q=0") in (None, "br")
+
+
+def test_liste_complete_compressee_et_gardee_en_cache():
+    client = TestClient(app)
+    reponse, compresse = brut(client, "/Livres", GZIP)
+    assert reponse.headers["content-encoding"] == "gzip" and "accept-encoding" in reponse.headers["vary"].lower()
+    assert int(reponse.headers["content-length"]) == len(compresse)
+    identite, corps = brut(client, "/Livres", IDENTITE)
+    assert "content-encoding" not in identite.headers and gzip.decompress(compresse) == corps
+    assert len(compresse) < len(corps)
+    # Même version du catalogue : la même réponse compressée est resservie, sans recompression
+    succes = cache_reponses.succes
+    assert brut(client, "/Livres", GZIP)[1] == compresse and cache_reponses.succes == succes + 1
+    # Une modification du catalogue invalide le cache
+    nouveau = {"id": 900002, "nom": "Nouveau", "auteur": "A", "editeur": "E"}
+    assert client.post("/livre/900002", params=nouveau, json=nouveau).status_code == 200
+    livres = json.loads(gzip.decompress(brut(client, "/Livres", GZIP)[1]))
+    assert livres[-1] == nouveau
+    client.delete("/livre/900002")
+
+
+def test_petite_reponse_non_compressee():
+    reponse, _ = brut(TestClient(app), "/livre/1", GZIP)
+    assert reponse.status_code == 200 and "content-encoding" not in reponse.headers
+
+
+def test_export_compresse_par_morceaux():
+    client = TestClient(app)
+    reponse, compresse = brut(client, "/Livres/export?format=ndjson", GZIP)
+    assert reponse.headers["content-encoding"] == "gzip" and "content-length" not in reponse.headers
+    assert gzip.decompress(compresse) == brut(client, "/Livres/export?format=ndjson", IDENTITE)[1]
+
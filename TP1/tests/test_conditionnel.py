@@ -0,0 +1,68 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from Appli_Web import app
+from catalogue.catalogue import Catalogue
+from catalogue.sqlite import StockageSQLite
+from data.data_livres import liste_livres
+
+LIVRE = {"id": 1, "nom": "Le Hobbit", "auteur": "J.R.R. Tolkien", "editeur": "Christian Bourgois Éditeur"}
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("url", ["/Livres", "/Livres?sort=nom&limit=5", "/total_livres", "/livre/2"])
+def test_304_tant_que_rien_ne_change(client, url):
+    reponse = client.get(url)
+    etag, date = reponse.headers["etag"], reponse.headers["last-modified"]
+    non_modifie = client.get(url, headers={"If-None-Match": etag})
+    assert non_modifie.status_code == 304 and non_modifie.content == b"" and non_modifie.headers["etag"] == etag
+    assert client.get(url, headers={"If-Modified-Since": date}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"autre"'}).status_code == 200
+
+
+def test_une_modification_change_les_etags(client):
+    catalogue, livre_2, livre_3 = (client.get(url).headers["etag"] for url in ("/Livres", "/livre/2", "/livre/3"))
+    liste_livres[2] = {**liste_livres[2], "nom": "Renommé"}
+    assert client.get("/Livres", headers={"If-None-Match": catalogue}).status_code == 200
+    assert client.get("/livre/2", headers={"If-None-Match": livre_2}).status_code == 200
+    # L'ETag d'un livre ne dépend que de ce livre
+    assert client.get("/livre/3", headers={"If-None-Match": livre_3}).status_code == 304
+
+
+def test_livre_supprime_introuvable_malgre_l_etag(client):
+    id = liste_livres.allouer_id()
+    liste_livres.ajouter(id, {**LIVRE, "id": id})
+    etag = client.get(f"/livre/{id}").headers["etag"]
+    del liste_livres[id]
+    assert client.get(f"/livre/{id}", headers={"If-None-Match": etag}).status_code == 404
+
+
+def test_etat_des_livres_partage_entre_workers(tmp_path):
+    chemin = str(tmp_path / "livres.db")
+    worker_a, worker_b = Catalogue(StockageSQLite(chemin)), Catalogue(StockageSQLite(chemin))
+    worker_a.ajouter(1, LIVRE)
+    worker_a.ajouter(2, {**LIVRE, "id": 2})
+    avant = worker_b.etat_livre(1)
+    worker_a[1] = {**LIVRE, "nom": "Bilbo le Hobbit"}
+    epoque, version, _ = worker_b.etat_livre(1)
+    assert epoque == avant[0] == worker_b.etat()[0] and version > avant[1] == worker_b.etat_livre(2)[1] - 1
+    del worker_a[1]
+    assert worker_b.etat_livre(1) is None
+    worker_a.fermer()
+    worker_b.fermer()
+
+
+@pytest.mark.parametrize("url", ["/Livres", "/Livres?sort=nom&limit=100"])
+def test_etag_propre_a_chaque_encodage(client, url):
+    compresse, identite = (client.get(url, headers={"Accept-Encoding": encodage}) for encodage in ("gzip", "identity"))
+    assert compresse.headers["content-encoding"] == "gzip" and "content-encoding" not in identite.headers
+    assert compresse.headers["etag"] == identite.headers["etag"][:-1] + '-gzip"'
+    # Chaque forme de l'ETag désigne la même version de la ressource, quel que soit l'encodage demandé ensuite
+    for etag in (compresse.headers["etag"], identite.headers["etag"], "W/" + compresse.headers["etag"]):
+        non_modifie = client.get(url, headers={"If-None-Match": etag, "Accept-Encoding": "identity"})
+        assert non_modifie.status_code == 304 and non_modifie.headers["etag"] == etag.removeprefix("W/")
+    assert client.get(url, headers={"If-None-Match": identite.headers["etag"][:-1] + '-zstd"'}).status_code == 200
@@ -0,0 +1,63 @@
+import json
+
+from catalogue import encodage
+from catalogue.catalogue import Catalogue
+from catalogue.sqlite import StockageSQLite
+from catalogue.stockage import StockageMemoire
+
+LIVRE = {"id": 1, "nom": "Le Hobbit", "auteur": "J.R.R. Tolkien", "editeur": "Christian Bourgois Éditeur"}
+
+
+def test_meme_json_avec_ou_sans_orjson(monkeypatch):
+    attendu = json.dumps(LIVRE, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    assert encodage.encoder(LIVRE) == attendu
+    monkeypatch.setattr(encodage, "orjson", None)
+    assert encodage.encoder(LIVRE) == attendu
+
+
+def test_encodage_reutilise_puis_oublie_a_la_modification():
+    catalogue = Catalogue(StockageMemoire({1: LIVRE, 2: {**LIVRE, "id": 2}}))
+    version = catalogue.version
+    premier = catalogue.json.morceaux(catalogue.values(), version)
+    # Le même morceau est réutilisé tel quel, sans réencoder le livre
+    assert catalogue.json.morceaux(catalogue.values(), version)[0] is premier[0]
+    assert json.loads(catalogue.encoder_livres(catalogue.values(), version)) == [LIVRE, {**LIVRE, "id": 2}]
+    catalogue[1] = {**LIVRE, "nom": "Bilbo le Hobbit"}
+    assert json.loads(catalogue.encoder_livre(catalogue[1], catalogue.version))["nom"] == "Bilbo le Hobbit"
+    # Le livre qui n'a pas changé garde son encodage
+    assert catalogue.json.morceaux([catalogue[2]], catalogue.version)[0] is premier[1]
+
+
+def test_livre_lu_avant_une_ecriture_pas_garde():
+    catalogue = Catalogue(StockageMemoire({1: LIVRE}))
+    version, ancien = catalogue.version, catalogue[1]
+    catalogue[1] = {**LIVRE, "nom": "Bilbo le Hobbit"}
+    # L'ancien contenu est encodé pour cette réponse, mais jamais resservi
+    assert json.loads(catalogue.encoder_livre(ancien, version))["nom"] == "Le Hobbit"
+    assert json.loads(catalogue.encoder_livre(catalogue[1], catalogue.version))["nom"] == "Bilbo le Hobbit"
+
+
+def test_stockage_partage_lie_a_la_version(tmp_path):
+    chemin = str(tmp_path / "livres.db")
+    lecteur, ecrivain = Catalogue(StockageSQLite(chemin)), Catalogue(StockageSQLite(chemin))
+    ecrivain.ajouter(1, LIVRE)
+    assert json.loads(lecteur.encoder_livre(lecteur[1], lecteur.version))["nom"] == "Le Hobbit"
+    # Modification faite par un autre worker : le lecteur n'en est pas averti, mais la version a changé
+    ecrivain[1] = {**LIVRE, "nom": "Bilbo le Hobbit"}
+    assert json.loads(lecteur.encoder_livre(lecteur[1], lecteur.version))["nom"] == "Bilbo le Hobbit"
+    lecteur.fermer()
+    ecrivain.fermer()
+
+
+def test_liste_figee_sans_l_encodage_d_une_version_plus_recente():
+    catalogue = Catalogue(StockageMemoire({1: LIVRE, 2: {**LIVRE, "id": 2}}))
+    version = catalogue.version
+    with catalogue.figer() as cliche:
+        catalogue[1] = {**LIVRE, "nom": "Bilbo le Hobbit"}
+        # Une autre requête encode (et garde) le nouveau contenu pendant que la liste figée est parcourue
+        catalogue.encoder_livre(catalogue[1], catalogue.version)
+        livres = [livre for _, livre in cliche.lister()]
+        assert [livre["nom"] for livre in json.loads(catalogue.encoder_livres(livres, version))] == ["Le Hobbit"] * 2
+    # Le nouveau contenu reste gardé pour les lectures suivantes
+    assert catalogue.json.morceaux([catalogue[1]], catalogue.version)[0] is catalogue.json.morceaux([catalogue[1]], catalogue.version)[0]
+    assert json.loads(catalogue.encoder_livre(catalogue[1], catalogue.version))["nom"] == "Bilbo le Hobbit"
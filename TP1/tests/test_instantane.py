@@ -0,0 +1,98 @@
+import pytest
+
+from catalogue.catalogue import ID_MAX, Catalogue
+from catalogue.instantane import (EN_TETE_V1, SIGNATURE_V1, CatalogueSuperpose, VueInstantane,
+                                  chemin_instantane, ecrire_instantane)
+from catalogue.pagination import encoder_curseur
+from catalogue.stockage import StockageJournal, StockageMemoire
+
+
+def livre(id, nom=None):
+    return {"id": id, "nom": nom or f"Livre {id}", "auteur": "Émile Zola", "editeur": "Gallimard"}
+
+
+@pytest.fixture
+def vue(tmp_path):
+    livres = {id: livre(id) for id in (3, 1, 7, 5, 9)}
+    livres[5] = livre(5, "L'Œuvre — édition «illustrée» 📚")
+    chemin = chemin_instantane(str(tmp_path), 12)
+    ecrire_instantane(chemin, livres, 12, dernier_id=20)
+    return VueInstantane(chemin)
+
+
+def test_aller_retour(vue):
+    assert list(vue) == [1, 3, 5, 7, 9]
+    assert vue[5]["nom"] == "L'Œuvre — édition «illustrée» 📚"
+    assert dict(vue) == {id: livre(id) if id != 5 else vue[5] for id in (1, 3, 5, 7, 9)}
+    assert (vue.sequence, vue.dernier_id) == (12, 20)
+    assert 4 not in vue and "3" not in vue
+
+
+def test_instantane_vide(tmp_path):
+    chemin = chemin_instantane(str(tmp_path), 0)
+    ecrire_instantane(chemin, {}, 0)
+    vue = VueInstantane(chemin)
+    assert (len(vue), list(vue), vue.id_max(), vue.dernier_id) == (0, [], 0, 0)
+
+
+def test_lecture_du_format_v1(tmp_path, vue):
+    # Même contenu, mais avec l'en-tête de la première version (sans le plus grand ID attribué)
+    with open(vue.chemin, "rb") as f:
+        contenu = f.read()
+    chemin = chemin_instantane(str(tmp_path), 1)
+    with open(chemin, "wb") as f:
+        f.write(EN_TETE_V1.pack(SIGNATURE_V1, 5, 12) + contenu[32:])
+    ancienne = VueInstantane(chemin)
+    assert dict(ancienne) == dict(vue)
+    assert ancienne.dernier_id == 9
+
+
+def test_signature_invalide(tmp_path):
+    chemin = tmp_path / "livres.snapshot.1.cat"
+    chemin.write_bytes(b"PASUNCAT" + bytes(24))
+    with pytest.raises(ValueError):
+        VueInstantane(str(chemin))
+
+
+def test_superposition_ids_tries_et_rangs(vue):
+    livres = CatalogueSuperpose(vue)
+    livres[4] = livre(4)
+    livres[12] = livre(12)
+    livres[3] = livre(3, "Modifié")
+    del livres[7]
+    del livres[4]
+    attendus = [1, 3, 5, 9, 12]
+    assert list(livres) == attendus and len(livres) == 5
+    assert livres[3]["nom"] == "Modifié"
+    for id in range(0, 14):
+        assert livres.rang(id) == sum(1 for autre in attendus if autre < id)
+        assert livres.ids_apres(id, 2) == [autre for autre in attendus if autre > id][:2]
+        assert livres.ids_avant(id, 2) == [autre for autre in attendus if autre < id][-2:]
+    livres[7] = livre(7)
+    assert livres.rang(9) == 4 and livres.ids_avant(9, 10) == [1, 3, 5, 7]
+
+
+def test_tri_par_id_sans_decoder_les_livres(tmp_path, monkeypatch):
+    catalogue = Catalogue(StockageJournal(str(tmp_path)))
+    for id in (1, 3, 5, 7, 9):
+        catalogue.ajouter(id, livre(id))
+    catalogue.stockage.compacter()
+    del catalogue[5]
+    lus = []
+    lire = VueInstantane.__getitem__
+    monkeypatch.setattr(VueInstantane, "__getitem__", lambda self, id: lus.append(id) or lire(self, id))
+    page = catalogue.page("id", 2)
+    assert [l["id"] for l in page.livres] == [1, 3] and page.total == 4
+    page = catalogue.page(limite=2, curseur=encoder_curseur("id", (9,), "precedent"))
+    assert [l["id"] for l in page.livres] == [3, 7] and page.rang == 1
+    # Seuls les livres des pages affichées sont décodés
+    assert sorted(lus) == [1, 3, 3, 7]
+
+
+def test_id_trop_grand_refuse():
+    catalogue = Catalogue(StockageMemoire({}))
+    with pytest.raises(ValueError):
+        catalogue.ajouter(ID_MAX + 1, livre(ID_MAX + 1))
+    refusees = catalogue.appliquer_lot([("ajouter", ID_MAX + 1, livre(ID_MAX + 1)), ("ajouter", 2, livre(2))])
+    assert [position for position, _ in refusees] == [0]
+    assert list(catalogue) == [2]
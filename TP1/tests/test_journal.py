@@ -0,0 +1,86 @@
+import json
+
+from catalogue.journal import Journal
+from catalogue.stockage import StockageJournal
+
+LIVRE = {"id": 1, "nom": "Le Hobbit", "auteur": "J.R.R. Tolkien", "editeur": "Christian Bourgois Éditeur"}
+
+
+def test_rejouer_ignore_et_tronque_une_ligne_incomplete(tmp_path):
+    chemin = tmp_path / "livres.journal"
+    journal = Journal(str(chemin))
+    journal.ecrire({"seq": 1, "op": "put", "id": 1, "livre": LIVRE})
+    journal.ecrire({"seq": 2, "op": "del", "id": 1})
+    journal.fermer()
+    taille_valide = chemin.stat().st_size
+    # Arrêt brutal au milieu de l'écriture du troisième enregistrement
+    with open(chemin, "ab") as f:
+        f.write(b'{"seq": 3, "op": "put", "id": 2, "liv')
+
+    journal = Journal(str(chemin))
+    assert [enregistrement["seq"] for enregistrement in journal.rejouer()] == [1, 2]
+    assert chemin.stat().st_size == taille_valide
+    # Les écritures suivantes repartent sur une ligne propre
+    journal.ecrire({"seq": 3, "op": "del", "id": 2})
+    journal.fermer()
+    assert [json.loads(ligne)["seq"] for ligne in chemin.read_bytes().splitlines()] == [1, 2, 3]
+
+
+def test_stockage_rejoue_le_journal_apres_redemarrage(tmp_path):
+    stockage = StockageJournal(str(tmp_path))
+    stockage.ajouter(1, LIVRE)
+    stockage.ajouter(2, {**LIVRE, "id": 2, "nom": "Le Silmarillion"})
+    stockage.supprimer(1)
+    stockage.fermer()
+    with open(tmp_path / "livres.journal", "ab") as f:
+        f.write(b'{"seq": 4, "op": "del"')
+
+    stockage = StockageJournal(str(tmp_path))
+    assert stockage.get(1) is None
+    assert stockage.get(2)["nom"] == "Le Silmarillion"
+    assert stockage.compter() == 1
+    stockage.fermer()
+
+
+def test_les_operations_deja_dans_l_instantane_ne_sont_pas_rejouees(tmp_path):
+    stockage = StockageJournal(str(tmp_path))
+    stockage.ajouter(1, LIVRE)
+    stockage.modifier(1, {**LIVRE, "nom": "Bilbo le Hobbit"})
+    stockage.compacter()
+    stockage.fermer()
+    # Journal laissé par un arrêt entre l'écriture de l'instantané (séquence 2) et la troncature du journal
+    lignes = [{"seq": 1, "op": "del", "id": 1}, {"seq": 3, "op": "put", "id": 2, "livre": {**LIVRE, "id": 2}}]
+    (tmp_path / "livres.journal").write_bytes(b"".join(json.dumps(ligne).encode() + b"\n" for ligne in lignes))
+
+    stockage = StockageJournal(str(tmp_path))
+    assert stockage.get(1)["nom"] == "Bilbo le Hobbit"
+    assert stockage.get(2) == {**LIVRE, "id": 2}
+    assert stockage.sequence == 3
+    stockage.fermer()
+
+
+def test_un_id_supprime_n_est_pas_reattribue_apres_redemarrage(tmp_path):
+    stockage = StockageJournal(str(tmp_path))
+    stockage.ajouter(1, LIVRE)
+    stockage.ajouter(2, {**LIVRE, "id": 2})
+    stockage.supprimer(2)
+    stockage.compacter()
+    stockage.fermer()
+
+    stockage = StockageJournal(str(tmp_path))
+    assert stockage.allouer_id() == 3
+    stockage.fermer()
+
+
+def test_export_par_lots_dans_l_ordre_des_id(tmp_path):
+    stockage = StockageJournal(str(tmp_path))
+    for id in (5, 1, 3):
+        stockage.ajouter(id, {**LIVRE, "id": id})
+    stockage.compacter()
+    # Modifications après l'instantané : un ajout au milieu, une suppression, un ajout à la fin
+    stockage.ajouter(2, {**LIVRE, "id": 2})
+    stockage.supprimer(3)
+    stockage.ajouter(9, {**LIVRE, "id": 9})
+    lots = list(stockage.lister_par_lots(2))
+    assert [[id for id, _ in lot] for lot in lots] == [[1, 2], [5, 9]]
+    stockage.fermer()
@@ -0,0 +1,53 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from Appli_Web import app
+from catalogue.catalogue import Catalogue
+from catalogue.compact import StockageCompact
+from catalogue.sqlite import StockageSQLite
+from catalogue.stockage import StockageMemoire
+from routes.routes import MAX_IDS_PAR_REQUETE, convertir_ids
+
+
+def livre(id):
+    return {"id": id, "nom": f"Livre {id}", "auteur": "Victor Hugo", "editeur": "Hachette"}
+
+
+def test_lire_plusieurs_dans_l_ordre_demande(tmp_path):
+    livres = {id: livre(id) for id in range(1, 11)}
+    sqlite = StockageSQLite(str(tmp_path / "livres.db"))
+    sqlite.remplacer(livres)
+    for stockage in (StockageMemoire(livres), StockageCompact(livres), sqlite):
+        trouves, manquants = Catalogue(stockage).lire_plusieurs([7, 42, 3, 7, 10, 99, 1])
+        assert [l["id"] for l in trouves] == [7, 3, 10, 1] and trouves[0] == livre(7)
+        assert manquants == [42, 99]
+    sqlite.fermer()
+
+
+def test_routes_de_lecture_multiple():
+    client = TestClient(app)
+    reponse = client.get("/livres?ids=3,999999,1&ids=2")
+    assert reponse.status_code == 200
+    assert [l["id"] for l in reponse.json()["livres"]] == [3, 1, 2] and reponse.json()["manquants"] == [999999]
+    assert reponse.json()["livres"][0] == client.get("/livre/3").json()
+    corps = client.post("/livres/batch-get", json={"ids": [2, 888888, 1]}).json()
+    assert [l["id"] for l in corps["livres"]] == [2, 1] and corps["manquants"] == [888888]
+    assert client.post("/livres/batch-get", json=[1]).json()["livres"][0]["id"] == 1
+
+
+def test_ids_invalides():
+    client = TestClient(app)
+    for reponse in (client.get("/livres"), client.get("/livres?ids=a"), client.get("/livres?ids=0"),
+                    client.post("/livres/batch-get", content=b"pas du JSON"), client.post("/livres/batch-get", json={"ids": [True]}),
+                    client.post("/livres/batch-get", json={"ids": list(range(1, MAX_IDS_PAR_REQUETE + 2))})):
+        assert reponse.status_code == 400
+
+
+def test_chiffres_non_decimaux_refuses():
+    # "²" et "①" sont des chiffres pour isdigit, mais pas des nombres pour int() : même message que pour "a"
+    for valeur in ("²", "1²", "①"):
+        with pytest.raises(ValueError, match="L'ID doit être un entier"):
+            convertir_ids([valeur])
+        reponse = TestClient(app).get(f"/livres?ids={valeur}")
+        assert reponse.status_code == 400 and "L'ID doit être un entier" in reponse.json()["detail"]
+    assert convertir_ids([" 7", "12"]) == [7, 12]
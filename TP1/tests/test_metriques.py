@@ -0,0 +1,82 @@
+import re
+import threading
+
+from fastapi.testclient import TestClient
+from jinja2 import Environment
+
+from Appli_Web import app
+from catalogue.metriques import Registre, mesurer_rendus
+
+
+def valeur(texte: str, ligne: str) -> float:
+    # Valeur d'une ligne de l'exposition Prometheus (nom et étiquettes donnés exactement)
+    correspondance = re.search("^" + re.escape(ligne) + r" (\S+)$", texte, re.MULTILINE)
+    assert correspondance, ligne
+    return float(correspondance.group(1))
+
+
+def test_histogramme_cumule_les_intervalles():
+    registre = Registre()
+    histogramme = registre.histogramme("duree", "Durée", ("route",), bornes=(1, 5))
+    for mesure in (0.5, 1, 3, 10):
+        histogramme.observer(mesure, "/a")
+    texte = registre.exposer()
+    assert "# TYPE duree histogram" in texte
+    assert valeur(texte, 'duree_bucket{route="/a",le="1"}') == 2
+    assert valeur(texte, 'duree_bucket{route="/a",le="5"}') == 3
+    assert valeur(texte, 'duree_bucket{route="/a",le="+Inf"}') == 4
+    assert valeur(texte, 'duree_sum{route="/a"}') == 14.5
+    assert valeur(texte, 'duree_count{route="/a"}') == 4
+
+
+def test_aucune_mesure_perdue_entre_threads():
+    registre = Registre()
+    compteur = registre.compteur("requetes_total", "Requêtes", ("code",))
+    histogramme = registre.histogramme("duree", "Durée")
+
+    def mesurer():
+        for _ in range(10_000):
+            compteur.incrementer(1, 200)
+            histogramme.observer(0.002)
+
+    threads = [threading.Thread(target=mesurer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    texte = registre.exposer()
+    assert valeur(texte, 'requetes_total{code="200"}') == 80_000
+    assert valeur(texte, "duree_count") == 80_000
+
+
+def test_etiquettes_echappees():
+    registre = Registre()
+    registre.compteur("c", "Compteur", ("q",)).incrementer(1, 'a"b\\c\nd')
+    assert 'c{q="a\\"b\\\\c\\nd"} 1' in registre.exposer()
+
+
+def test_rendu_des_templates_mesure():
+    registre = Registre()
+    environnement = Environment()
+    mesurer_rendus(environnement, registre.histogramme("rendu", "Rendu", ("template",)))
+    assert environnement.from_string("Bonjour {{ nom }}").render(nom="Alice") == "Bonjour Alice"
+    assert valeur(registre.exposer(), 'rendu_count{template="None"}') == 1
+
+
+def test_route_metrics():
+    client = TestClient(app)
+    client.get("/livre/1")
+    client.get("/livre/2")
+    client.get("/chemin-inconnu")
+    reponse = client.get("/metrics")
+    assert reponse.headers["content-type"].startswith("text/plain; version=0.0.4")
+    texte = reponse.text
+    # Les requêtes sont regroupées par route déclarée, pas par chemin demandé
+    assert valeur(texte, 'http_requete_duree_secondes_count{methode="GET",route="/livre/{id}"}') >= 2
+    assert valeur(texte, 'http_requetes_total{methode="GET",route="/livre/{id}",code="200"}') >= 2
+    assert valeur(texte, 'http_requetes_total{methode="GET",route="inconnue",code="404"}') >= 1
+    assert valeur(texte, 'http_reponse_taille_octets_sum{methode="GET",route="/livre/{id}"}') > 0
+    assert valeur(texte, 'catalogue_lecture_duree_secondes_count{operation="lire"}') >= 1
+    # Seule la requête /metrics elle-même est en cours
+    assert valeur(texte, "http_requetes_en_cours") == 1
+    assert "catalogue_version" in texte and "changements_abonnes 0" in texte
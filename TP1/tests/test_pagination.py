@@ -0,0 +1,62 @@
+import pytest
+
+from catalogue.catalogue import Catalogue
+from catalogue.pagination import decoder_curseur, encoder_curseur
+from catalogue.stockage import StockageMemoire
+
+AUTEURS = ["Émile Zola", "albert Camus", "Victor Hugo"]
+
+
+@pytest.fixture
+def catalogue():
+    livres = {id: {"id": id, "nom": f"Livre {id:02d}", "auteur": AUTEURS[id % 3], "editeur": "Gallimard"}
+              for id in range(1, 26)}
+    return Catalogue(StockageMemoire(livres))
+
+
+@pytest.mark.parametrize("tri, cle, direction", [
+    ("id", (42,), "suivant"),
+    ("auteur", ("émile zola", 7), "precedent"),
+])
+def test_curseur_aller_retour(tri, cle, direction):
+    curseur = encoder_curseur(tri, cle, direction)
+    assert "=" not in curseur
+    assert decoder_curseur(curseur) == (tri, cle, direction)
+
+
+@pytest.mark.parametrize("curseur", [
+    "pas du base64 !",
+    encoder_curseur("prix", (1,), "suivant"),
+    encoder_curseur("id", (1,), "ailleurs"),
+    encoder_curseur("id", ("1",), "suivant"),
+    encoder_curseur("nom", (1, "x"), "suivant"),
+])
+def test_curseur_invalide(curseur):
+    with pytest.raises(ValueError):
+        decoder_curseur(curseur)
+
+
+@pytest.mark.parametrize("tri", ["id", "nom", "auteur"])
+def test_parcours_complet_dans_les_deux_sens(catalogue, tri):
+    page = catalogue.page(tri=tri, limite=4)
+    pages = [[livre["id"] for livre in page.livres]]
+    while page.suivant:
+        page = catalogue.page(limite=4, curseur=page.suivant)
+        assert page.rang == 4 * len(pages)
+        pages.append([livre["id"] for livre in page.livres])
+    ids = [id for page_ids in pages for id in page_ids]
+    attendu = sorted(catalogue, key=lambda id: (catalogue[id][tri].casefold(), id) if tri != "id" else (id,))
+    assert ids == attendu
+
+    retour = []
+    while page.precedent:
+        page = catalogue.page(limite=4, curseur=page.precedent)
+        retour.append([livre["id"] for livre in page.livres])
+    assert retour == pages[-2::-1]
+
+
+def test_le_curseur_reste_valide_apres_une_suppression(catalogue):
+    page = catalogue.page(tri="id", limite=5)
+    del catalogue[3]
+    suivante = catalogue.page(limite=5, curseur=page.suivant)
+    assert [livre["id"] for livre in suivante.livres] == [6, 7, 8, 9, 10]
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from Appli_Web import app
+from catalogue.profileur import Profileur, motif_route
+
+
+def calcul_long(fin: float) -> int:
+    total = 0
+    while time.monotonic() < fin:
+        total += sum(range(1000))
+    return total
+
+
+def test_motif_route():
+    motif = motif_route("/livre/{id}")
+    assert motif.match("/livre/12") and not motif.match("/livre/12/x") and not motif.match("/livres")
+
+
+def test_profil_de_quelques_secondes():
+    profileur = Profileur()
+    thread = threading.Thread(target=calcul_long, args=(time.monotonic() + 0.3,))
+    thread.start()
+    profileur.demarrer(secondes=0.2, intervalle=0.002)
+    profileur._termine.wait()
+    thread.join()
+    assert not profileur.actif and profileur.echantillons > 0
+    lignes = profileur.resultat().splitlines()
+    # Format « collapsed stacks » : thread;appelant;...;appelé nombre
+    assert any("test_profileur:calcul_long" in ligne for ligne in lignes)
+    pile, nombre = lignes[0].rsplit(" ", 1)
+    assert int(nombre) > 0 and ";" in pile
+
+
+def test_profil_des_prochaines_requetes_d_une_route():
+    profileur = Profileur()
+    profileur.demarrer(requetes=1, route="/livre/{id}", intervalle=0.002)
+    assert not profileur.debut_requete("/Livres")
+    assert profileur.debut_requete("/livre/3")
+    calcul_long(time.monotonic() + 0.05)
+    # Une seule requête demandée : les suivantes ne sont pas profilées
+    assert not profileur.debut_requete("/livre/4")
+    profileur.fin_requete()
+    assert profileur._termine.wait(1) and not profileur.actif
+    assert "calcul_long" in profileur.resultat()
+
+
+def test_un_seul_profil_a_la_fois():
+    profileur = Profileur()
+    profileur.demarrer(secondes=1)
+    with pytest.raises(ValueError):
+        profileur.demarrer(secondes=1)
+    profileur.arreter()
+    assert not profileur.actif
+    with pytest.raises(ValueError):
+        profileur.demarrer()
+
+
+def test_route_admin_profil(monkeypatch):
+    client = TestClient(app)
+    fin = time.monotonic() + 0.5
+    lecteur = threading.Thread(target=lambda: [client.get("/Livres?limit=50") for _ in iter(lambda: time.monotonic() < fin, False)])
+    lecteur.start()
+    reponse = client.post("/admin/profil?secondes=0.3&intervalle_ms=2")
+    lecteur.join()
+    assert reponse.status_code == 200 and reponse.headers["content-type"].startswith("text/plain")
+    assert int(reponse.headers["x-echantillons"]) > 0
+    assert client.post("/admin/profil").status_code == 400
+    # Avec un jeton configuré, il doit être fourni même par un client local
+    monkeypatch.setenv("LIVRES_ADMIN_JETON", "secret")
+    assert client.post("/admin/profil?secondes=0.01").status_code == 403
+    assert client.post("/admin/profil?secondes=0.01", headers={"X-Admin-Jeton": "secret"}).status_code == 200
@@ -0,0 +1,128 @@
+import math
+import random
+import threading
+
+import pytest
+
+from catalogue.catalogue import Catalogue
+from catalogue.recherche import IndexTexte, tokeniser
+from catalogue.stockage import StockageMemoire
+
+MOTS = ["le", "la", "des", "roi", "reine", "guerre", "paix", "tolkien", "tolstoi", "tome", "gallimard", "folio", "nuit"]
+
+
+def corpus(nombre: int, graine: int = 0) -> dict:
+    hasard = random.Random(graine)
+    return {id: {"id": id, "nom": " ".join(hasard.choices(MOTS, k=hasard.randint(1, 6))),
+                 "auteur": hasard.choice(MOTS), "editeur": hasard.choice(MOTS)} for id in range(1, nombre + 1)}
+
+
+def recherche_exhaustive(index: IndexTexte, livres: dict, requete: str, limite: int) -> list[tuple[int, float]]:
+    # Note tous les livres contenant tous les termes, sans élagage
+    termes = tokeniser(requete)
+    n = index.nombre
+    moyenne = index.longueur_totale / n
+    resultats = []
+    for id in livres:
+        score = 0
+        for position, terme in enumerate(termes):
+            mots = index._prefixes(terme) if position == len(termes) - 1 else [terme]
+            idfs = {mot: math.log(1 + (n - index._documents(mot) + 0.5) / (index._documents(mot) + 0.5))
+                    for mot in mots if mot in index.postings}
+            complement = index._score(list(idfs), idfs, id, moyenne)
+            if complement is None:
+                break
+            score += complement
+        else:
+            resultats.append((id, score))
+    resultats.sort(key=lambda couple: (-couple[1], couple[0]))
+    return resultats[:limite]
+
+
+@pytest.mark.parametrize("requete", ["le", "t", "to", "roi le", "la guerre p", "des des", "folio gallimard le", "absent", "le absent"])
+def test_l_elagage_donne_les_memes_resultats_que_le_parcours_exhaustif(requete):
+    livres = corpus(2000)
+    catalogue = Catalogue(StockageMemoire(dict(livres)))
+    catalogue.rechercher("")
+    for limite in (1, 7, 50):
+        obtenus = catalogue.texte.chercher(requete, limite)
+        attendus = recherche_exhaustive(catalogue.texte, livres, requete, limite)
+        assert [score for _, score in obtenus] == pytest.approx([score for _, score in attendus])
+        # Mêmes ID, à l'ordre près des ex aequo (scores égaux à l'arrondi près)
+        assert {id for id, score in obtenus if score > obtenus[-1][1] + 1e-9} == \
+            {id for id, score in attendus if score > attendus[-1][1] + 1e-9}
+
+
+def test_ecritures_pendant_la_construction():
+    livres = corpus(500)
+    catalogue = Catalogue(StockageMemoire(dict(livres)))
+    commence, reprendre = threading.Event(), threading.Event()
+
+    class ClicheLent:
+        # Cliché dont le parcours s'interrompt au milieu, le temps que les écritures aient lieu
+        def __init__(self):
+            self.cliche = catalogue.figer()
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.cliche.liberer()
+
+        def get(self, id):
+            return self.cliche.get(id)
+
+        def lister(self):
+            for rang, couple in enumerate(self.cliche.lister()):
+                if rang == 250:
+                    commence.set()
+                    reprendre.wait()
+                yield couple
+
+    thread = catalogue.texte.construire_en_arriere_plan(ClicheLent)
+    commence.wait()
+    catalogue[1] = {"id": 1, "nom": "Zadig", "auteur": "Voltaire", "editeur": "Folio"}
+    del catalogue[2]
+    catalogue.ajouter(501, {"id": 501, "nom": "Candide", "auteur": "Voltaire", "editeur": "Folio"})
+    catalogue[501] = {"id": 501, "nom": "Candide ou l'optimisme", "auteur": "Voltaire", "editeur": "Folio"}
+    # Les recherches attendent la fin de la construction, les écritures non
+    assert not catalogue.texte.pret
+    reprendre.set()
+    thread.join()
+
+    assert [livre["id"] for livre, _ in catalogue.rechercher("voltaire")] == [1, 501]
+    assert [livre["id"] for livre, _ in catalogue.rechercher("optim")] == [501]
+    assert catalogue.texte.nombre == 500
+    # L'index est le même que s'il avait été construit après les écritures
+    reference = IndexTexte()
+    reference.construire(catalogue.figer)
+    assert catalogue.texte.postings == reference.postings
+    assert catalogue.texte.vocabulaire == reference.vocabulaire
+    assert catalogue.texte.longueur_totale == reference.longueur_totale
+
+
+def test_recherche_apres_remplacement_du_catalogue():
+    catalogue = Catalogue(StockageMemoire(corpus(100)))
+    catalogue.preparer_recherche()
+    assert catalogue.rechercher("tolkien")
+    catalogue.remplacer_tout({1: {"id": 1, "nom": "Le Hobbit", "auteur": "Tolkien", "editeur": "Bourgois"}})
+    assert [(livre["id"], livre["nom"]) for livre, _ in catalogue.rechercher("tolk")] == [(1, "Le Hobbit")]
+
+
+def test_mises_a_jour_incrementales_et_construction_en_bloc():
+    aleatoire = random.Random(1)
+    livres = corpus(300, graine=1)
+    catalogue = Catalogue(StockageMemoire(dict(livres)))
+    catalogue.rechercher("")
+    nouveaux = corpus(600, graine=2)
+    for _ in range(2000):
+        id = aleatoire.randint(1, 600)
+        if aleatoire.random() < 0.3 and id in catalogue:
+            del catalogue[id]
+        else:
+            catalogue[id] = nouveaux[aleatoire.randint(1, 600)] | {"id": id}
+    reference = IndexTexte()
+    reference.construire(catalogue.figer)
+    assert catalogue.texte.postings == reference.postings
+    assert catalogue.texte.vocabulaire == reference.vocabulaire
+    assert (catalogue.texte.nombre, catalogue.texte.longueur_totale) == (reference.nombre, reference.longueur_totale)
@@ -0,0 +1,82 @@
+import gzip
+
+from fastapi.testclient import TestClient
+from jinja2 import Environment, FileSystemLoader
+from starlette.applications import Starlette
+from starlette.routing import Route
+
+from catalogue.cache import CacheVersionne
+from catalogue.compression import reponse_en_cache
+from catalogue.metriques import Registre, mesurer_rendus
+from catalogue.rendu import par_morceaux, precompiler
+
+LISTE = "<table>{% for i in lignes %}<tr><td>{{ i }}</td><td>Élément {{ i }}</td></tr>{% endfor %}</table>"
+
+
+def environnement(dossier):
+    (dossier / "templates").mkdir(exist_ok=True)
+    (dossier / "templates" / "liste.html").write_text(LISTE, encoding="utf-8")
+    (dossier / "templates" / "base.html").write_text("<html>{% block corps %}{% endblock %}</html>", encoding="utf-8")
+    return Environment(loader=FileSystemLoader(str(dossier / "templates")))
+
+
+def test_precompilation_et_cache_de_bytecode(tmp_path):
+    cache = str(tmp_path / "cache")
+    assert sorted(precompiler(environnement(tmp_path), cache)) == ["base.html", "liste.html"]
+    # Démarrage suivant : les templates sont chargés depuis le cache, sans être recompilés
+    suivant = environnement(tmp_path)
+
+    def compiler(*args, **kwargs):
+        raise AssertionError("template recompilé")
+
+    suivant.compile = compiler
+    precompiler(suivant, cache)
+    assert suivant.get_template("liste.html").render(lignes=[1]) == "<table><tr><td>1</td><td>Élément 1</td></tr></table>"
+    # Template modifié : le cache est ignoré
+    modifie = environnement(tmp_path)
+    (tmp_path / "templates" / "base.html").write_text("<html></html>", encoding="utf-8")
+    compilations = []
+
+    def compiler_en_notant(source, nom, *args, **kwargs):
+        compilations.append(nom)
+        return Environment.compile(modifie, source, nom, *args, **kwargs)
+
+    modifie.compile = compiler_en_notant
+    precompiler(modifie, cache)
+    assert compilations == ["base.html"]
+
+
+def test_rendu_par_morceaux(tmp_path):
+    env = environnement(tmp_path)
+    registre = Registre()
+    mesurer_rendus(env, registre.histogramme("rendu", "Rendu", ("template",)))
+    template = env.get_template("liste.html")
+    morceaux = list(par_morceaux(template, {"lignes": range(5000)}, taille=4096))
+    assert len(morceaux) > 10 and all(len(morceau) >= 4096 for morceau in morceaux[:-1])
+    assert b"".join(morceaux).decode("utf-8") == template.render(lignes=range(5000))
+    # Le rendu en flux est mesuré comme un rendu d'un bloc
+    assert 'rendu_count{template="liste.html"} 2' in registre.exposer()
+
+
+def test_reponse_en_flux_puis_en_cache(tmp_path):
+    template = environnement(tmp_path).get_template("liste.html")
+    cache = CacheVersionne()
+    rendus = []
+
+    def page(request):
+        def produire():
+            rendus.append(1)
+            return par_morceaux(template, {"lignes": range(3000)}, taille=4096)
+        return reponse_en_cache(request, cache, "/liste", 1, produire, "text/html; charset=utf-8", en_flux=True)
+
+    client = TestClient(Starlette(routes=[Route("/liste", page)]))
+    attendu = template.render(lignes=range(3000)).encode("utf-8")
+    with client.stream("GET", "/liste", headers={"Accept-Encoding": "gzip"}) as reponse:
+        compresse = b"".join(reponse.iter_raw())
+    assert reponse.headers["content-encoding"] == "gzip" and "content-length" not in reponse.headers
+    assert gzip.decompress(compresse) == attendu
+    # Requête suivante : le corps compressé entier est resservi depuis le cache
+    with client.stream("GET", "/liste", headers={"Accept-Encoding": "gzip"}) as reponse:
+        assert b"".join(reponse.iter_raw()) == compresse and int(reponse.headers["content-length"]) == len(compresse)
+    assert client.get("/liste", headers={"Accept-Encoding": "identity"}).content == attendu
+    assert len(rendus) == 2
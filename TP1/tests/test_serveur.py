@@ -0,0 +1,19 @@
+import pytest
+
+from catalogue import serveur
+
+
+def test_plusieurs_workers_partagent_sqlite(monkeypatch):
+    appels = []
+    monkeypatch.setattr(serveur.uvicorn, "run", lambda application, **options: appels.append((application, options)))
+    monkeypatch.delenv("CATALOGUE_STOCKAGE")
+    serveur.lancer("Appli_Web:app", workers=4)
+    assert serveur.os.environ["CATALOGUE_STOCKAGE"] == "sqlite"
+    assert appels == [("Appli_Web:app", {"host": "127.0.0.1", "port": 8000, "workers": 4, "reload": False})]
+
+
+def test_stockage_propre_a_chaque_processus_refuse(monkeypatch):
+    monkeypatch.setattr(serveur.uvicorn, "run", lambda *args, **options: pytest.fail("serveur lancé"))
+    monkeypatch.setenv("CATALOGUE_STOCKAGE", "journal")
+    with pytest.raises(ValueError):
+        serveur.lancer("Appli_Web:app", workers=2)
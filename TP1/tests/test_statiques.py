@@ -0,0 +1,62 @@
+import gzip
+
+from fastapi.testclient import TestClient
+from jinja2 import Environment
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.routing import Mount
+
+from catalogue.statiques import CACHE_IMMUABLE, FichiersStatiques, empreinte
+
+CSS = b"body { color: black; }\n" * 50
+
+
+def client_statiques(dossier):
+    (dossier / "style.css").write_bytes(CSS)
+    (dossier / "images").mkdir()
+    (dossier / "images" / "logo.png").write_bytes(b"\x89PNG" + bytes(2000))
+    statiques = FichiersStatiques(str(dossier))
+    return statiques, TestClient(Starlette(routes=[Mount("/static", statiques, name="static")]))
+
+
+def test_url_avec_empreinte_dans_les_templates(tmp_path):
+    statiques, client = client_statiques(tmp_path)
+    environnement = Environment()
+    statiques.installer(environnement)
+    # Requête minimale : url_for n'a besoin que du routeur de l'application et de l'adresse du serveur
+    requete = Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b"",
+                       "scheme": "http", "server": ("testserver", 80), "root_path": "", "router": client.app.router})
+    url = environnement.from_string("{{ url_statique('style.css') }}").render(request=requete)
+    assert url == f"http://testserver/static/style.{empreinte(CSS)}.css"
+    assert statiques.chemin_avec_empreinte("/images/logo.png").startswith("images/logo.")
+    assert statiques.chemin_avec_empreinte("absent.css") == "absent.css"
+
+
+def test_fichier_avec_empreinte_immuable_et_precompresse(tmp_path):
+    statiques, client = client_statiques(tmp_path)
+    url = "/static/" + statiques.chemin_avec_empreinte("style.css")
+    with client.stream("GET", url, headers={"Accept-Encoding": "gzip"}) as reponse:
+        compresse = b"".join(reponse.iter_raw())
+    assert reponse.headers["cache-control"] == CACHE_IMMUABLE and reponse.headers["content-encoding"] == "gzip"
+    assert reponse.headers["content-type"] == "text/css; charset=utf-8" and gzip.decompress(compresse) == CSS
+    identite = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identite.headers and identite.content == CSS
+    # Une représentation par encodage, un ETag par représentation
+    assert reponse.headers["etag"] == identite.headers["etag"][:-1] + '-gzip"'
+    non_modifie = client.get(url, headers={"If-None-Match": reponse.headers["etag"], "Accept-Encoding": "identity"})
+    assert non_modifie.status_code == 304 and non_modifie.headers["etag"] == reponse.headers["etag"]
+    # Le fichier est servi depuis la mémoire : le supprimer du disque ne change rien
+    (tmp_path / "style.css").unlink()
+    assert client.get(url).content == CSS
+    image = client.get("/static/" + statiques.chemin_avec_empreinte("images/logo.png"))
+    assert image.status_code == 200 and "content-encoding" not in image.headers
+
+
+def test_nom_d_origine_revalide(tmp_path):
+    _, client = client_statiques(tmp_path)
+    reponse = client.get("/static/style.css")
+    assert reponse.headers["cache-control"] == "no-cache" and reponse.content == CSS
+    non_modifie = client.get("/static/style.css", headers={"If-None-Match": reponse.headers["etag"]})
+    assert non_modifie.status_code == 304 and non_modifie.content == b""
+    assert client.get("/static/absent.css").status_code == 404
+    assert client.post("/static/style.css").status_code == 405
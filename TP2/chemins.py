@@ -0,0 +1,10 @@
+#Le paquet catalogue (stockage, index, cache, ...) est celui de TP1 : les deux applications partagent le même code
+#au lieu d'en garder chacune une copie. On ajoute donc le dossier de TP1 à la fin du chemin d'import,
+#après celui de TP2 : les modules propres à TP2 (main, data_livre, ...) restent prioritaires sur ceux de TP1 de même nom.
+import os
+import sys
+
+DOSSIER_TP1 = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "TP1"))
+
+if DOSSIER_TP1 not in sys.path:
+    sys.path.append(DOSSIER_TP1)
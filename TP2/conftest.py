@@ -0,0 +1,8 @@
+import os
+
+import chemins  # Le paquet catalogue est celui de TP1 (voir chemins.py)
+
+# Les tests ne doivent jamais écrire dans le dossier de TP2 : le catalogue de l'application est gardé en mémoire
+os.environ.setdefault("CATALOGUE_STOCKAGE", "memoire")
+# main.py cherche ses templates et ses fichiers statiques dans le dossier courant
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
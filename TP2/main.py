@@ -1,38 +1,123 @@
-from fastapi import FastAPI, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse #HTMLResponse : Une classe de réponse qui permet de renvoyer du contenu HTML au client.
+from fastapi import FastAPI, Request, Form, HTTPException, Path, Query, Header, Depends
+from fastapi.responses import HTMLResponse, Response #HTMLResponse : Une classe de réponse qui permet de renvoyer du contenu HTML au client.
 from fastapi.exceptions import RequestValidationError #RequestValidationError : Importe l'exception utilisée par FastAPI pour gérer les erreurs de validation des données de requête.
-from fastapi.staticfiles import StaticFiles #StaticFiles : Permet de servir des fichiers statiques (CSS, des images et des fichiers JavaScript) dans une application FastAPI.
 from fastapi.templating import Jinja2Templates
 from starlette.exceptions import HTTPException as StarletteHTTPException #StarletteHTTPException : Importe l'exception HTTPException de Starlette (le framework asynchrone sur lequel FastAPI est construit) pour une gestion d'erreur plus fine.
+import chemins # chemins : Rend importable le paquet catalogue, partagé avec TP1.
 from dataclass_livres import LivreModel # LivreModel : Un modèle de données pour représenter un livre.
 from data_livre import liste_livres  # liste_livres : Un dictionnaire stockant des informations sur les livres.
+from catalogue.catalogue import ID_MAX # ID_MAX : L'ID maximal accepté (entier signé sur 64 bits).
+from catalogue.cache import CacheVersionne # CacheVersionne : Un cache LRU vidé à chaque modification du catalogue.
+from catalogue.metriques import METRIQUES, TYPE_PROMETHEUS, MiddlewareMetriques, mesurer_rendus # Métriques exposées par /metrics (format Prometheus).
+from catalogue.profileur import DUREE_MAX, PROFILEUR # PROFILEUR : Le profileur par échantillonnage, déclenché par /admin/profil.
+from catalogue.admin import autorise # autorise : Le contrôle d'accès des routes d'administration.
+from catalogue.compression import MiddlewareCompression, reponse_en_cache # Compression gzip (ou brotli) des réponses et des pages en cache.
+from catalogue.statiques import FichiersStatiques # FichiersStatiques : Les fichiers statiques avec empreinte, servis depuis la mémoire.
+from catalogue.rendu import par_morceaux, precompiler # Templates compilés au démarrage, pages rendues en flux.
+from catalogue.sqlite import PoolSature # PoolSature : Levée quand aucune connexion SQLite ne se libère à temps (worker saturé).
 import uvicorn
+import os
+from typing import Literal
+
+# Mode "ID stables" (par défaut) : la suppression d'un livre ne renumérote pas les autres livres,
+# leurs URL (/modifier-livre/{id}, ...) restent donc valides. LIVRES_ID_STABLES=0 rétablit la renumérotation.
+ID_STABLES = os.environ.get("LIVRES_ID_STABLES", "1") != "0"
+
+# À partir de ce nombre de livres par page (paramètre limit), une page absente du cache est envoyée en flux, à mesure
+# qu'elle est rendue : le navigateur reçoit le début du tableau sans attendre la dernière ligne.
+LIMITE_FLUX = int(os.environ.get("LIVRES_LIMITE_FLUX", "200"))
+
+# Les routes qui lisent ou modifient le catalogue sont déclarées avec `def` (et non `async def`) : FastAPI les exécute
+# dans un pool de threads, et les accès au stockage (SQLite, écriture et compactage du journal) ne bloquent pas la boucle d'événements.
 
 # Crée une instance de l'application FastAPI.
 app = FastAPI()
 
-# Monte un répertoire de fichiers statiques sous le chemin "/static".
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Compresse les réponses (gzip, ou brotli s'il est installé) selon l'en-tête Accept-Encoding du client.
+app.add_middleware(MiddlewareCompression)
+
+# Mesure chaque requête (durée, taille de la réponse une fois compressée, requêtes en cours), voir la route /metrics.
+app.add_middleware(MiddlewareMetriques)
+
+# Monte un répertoire de fichiers statiques sous le chemin "/static". Ils sont lus, compressés et reçoivent l'empreinte
+# de leur contenu au démarrage, puis sont servis depuis la mémoire (style.<empreinte>.css, gardé un an par les navigateurs).
+statiques = FichiersStatiques(directory="static")
+app.mount("/static", statiques, name="static")
 
 # Configure le répertoire des templates Jinja2.
 templates = Jinja2Templates(directory="templates")
+# Mesure la durée de rendu de chaque template.
+mesurer_rendus(templates.env)
+# Les templates référencent les fichiers statiques par {{ url_statique('style.css') }} : l'URL contient l'empreinte du fichier.
+statiques.installer(templates.env)
+# Compile tous les templates dès le démarrage plutôt qu'à la première requête de chacun. Le code compilé est gardé
+# dans LIVRES_CACHE_TEMPLATES (vide : pas de cache) et rechargé tel quel aux démarrages suivants.
+precompiler(templates.env, os.environ.get("LIVRES_CACHE_TEMPLATES", ".cache_templates"))
+
+# Cache des pages de la liste déjà rendues, indexées par leur URL complète (hôte, chemin et paramètres) et leur encodage
+# (une version compressée par encodage accepté). Il est lié à la version du catalogue : toute modification
+# (ajout, modification, suppression, import) l'invalide.
+cache_pages = CacheVersionne(taille_max=int(os.environ.get("LIVRES_CACHE_PAGES", "256")))
+
+# Valeurs lues seulement quand les métriques sont demandées.
+METRIQUES.collecte("cache_pages_succes_total", "Pages resservies depuis le cache", lambda: cache_pages.succes, "counter")
+METRIQUES.collecte("cache_pages_echecs_total", "Pages absentes du cache (rendues)", lambda: cache_pages.echecs, "counter")
+METRIQUES.collecte("catalogue_version", "Version du catalogue (incrémentée à chaque écriture)", lambda: liste_livres.version)
+METRIQUES.collecte("changements_abonnes", "Nombre de clients en attente de changements", lambda: liste_livres.changements.abonnes)
 
 @app.get("/")
-async def get_all_livres(request: Request):
+def get_all_livres(request: Request,
+                   limit: int = Query(50, ge=1, le=500),
+                   cursor: str | None = None,
+                   sort: Literal["id", "nom", "auteur", "editeur"] = "id",
+                   auteur: str | None = None,
+                   editeur: str | None = None):
     """
-    Récupère la liste complète de tous les livres et les affiche sur la page.
+    Récupère une page de la liste des livres et l'affiche, avec des liens vers les pages suivante et précédente.
+
+    Les livres sont lus dans un index trié tenu à jour par le catalogue : afficher une page coûte O(log n + limit),
+    quelle que soit la taille du catalogue. Les filtres par auteur et éditeur utilisent les index secondaires du catalogue.
+    Une page déjà rendue (et compressée selon l'en-tête Accept-Encoding) est resservie depuis le cache tant que le catalogue
+    n'a pas été modifié : elle n'est ni rendue ni compressée à nouveau. Une grande page (au moins LIMITE_FLUX livres)
+    absente du cache est envoyée en flux, par morceaux, à mesure que le template est rendu.
 
     Args:
         request (Request): L'objet requête FastAPI.
+        limit (int): Le nombre de livres par page.
+        cursor (str | None): Le curseur de la page à afficher (fourni par les liens de navigation).
+        sort (str): Le champ de tri : id, nom, auteur ou editeur.
+        auteur (str | None): N'affiche que les livres de cet auteur.
+        editeur (str | None): N'affiche que les livres de cet éditeur.
+
+    Raises:
+        HTTPException: Une exception est levée avec un code d'erreur 400 si le curseur est invalide.
 
     Returns:
-        TemplateResponse: Renvoie une réponse HTML avec la liste des livres et le nombre total.
+        Response: Renvoie une réponse HTML avec la page de livres et le nombre total.
     """
 
-    # Route pour afficher tous les livres. Utilise le modèle LivreModel pour créer des objets Livre à partir de liste_livres
-    livres = [LivreModel(**liste_livres[id]) for id in liste_livres]
-    # Renvoie le template HTML avec la liste des livres et le total.
-    return templates.TemplateResponse("liste_livres.html", {"request": request, "livres": livres, "total": len(livres)})
+    # Version lue avant la page : si le catalogue change pendant le rendu, la page ne sera pas resservie
+    version = liste_livres.version
+    filtres = {champ: valeur for champ, valeur in (("auteur", auteur), ("editeur", editeur)) if valeur}
+
+    en_flux = limit >= LIMITE_FLUX
+
+    def rendre():
+        # Appelée seulement si la page n'est pas déjà en cache pour cette version et cet encodage
+        try:
+            page = liste_livres.page(tri=sort, limite=limit, curseur=cursor, filtres=filtres)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Les livres du catalogue ont été validés par LivreModel à l'écriture : le template les reçoit tels quels
+        # (livre.nom fonctionne aussi sur un dictionnaire dans Jinja2), sans recréer un objet LivreModel par livre.
+        # Rend le template HTML avec la page de livres, les liens de navigation et le total.
+        contexte = {"request": request, "livres": page.livres, "page": page, "limit": limit, "sort": sort, "filtres": filtres, "total": page.total}
+        if en_flux:
+            # La page est lue avant le premier morceau : un curseur invalide donne encore une erreur 400
+            return par_morceaux(templates.get_template("liste_livres.html"), contexte)
+        return templates.TemplateResponse("liste_livres.html", contexte).body
+
+    return reponse_en_cache(request, cache_pages, str(request.url), version, rendre, "text/html; charset=utf-8", en_flux=en_flux)
 
 @app.get("/ajouter-livre")
 async def ajouter_livre_form(request: Request):
@@ -51,12 +136,12 @@ async def ajouter_livre_form(request: Request):
 
 
 @app.post("/ajouter-livre")
-async def ajouter_livre(id: int = Form(...), nom: str = Form(...), auteur: str = Form(...), editeur: str = Form(...)):
+def ajouter_livre(id: int | None = Form(None, ge=1, le=ID_MAX), nom: str = Form(...), auteur: str = Form(...), editeur: str = Form(...)):
     """
     Traite les données soumises du formulaire d'ajout de livre et ajoute le livre.
 
     Args:
-        id (int): L'ID du livre à ajouter, obtenu du formulaire.
+        id (int | None): L'ID du livre à ajouter, obtenu du formulaire. S'il est omis, un nouvel ID est attribué automatiquement.
         nom (str): Le nom du livre, obtenu du formulaire.
         auteur (str): L'auteur du livre, obtenu du formulaire.
         editeur (str): L'éditeur du livre, obtenu du formulaire.
@@ -65,19 +150,22 @@ async def ajouter_livre(id: int = Form(...), nom: str = Form(...), auteur: str =
         dict: Un message indiquant le succès de l'ajout du livre.
     """
 
-    # Route pour traiter le formulaire d'ajout de livre. Lève une exception si l'ID existe déjà.
-    if id in liste_livres:
-        raise HTTPException(status_code=400, detail="Livre déjà existant avec cet ID.")
+    # Sans ID fourni, l'allocateur du catalogue en attribue un nouveau (sans parcourir le catalogue)
+    if id is None:
+        id = liste_livres.allouer_id()
     # Convertit les données de formulaire en dictionnaire compatible avec LivreModel
     livre_data = {"id": id, "nom": nom, "auteur": auteur, "editeur": editeur}
     # Valide et crée un objet LivreModel à partir des données de formulaire
     livre = LivreModel(**livre_data)
-    # Ajoute le livre validé au dictionnaire des livres
-    liste_livres[id] = livre.dict()
+    # Ajoute le livre validé au catalogue. Lève une exception si l'ID existe déjà (sans jamais écraser le livre existant).
+    try:
+        liste_livres.ajouter(id, livre.dict())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Livre déjà existant avec cet ID.")
     return {"message": "Livre ajouté avec succès"}
 
 @app.get("/modifier-livre/{id}")
-async def get_modifier_livre_form(request: Request, id: int):
+def get_modifier_livre_form(request: Request, id: int = Path(ge=1, le=ID_MAX)):
     """
     Affiche le formulaire de modification pour un livre existant.
 
@@ -93,15 +181,14 @@ async def get_modifier_livre_form(request: Request, id: int):
     """
 
     # Route pour afficher le formulaire de modification d'un livre. Vérifie si le livre existe.
-    if id not in liste_livres:
+    livre = liste_livres.get(id)
+    if livre is None:
         raise HTTPException(status_code=404, detail="Livre non trouvé")
-    # Créez une instance de LivreModel avec les données du livre
-    livre = LivreModel(**liste_livres[id])
     # Renvoie le template de modification avec les données du livre.
     return templates.TemplateResponse("modifier_livre.html", {"request": request, "livre": livre, "id": id})
 
 @app.get("/modifier-livre")
-async def modifier_livre_form(request: Request, id: int):
+def modifier_livre_form(request: Request, id: int = Query(ge=1, le=ID_MAX)):
     """
     Affiche le formulaire de modification pour un livre spécifique.
 
@@ -118,13 +205,13 @@ async def modifier_livre_form(request: Request, id: int):
         TemplateResponse: Renvoie une réponse HTML qui rend le template `modifier_livre.html`, contenant le formulaire de modification du livre. Le formulaire est pré-rempli avec les informations actuelles du livre, permettant à l'utilisateur de voir les valeurs actuelles et de les modifier si nécessaire.
 """
 
-    if id not in liste_livres:
+    livre = liste_livres.get(id)
+    if livre is None:
         raise HTTPException(status_code=404, detail="Livre non trouvé")
-    livre = LivreModel(**liste_livres[id])
     return templates.TemplateResponse("modifier_livre.html", {"request": request, "livre": livre})
 
 @app.post("/modifier-livre/{id}")
-async def modifier_livre(id: int, nom: str = Form(...), auteur: str = Form(...), editeur: str = Form(...)):
+def modifier_livre(id: int = Path(ge=1, le=ID_MAX), nom: str = Form(...), auteur: str = Form(...), editeur: str = Form(...)):
     """
     Traite les données soumises du formulaire de modification et met à jour le livre.
 
@@ -138,39 +225,152 @@ async def modifier_livre(id: int, nom: str = Form(...), auteur: str = Form(...),
         dict: Un message indiquant le succès de la modification du livre.
     """
 
-    # Route pour traiter le formulaire de modification d'un livre. Vérifie si le livre existe.
-    if id not in liste_livres:
+    # Valide le livre avec LivreModel avant de l'écrire : les lectures le renvoient ensuite sans le revalider.
+    livre = LivreModel(id=id, nom=nom, auteur=auteur, editeur=editeur)
+    # Met à jour le livre s'il existe, en une seule opération (un livre supprimé entre-temps n'est pas recréé).
+    try:
+        liste_livres.modifier(id, livre.dict())
+    except KeyError:
         raise HTTPException(status_code=404, detail="Livre non trouvé")
-    # Met à jour les informations du livre dans le dictionnaire.
-    liste_livres[id] = {"id": id, "nom": nom, "auteur": auteur, "editeur": editeur}
     return {"message": "Livre modifié avec succès"}
 
 @app.get("/supprimer-livre/{id}")
-async def supprimer_livre(id: int):
+def supprimer_livre(id: int = Path(ge=1, le=ID_MAX)):
     """
-    Supprime un livre de la liste et réattribue les ID pour garder la séquence.
+    Supprime un livre de la liste.
+
+    En mode ID stables (par défaut), la suppression est en O(1) et les ID des autres livres ne changent pas ;
+    le numéro d'ordre affiché dans la liste est calculé au moment du rendu. Sinon, les ID sont réattribués pour garder la séquence.
 
     Args:
         id (int): L'ID du livre à supprimer.
 
     Returns:
-        dict: Un message indiquant le succès de la suppression et la réattribution des ID.
+        dict: Un message indiquant le succès de la suppression (et, le cas échéant, la réattribution des ID).
     """
 
-    # Route pour supprimer un livre. Vérifie si le livre existe avant de le supprimer.
-    global liste_livres
-    if id in liste_livres:
-        del liste_livres[id]
+    # Route pour supprimer un livre.
+    if ID_STABLES:
+        # Suppression directe : une seule opération dans le catalogue (et dans le journal). Deux suppressions
+        # concurrentes du même livre ne peuvent pas réussir toutes les deux.
+        if liste_livres.pop(id, None) is None:
+            raise HTTPException(status_code=404, detail="Livre non trouvé")
+        return {"message": "Livre supprimé avec succès"}
+    # Les autres écritures attendent la fin de la réécriture : aucune n'est perdue entre la lecture et le remplacement
+    with liste_livres.exclusif():
+        if id not in liste_livres:
+            raise HTTPException(status_code=404, detail="Livre non trouvé")
         # Réattribue les ID pour s'assurer qu'ils sont séquentiels après la suppression
         new_liste_livres = {}
-        for new_id, livre in enumerate(liste_livres.values(), start=1):
-            livre['id'] = new_id
-            new_liste_livres[new_id] = livre
+        for new_id, livre in enumerate((livre for ancien_id, livre in liste_livres.items() if ancien_id != id), start=1):
+            new_liste_livres[new_id] = {**livre, 'id': new_id}
+
+        # Remplace le contenu du catalogue sur place (sans réassigner la variable globale) :
+        # la réécriture complète est enregistrée en une seule fois dans un nouvel instantané
+        liste_livres.remplacer_tout(new_liste_livres)
+    return {"message": "Livre supprimé avec succès et ID réattribués"}
+
+@app.get("/recherche")
+def rechercher_livres(request: Request,
+                            q: str = Query("", max_length=200),
+                            limit: int = Query(20, ge=1, le=100),
+                            format: Literal["html", "json"] | None = None):
+    """
+    Recherche plein texte dans le nom, l'auteur et l'éditeur des livres.
 
-        liste_livres = new_liste_livres
-        return {"message": "Livre supprimé avec succès et ID réattribués"}
-    else:
-        raise HTTPException(status_code=404, detail="Livre non trouvé")
+    La recherche ignore les accents et la casse, le dernier mot peut être incomplet (autocomplétion),
+    et les résultats sont classés par pertinence (BM25). Elle s'appuie sur l'index inversé du catalogue,
+    mis à jour à chaque ajout, modification ou suppression.
+
+    Args:
+        request (Request): L'objet requête FastAPI.
+        q (str): Les mots recherchés.
+        limit (int): Le nombre maximal de résultats.
+        format (str | None): "json" ou "html". Par défaut, JSON si le client l'accepte sans accepter HTML.
+
+    Returns:
+        TemplateResponse | dict: La page de résultats (HTML), ou les résultats et leur score (JSON).
+    """
+
+    resultats = liste_livres.rechercher(q, limit)
+    # Choisit le format de la réponse : paramètre explicite, sinon en-tête Accept
+    accept = request.headers.get("accept", "")
+    if format == "json" or (format is None and "application/json" in accept and "text/html" not in accept):
+        return {"q": q, "total": len(resultats), "resultats": [{**livre, "score": round(score, 4)} for livre, score in resultats]}
+    livres = [livre for livre, _ in resultats]
+    return templates.TemplateResponse("recherche.html", {"request": request, "q": q, "livres": livres})
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metriques():
+    """
+    Expose les métriques du processus au format texte de Prometheus : durée, taille et nombre des requêtes par route,
+    requêtes en cours, durée de rendu des templates et des lectures dans le catalogue, efficacité du cache des pages.
+
+    Returns:
+        Response: Les métriques, au format texte de Prometheus.
+    """
+
+    return Response(content=METRIQUES.exposer(), media_type=TYPE_PROMETHEUS)
+
+def verifier_admin(request: Request, x_admin_jeton: str | None = Header(None)):
+    """
+    Dépendance des routes d'administration : jeton LIVRES_ADMIN_JETON exigé, ou client local (voir catalogue.admin).
+
+    Raises:
+        HTTPException: Une exception est levée avec un code d'erreur 403 si la requête n'est pas autorisée.
+    """
+
+    if not autorise(x_admin_jeton, request.client.host if request.client else None):
+        raise HTTPException(status_code=403, detail="Accès réservé à l'administration.")
+
+@app.post("/admin/profil", dependencies=[Depends(verifier_admin)])
+async def profiler(secondes: float | None = Query(None, gt=0, le=DUREE_MAX),
+                   requetes: int | None = Query(None, ge=1, le=100_000),
+                   route: str | None = Query(None, max_length=200),
+                   intervalle_ms: float = Query(5, ge=1, le=1000)):
+    """
+    Profile l'application par échantillonnage pendant `secondes` secondes, ou pendant les `requetes` prochaines requêtes
+    (seulement celles de `route` si elle est donnée, par exemple /modifier-livre/{id}), puis renvoie le profil.
+    Les routes, le rendu des templates Jinja2 et les accès au catalogue apparaissent dans les piles relevées.
+
+    Args:
+        secondes (float | None): La durée du profil.
+        requetes (int | None): Le nombre de requêtes à profiler (à la place d'une durée).
+        route (str | None): La route déclarée des requêtes à profiler (par défaut, toutes).
+        intervalle_ms (float): L'intervalle entre deux échantillons, en millisecondes.
+
+    Raises:
+        HTTPException: Une exception est levée avec un code d'erreur 400 si ni la durée ni le nombre de requêtes n'est donné
+            (ou les deux), et 409 si un profil est déjà en cours.
+
+    Returns:
+        Response: Les piles d'appels au format « collapsed stacks » (flamegraph.pl, speedscope, ...).
+    """
+
+    if (secondes is None) == (requetes is None):
+        raise HTTPException(status_code=400, detail="Indiquez soit secondes, soit requetes.")
+    try:
+        profil = await PROFILEUR.profiler(secondes, requetes, route, intervalle_ms / 1000)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(content=profil, media_type="text/plain; charset=utf-8", headers={"X-Echantillons": str(PROFILEUR.echantillons)})
+
+@app.post("/admin/sauvegarde", dependencies=[Depends(verifier_admin)])
+def sauvegarder():
+    """
+    Écrit une sauvegarde cohérente du catalogue, sans interrompre les lectures ni les écritures (voir Catalogue.sauvegarder).
+
+    Raises:
+        HTTPException: Une exception est levée avec un code d'erreur 409 si aucun dossier de sauvegarde n'est configuré.
+
+    Returns:
+        dict: Le chemin de la sauvegarde et la version du catalogue qu'elle contient.
+    """
+
+    try:
+        return liste_livres.sauvegarder()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
@@ -192,6 +392,20 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     else:
         return HTMLResponse(content=f"Erreur inattendue : {exc.detail}", status_code=exc.status_code)
 
+@app.exception_handler(PoolSature)
+async def pool_sature_handler(request: Request, exc: PoolSature):
+    """
+    Répond 503 quand toutes les connexions SQLite du worker restent occupées au-delà du délai d'attente.
+
+    Args:
+        request (Request): L'objet requête FastAPI.
+        exc (PoolSature): L'exception levée par le pool de connexions.
+
+    Returns:
+        HTMLResponse: Une réponse 503 invitant le client à réessayer (en-tête Retry-After).
+    """
+    return HTMLResponse(content=f"Service momentanément indisponible : {exc}", status_code=503, headers={"Retry-After": "1"})
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """
@@ -209,6 +423,6 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     # Renvoie une page d'erreur montrant les détails de la validation.
     return templates.TemplateResponse("erreur_validation.html", {"request": request, "errors": exc.errors()}, status_code=422)
 
-#Lance l'application FastAPI
+#Lance l'application FastAPI (développement ; en production, voir production.py)
 if __name__ == "__main__":
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
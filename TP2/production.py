@@ -0,0 +1,7 @@
+#Lance l'application en production : plusieurs workers partageant le même catalogue (base SQLite)
+#python production.py [--workers N] [--host 0.0.0.0] [--port 8000]
+import chemins  # Le paquet catalogue est celui de TP1 (voir chemins.py)
+from catalogue.serveur import executer
+
+if __name__ == "__main__":
+    executer("main:app")
@@ -0,0 +1,53 @@
+from fastapi.testclient import TestClient
+
+from catalogue.catalogue import ID_MAX
+from data_livre import liste_livres
+from main import app
+
+client = TestClient(app)
+
+LIVRE = {"nom": "Germinal", "auteur": "Émile Zola", "editeur": "Gallimard"}
+
+
+def test_liste_paginee():
+    reponse = client.get("/?limit=2&sort=nom")
+    assert reponse.status_code == 200 and "text/html" in reponse.headers["content-type"]
+
+
+def test_parametres_de_pagination_invalides():
+    # Une valeur hors des choix ou des bornes donne une page d'erreur 422, pas une erreur 500
+    for url in ("/?sort=bogus", "/?limit=0", "/?limit=501", "/?limit=abc"):
+        reponse = client.get(url)
+        assert reponse.status_code == 422, url
+        assert "Données invalides" in reponse.text
+
+
+def test_curseur_invalide():
+    assert client.get("/?cursor=pas-un-curseur").status_code == 400
+
+
+def test_ajout_modification_suppression():
+    id = liste_livres.allouer_id()
+    assert client.post("/ajouter-livre", data={"id": id, **LIVRE}).status_code == 200
+    # Un ajout sur un ID déjà pris n'écrase pas le livre existant
+    assert client.post("/ajouter-livre", data={"id": id, **LIVRE, "nom": "Autre"}).status_code == 400
+    assert liste_livres[id]["nom"] == "Germinal"
+    assert client.post(f"/modifier-livre/{id}", data={**LIVRE, "nom": "Nana"}).status_code == 200
+    assert "Nana" in client.get(f"/modifier-livre?id={id}").text
+    assert client.get(f"/supprimer-livre/{id}").status_code == 200
+    assert client.get(f"/modifier-livre/{id}").status_code == 404
+
+
+def test_id_hors_bornes_ou_non_numerique():
+    # 0, négatif, au-delà de 2**63 - 1 ou non numérique : page d'erreur 422 (jamais 500), que l'ID soit
+    # dans le chemin, dans la requête ou dans le formulaire
+    for url in ("/supprimer-livre/0", "/supprimer-livre/-1", "/supprimer-livre/abc", "/modifier-livre?id=abc",
+                "/modifier-livre?id=0", "/modifier-livre", f"/modifier-livre/{ID_MAX + 1}"):
+        reponse = client.get(url)
+        assert reponse.status_code == 422, url
+        assert "Données invalides" in reponse.text
+    for id in (0, ID_MAX + 1, "abc"):
+        assert client.post("/ajouter-livre", data={"id": id, **LIVRE}).status_code == 422
+    assert client.post("/modifier-livre/0", data=LIVRE).status_code == 422
+    # La borne elle-même est acceptée : le livre n'existe simplement pas
+    assert client.get(f"/supprimer-livre/{ID_MAX}").status_code == 404
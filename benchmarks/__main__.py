@@ -0,0 +1,5 @@
+import sys
+
+from .charge import main
+
+sys.exit(main())
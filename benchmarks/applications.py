@@ -0,0 +1,62 @@
+import json
+import os
+import random
+import sys
+
+# Dossier contenant TP1 et TP2
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Application ASGI de chaque TP, pour uvicorn
+APPLICATIONS = {"TP1": "Appli_Web:app", "TP2": "main:app"}
+
+
+def ecrire_catalogue(chemin: str, nombre: int, graine: int = 0) -> None:
+    """
+    Écrit un catalogue synthétique de `nombre` livres au format de livres.json, livre par livre : même pour
+    10 millions de livres, le catalogue n'est jamais construit en mémoire. Même contenu que
+    catalogue.compact.livres_synthetiques (peu d'auteurs et d'éditeurs distincts, un nom différent par livre).
+    """
+    aleatoire = random.Random(graine)
+    auteurs = [f"Auteur {i}" for i in range(max(1, nombre // 20))]
+    editeurs = [f"Éditions {i}" for i in range(100)]
+    with open(chemin, "w", encoding="utf-8") as f:
+        f.write("[")
+        for id in range(1, nombre + 1):
+            livre = {"id": id, "nom": f"Livre numéro {id}", "auteur": aleatoire.choice(auteurs),
+                     "editeur": aleatoire.choice(editeurs)}
+            f.write(("," if id > 1 else "") + json.dumps(livre, ensure_ascii=False))
+        f.write("]")
+
+
+def environnement(dossier: str, nombre: int, stockage: str = "memoire", cache_pages: bool = True) -> dict:
+    """
+    Prépare, dans `dossier`, un catalogue synthétique de `nombre` livres et renvoie les variables d'environnement
+    qui le font charger par une application (voir catalogue.config). Le journal, l'instantané ou la base SQLite
+    sont eux aussi créés dans `dossier` : rien n'est écrit dans les dossiers des TP.
+    """
+    chemin = os.path.join(dossier, "livres.json")
+    if not os.path.exists(chemin):
+        ecrire_catalogue(chemin, nombre)
+    variables = {"CATALOGUE_STOCKAGE": stockage, "CATALOGUE_JSON": chemin, "CATALOGUE_DOSSIER": dossier}
+    if not cache_pages:
+        variables["LIVRES_CACHE_PAGES"] = "0"
+    return variables
+
+
+def charger_application(tp: str, variables: dict):
+    """
+    Importe l'application d'un TP dans le processus courant, avec le catalogue décrit par `variables`.
+    Un processus ne peut charger qu'une seule application : les deux TP ont des modules de même nom (catalogue, ...).
+
+    Returns:
+        L'application ASGI (FastAPI).
+    """
+    dossier = os.path.join(RACINE, tp)
+    # TP2 cherche ses templates et fichiers statiques dans le dossier courant
+    os.chdir(dossier)
+    sys.path.insert(0, dossier)
+    os.environ.update(variables)
+    if tp == "TP1":
+        from Appli_Web import app
+    else:
+        from main import app
+    return app
@@ -0,0 +1,275 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from .applications import APPLICATIONS, RACINE, charger_application, environnement
+from .scenarios import Scenario, scenarios
+
+# Mesures de référence, comparées à chaque exécution (voir comparer) et réécrites avec --enregistrer
+REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reference.json")
+# Dégradation tolérée par rapport à la référence (0.25 : p95 25 % plus lent ou débit 25 % plus faible)
+SEUIL = 0.25
+MODES = ("asgi", "uvicorn")
+
+
+def rss_max(pid: int) -> int | None:
+    """
+    Returns:
+        int | None: La mémoire résidente maximale (VmHWM) du processus en octets, ou None hors de Linux.
+    """
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for ligne in f:
+                if ligne.startswith("VmHWM:"):
+                    return int(ligne.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def reinitialiser_rss(pid: int) -> None:
+    # Remet VmHWM à la mémoire résidente actuelle : le maximum mesuré ensuite est celui d'un seul scénario
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def centile(valeurs: list[float], rang: float) -> float:
+    """
+    Returns:
+        float: Le centile `rang` (entre 0 et 100) de valeurs déjà triées, par la méthode du rang le plus proche.
+    """
+    return valeurs[min(len(valeurs) - 1, max(0, round(rang / 100 * len(valeurs)) - 1))]
+
+
+async def jouer(client: httpx.AsyncClient, scenario: Scenario, requetes: int, concurrence: int, pid: int) -> dict:
+    """
+    Envoie `requetes` requêtes du scénario, `concurrence` à la fois.
+
+    Returns:
+        dict: Débit (requêtes et livres par seconde), latences p50/p95/p99 en millisecondes, taille moyenne des réponses
+            telles qu'envoyées (compressées ou non), mémoire résidente maximale du serveur et nombre de réponses en erreur.
+    """
+    requetes = min(requetes, scenario.requetes_max or requetes)
+    numeros = iter(range(requetes))
+    latences, erreurs, octets = [], 0, 0
+
+    async def envoyer():
+        nonlocal erreurs, octets
+        for i in numeros:
+            options = {}
+            if scenario.corps is not None:
+                options["data" if scenario.formulaire else "json"] = scenario.corps(i)
+            debut = time.perf_counter()
+            reponse = await client.request(scenario.methode, scenario.chemin(i), **options)
+            await reponse.aread()
+            latences.append(time.perf_counter() - debut)
+            octets += reponse.num_bytes_downloaded
+            if reponse.status_code >= 400:
+                erreurs += 1
+
+    reinitialiser_rss(pid)
+    debut = time.perf_counter()
+    await asyncio.gather(*(envoyer() for _ in range(concurrence)))
+    duree = time.perf_counter() - debut
+    latences.sort()
+    return {
+        "requetes": requetes,
+        "req_s": requetes / duree,
+        "livres_s": requetes * scenario.livres / duree if scenario.livres else None,
+        "p50": centile(latences, 50) * 1000,
+        "p95": centile(latences, 95) * 1000,
+        "p99": centile(latences, 99) * 1000,
+        "octets": octets / requetes,
+        "rss": rss_max(pid),
+        "erreurs": erreurs,
+    }
+
+
+async def jouer_tout(client: httpx.AsyncClient, tp: str, nombre: int, requetes: int, concurrence: int, pid: int,
+                     filtre: str | None) -> dict:
+    resultats = {}
+    for scenario in scenarios(tp, nombre):
+        if filtre is None or filtre in scenario.nom:
+            resultats[scenario.nom] = await jouer(client, scenario, requetes, concurrence, pid)
+    return resultats
+
+
+def port_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def mesurer_asgi(tp: str, variables: dict, nombre: int, requetes: int, concurrence: int, filtre: str | None,
+                 encodage: str = "identity") -> dict:
+    """
+    Mesure les routes dans le processus courant, sans réseau : les requêtes sont passées directement à l'application ASGI.
+    """
+    application = charger_application(tp, variables)
+
+    async def executer():
+        transport = httpx.ASGITransport(app=application)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600,
+                                     headers={"Accept-Encoding": encodage}) as client:
+            return await jouer_tout(client, tp, nombre, requetes, concurrence, os.getpid(), filtre)
+
+    return asyncio.run(executer())
+
+
+def mesurer_uvicorn(tp: str, variables: dict, nombre: int, requetes: int, concurrence: int, filtre: str | None,
+                    encodage: str = "identity") -> dict:
+    """
+    Mesure les routes à travers le réseau local, contre un vrai serveur uvicorn lancé dans un autre processus.
+    """
+    port = port_libre()
+    serveur = subprocess.Popen([sys.executable, "-m", "uvicorn", APPLICATIONS[tp], "--port", str(port),
+                                "--log-level", "warning", "--no-access-log"],
+                               cwd=os.path.join(RACINE, tp), env={**os.environ, **variables})
+    try:
+        url = f"http://127.0.0.1:{port}"
+        # Attend que le serveur ait chargé le catalogue
+        for _ in range(600):
+            try:
+                httpx.get(url + "/docs" if tp == "TP1" else url + "/ajouter-livre", timeout=1)
+                break
+            except httpx.TransportError:
+                if serveur.poll() is not None:
+                    raise RuntimeError(f"Le serveur uvicorn de {tp} s'est arrêté (code {serveur.returncode})")
+                time.sleep(0.2)
+
+        async def executer():
+            limites = httpx.Limits(max_connections=concurrence)
+            async with httpx.AsyncClient(base_url=url, timeout=600, limits=limites,
+                                         headers={"Accept-Encoding": encodage}) as client:
+                return await jouer_tout(client, tp, nombre, requetes, concurrence, serveur.pid, filtre)
+
+        return asyncio.run(executer())
+    finally:
+        serveur.terminate()
+        serveur.wait()
+
+
+def mesurer(tp: str, mode: str, nombre: int, requetes: int, concurrence: int, stockage: str, filtre: str | None,
+            encodage: str = "identity") -> dict:
+    """
+    Mesure toutes les routes d'un TP dans un mode (asgi ou uvicorn), sur un catalogue synthétique neuf.
+    Le client envoie l'en-tête Accept-Encoding `encodage` : "identity" (par défaut) pour des réponses non compressées.
+    """
+    with tempfile.TemporaryDirectory() as dossier:
+        variables = environnement(dossier, nombre, stockage)
+        if mode == "asgi":
+            return mesurer_asgi(tp, variables, nombre, requetes, concurrence, filtre, encodage)
+        return mesurer_uvicorn(tp, variables, nombre, requetes, concurrence, filtre, encodage)
+
+
+def comparer(resultats: dict, reference: dict, seuil: float) -> list[str]:
+    """
+    Returns:
+        list[str]: Les régressions par rapport à la référence : p95 plus lent ou débit plus faible de plus de `seuil`.
+    """
+    regressions = []
+    for cle, mesure in resultats.items():
+        ancienne = reference.get(cle)
+        if ancienne is None:
+            continue
+        if mesure["p95"] > ancienne["p95"] * (1 + seuil):
+            regressions.append(f"{cle} : p95 {ancienne['p95']:.2f} -> {mesure['p95']:.2f} ms")
+        if mesure["req_s"] < ancienne["req_s"] * (1 - seuil):
+            regressions.append(f"{cle} : {ancienne['req_s']:.1f} -> {mesure['req_s']:.1f} requêtes/s")
+    return regressions
+
+
+def afficher(resultats: dict) -> None:
+    sys.stdout.write(f"{'scénario':<52} {'req/s':>9} {'livres/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                     f"{'Ko/rép':>8} {'RSS Mo':>7} {'err':>4}\n")
+    for cle, m in resultats.items():
+        livres = f"{m['livres_s']:10.0f}" if m["livres_s"] else f"{'':>10}"
+        rss = f"{m['rss'] / 2 ** 20:7.0f}" if m["rss"] else f"{'?':>7}"
+        taille = f"{m['octets'] / 1024:8.1f}" if "octets" in m else f"{'?':>8}"
+        sys.stdout.write(f"{cle:<52} {m['req_s']:9.1f} {livres} {m['p50']:8.2f} {m['p95']:8.2f} {m['p99']:8.2f} "
+                         f"{taille} {rss} {m['erreurs']:4d}\n")
+    # Gain des lectures et des écritures en masse sur les requêtes livre par livre (TP1)
+    for mode in MODES:
+        lot = resultats.get(f"TP1 {mode} GET /livres?ids=...")
+        unitaire = resultats.get(f"TP1 {mode} GET /livre/{{id}}")
+        if lot and unitaire:
+            sys.stdout.write(f"TP1 {mode} : GET /livres?ids=... lit {lot['livres_s'] / unitaire['req_s']:.1f} fois "
+                             f"plus de livres par seconde que GET /livre/{{id}}\n")
+        lot = resultats.get(f"TP1 {mode} POST /livres/bulk")
+        unitaire = resultats.get(f"TP1 {mode} POST /livre/{{id}}")
+        if lot and unitaire:
+            sys.stdout.write(f"TP1 {mode} : POST /livres/bulk écrit {lot['livres_s'] / unitaire['livres_s']:.1f} fois "
+                             f"plus de livres par seconde que POST /livre/{{id}}\n")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Mesure le débit, la latence et la mémoire de toutes les routes de TP1 et TP2")
+    parser.add_argument("--app", choices=sorted(APPLICATIONS), help="un seul TP (par défaut, les deux)")
+    parser.add_argument("--mode", choices=MODES, help="asgi (dans le processus) ou uvicorn (par défaut, les deux)")
+    parser.add_argument("--livres", type=int, default=10_000, help="taille du catalogue synthétique (1000 à 10 millions)")
+    parser.add_argument("--requetes", type=int, default=200, help="nombre de requêtes par scénario")
+    parser.add_argument("--concurrence", type=int, default=8, help="nombre de requêtes simultanées")
+    parser.add_argument("--stockage", default="memoire", help="CATALOGUE_STOCKAGE (compact ou sqlite pour les gros catalogues)")
+    parser.add_argument("--scenario", help="seulement les scénarios dont le nom contient ce texte")
+    parser.add_argument("--encodage", default="identity",
+                        help="en-tête Accept-Encoding du client (gzip, br, ... ; par défaut, réponses non compressées)")
+    parser.add_argument("--reference", default=REFERENCE, help="fichier des mesures de référence")
+    parser.add_argument("--seuil", type=float, default=SEUIL, help="dégradation tolérée (0.25 : 25 %%)")
+    parser.add_argument("--enregistrer", action="store_true", help="enregistre ces mesures comme nouvelle référence")
+    parser.add_argument("--json", action="store_true", help=argparse.SUPPRESS)  # Sortie d'un processus enfant
+    arguments = parser.parse_args()
+    parametres = {"livres": arguments.livres, "requetes": arguments.requetes, "concurrence": arguments.concurrence,
+                  "stockage": arguments.stockage, "encodage": arguments.encodage}
+
+    if arguments.json:
+        # Processus enfant : un seul TP et un seul mode, résultats en JSON sur la sortie standard
+        resultats = mesurer(arguments.app, arguments.mode, arguments.livres, arguments.requetes,
+                            arguments.concurrence, arguments.stockage, arguments.scenario, arguments.encodage)
+        sys.stdout.write(json.dumps(resultats))
+        return 0
+
+    resultats = {}
+    for tp in [arguments.app] if arguments.app else sorted(APPLICATIONS):
+        for mode in [arguments.mode] if arguments.mode else MODES:
+            # Chaque TP et chaque mode dans un processus neuf : mémoire mesurée séparément, modules de même nom
+            commande = [sys.executable, "-m", "benchmarks.charge", "--json", "--app", tp, "--mode", mode,
+                        "--livres", str(arguments.livres), "--requetes", str(arguments.requetes),
+                        "--concurrence", str(arguments.concurrence), "--stockage", arguments.stockage,
+                        "--encodage", arguments.encodage]
+            if arguments.scenario:
+                commande += ["--scenario", arguments.scenario]
+            sortie = subprocess.run(commande, cwd=RACINE, check=True, stdout=subprocess.PIPE).stdout
+            resultats.update({f"{tp} {mode} {nom}": mesure for nom, mesure in json.loads(sortie).items()})
+    afficher(resultats)
+
+    if arguments.enregistrer:
+        with open(arguments.reference, "w", encoding="utf-8") as f:
+            json.dump({"parametres": parametres, "mesures": resultats}, f, ensure_ascii=False, indent=1)
+        return 0
+    if not os.path.exists(arguments.reference):
+        return 0
+    with open(arguments.reference, encoding="utf-8") as f:
+        reference = json.load(f)
+    if reference["parametres"] != parametres:
+        sys.stdout.write(f"Référence mesurée avec d'autres paramètres ({reference['parametres']}) : pas de comparaison\n")
+        return 0
+    regressions = comparer(resultats, reference["mesures"], arguments.seuil)
+    for regression in regressions:
+        sys.stdout.write(f"RÉGRESSION {regression}\n")
+    return 1 if regressions else 0
+
+
+#Mesure toutes les routes : python -m benchmarks [--app TP1] [--mode asgi] [--livres 10000] [--enregistrer]
+if __name__ == "__main__":
+    sys.exit(main())
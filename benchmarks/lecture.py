@@ -0,0 +1,52 @@
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+
+from .applications import RACINE, charger_application, environnement
+
+# Routes de liste mesurées dans chaque application
+ROUTES = {
+    "TP1": ["/Livres", "/Livres?limit=100&sort=nom"],
+    "TP2": ["/?limit=500", "/?limit=500&sort=auteur"],
+}
+
+
+def mesurer(client, url: str, requetes: int) -> float:
+    """
+    Returns:
+        float: Le nombre de requêtes par seconde sur `url`, après une requête d'échauffement (index, cache, ...).
+    """
+    assert client.get(url).status_code == 200
+    debut = time.perf_counter()
+    for _ in range(requetes):
+        client.get(url)
+    return requetes / (time.perf_counter() - debut)
+
+
+def executer(tp: str, nombre: int, requetes: int) -> None:
+    from fastapi.testclient import TestClient
+
+    # Cache des pages désactivé : chaque requête est réellement servie
+    variables = environnement(tempfile.mkdtemp(), nombre, cache_pages=False)
+    client = TestClient(charger_application(tp, variables))
+    for url in ROUTES[tp]:
+        debit = mesurer(client, url, requetes)
+        sys.stdout.write(f"{tp} {url:<28} {debit:8.1f} requêtes/s ({1000 / debit:.2f} ms par requête)\n")
+
+
+#Débit des routes de liste, mesuré dans le processus : python -m benchmarks.lecture [--livres 10000] [--requetes 50]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Débit des routes de liste de TP1 et TP2")
+    parser.add_argument("--app", choices=sorted(ROUTES))
+    parser.add_argument("--livres", type=int, default=10_000)
+    parser.add_argument("--requetes", type=int, default=50)
+    arguments = parser.parse_args()
+    if arguments.app:
+        executer(arguments.app, arguments.livres, arguments.requetes)
+    else:
+        # Chaque application dans son propre processus : elles ont des modules de même nom (catalogue, ...)
+        for tp in sorted(ROUTES):
+            subprocess.run([sys.executable, "-m", "benchmarks.lecture", "--app", tp, "--livres", str(arguments.livres),
+                            "--requetes", str(arguments.requetes)], cwd=RACINE, check=True)
@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+from typing import Callable
+
+# Nombre de livres écrits par une requête POST /livres/bulk
+TAILLE_LOT_BULK = 1000
+# Nombre de livres lus par une requête GET /livres?ids=... ou POST /livres/batch-get
+TAILLE_LOT_LECTURE = 100
+
+
+@dataclass
+class Scenario:
+    """
+    Une route à mesurer : la requête numéro `i` est construite par `chemin(i)` et `corps(i)`.
+    """
+
+    nom: str
+    methode: str
+    chemin: Callable[[int], str]
+    # Corps JSON (ou formulaire si `formulaire`) de la requête numéro i
+    corps: Callable[[int], object] | None = None
+    formulaire: bool = False
+    # Nombre de livres lus ou écrits par requête : le débit est aussi donné en livres par seconde
+    livres: int = 0
+    # Nombre maximal de requêtes (routes qui lisent tout le catalogue, lots)
+    requetes_max: int | None = None
+
+
+def _livre(id: int, nom: str = "Livre de test") -> dict:
+    return {"id": id, "nom": nom, "auteur": "Auteur du test", "editeur": "Éditions du test"}
+
+
+def scenarios(tp: str, nombre: int) -> list[Scenario]:
+    """
+    Les scénarios d'un TP, pour un catalogue de `nombre` livres : toutes les routes, lectures d'abord.
+    Les écritures utilisent des ID au-delà du catalogue, et la suppression retire les livres ajoutés par l'ajout.
+
+    Returns:
+        list[Scenario]: Les scénarios, dans l'ordre où ils doivent être joués.
+    """
+    # Un ID existant, différent d'une requête à l'autre
+    def existant(i: int) -> int:
+        return 1 + (i * 7919) % nombre
+
+    # ID des livres ajoutés un par un, puis par lots
+    def nouveau(i: int) -> int:
+        return nombre + 1_000_000 + i
+
+    def lot(i: int) -> list:
+        debut = nombre + 10_000_000 + i * TAILLE_LOT_BULK
+        return [{"op": "ajouter", **_livre(id)} for id in range(debut, debut + TAILLE_LOT_BULK)]
+
+    def ids_lus(i: int) -> list:
+        return [existant(i * TAILLE_LOT_LECTURE + j) for j in range(TAILLE_LOT_LECTURE)]
+
+    if tp == "TP1":
+        return [
+            Scenario("GET /Livres (complet)", "GET", lambda i: "/Livres", requetes_max=20),
+            Scenario("GET /Livres?limit=50", "GET", lambda i: "/Livres?limit=50"),
+            Scenario("GET /Livres?limit=50&sort=nom", "GET", lambda i: "/Livres?limit=50&sort=nom"),
+            Scenario("GET /Livres?auteur=...", "GET", lambda i: f"/Livres?limit=50&auteur=Auteur {i % max(1, nombre // 20)}"),
+            Scenario("GET /Livres/export", "GET", lambda i: "/Livres/export?format=ndjson", requetes_max=10),
+            Scenario("GET /total_livres", "GET", lambda i: "/total_livres"),
+            Scenario("GET /recherche", "GET", lambda i: f"/recherche?q=livre {existant(i)}"),
+            Scenario("GET /livre/{id}", "GET", lambda i: f"/livre/{existant(i)}"),
+            Scenario("GET /livres?ids=...", "GET", lambda i: "/livres?ids=" + ",".join(map(str, ids_lus(i))),
+                     livres=TAILLE_LOT_LECTURE),
+            Scenario("POST /livres/batch-get", "POST", lambda i: "/livres/batch-get", corps=lambda i: {"ids": ids_lus(i)},
+                     livres=TAILLE_LOT_LECTURE),
+            Scenario("GET /livres/changes", "GET", lambda i: "/livres/changes?attente=0"),
+            Scenario("POST /livre/{id}", "POST", lambda i: f"/livre/{nouveau(i)}?nom=Livre&auteur=Auteur&editeur=Editeur",
+                     corps=lambda i: _livre(nouveau(i)), livres=1),
+            Scenario("PUT /livre/{id}", "PUT", lambda i: f"/livre/{existant(i)}?nom=Livre&auteur=Auteur&editeur=Editeur",
+                     corps=lambda i: _livre(existant(i)), livres=1),
+            Scenario("DELETE /livre/{id}", "DELETE", lambda i: f"/livre/{nouveau(i)}", livres=1),
+            Scenario("POST /livres/bulk", "POST", lambda i: "/livres/bulk", corps=lot, livres=TAILLE_LOT_BULK,
+                     requetes_max=20),
+        ]
+    return [
+        Scenario("GET /", "GET", lambda i: "/"),
+        Scenario("GET /?limit=500&sort=auteur", "GET", lambda i: "/?limit=500&sort=auteur"),
+        Scenario("GET /?auteur=...", "GET", lambda i: f"/?auteur=Auteur {i % max(1, nombre // 20)}"),
+        Scenario("GET /recherche", "GET", lambda i: f"/recherche?q=livre {existant(i)}"),
+        Scenario("GET /recherche?format=json", "GET", lambda i: f"/recherche?q=livre {existant(i)}&format=json"),
+        Scenario("GET /ajouter-livre", "GET", lambda i: "/ajouter-livre"),
+        Scenario("GET /modifier-livre/{id}", "GET", lambda i: f"/modifier-livre/{existant(i)}"),
+        Scenario("GET /modifier-livre?id=", "GET", lambda i: f"/modifier-livre?id={existant(i)}"),
+        Scenario("POST /ajouter-livre", "POST", lambda i: "/ajouter-livre", corps=lambda i: _livre(nouveau(i)),
+                 formulaire=True, livres=1),
+        Scenario("POST /modifier-livre/{id}", "POST", lambda i: f"/modifier-livre/{existant(i)}",
+                 corps=lambda i: _livre(existant(i), "Livre modifié"), formulaire=True, livres=1),
+        Scenario("GET /supprimer-livre/{id}", "GET", lambda i: f"/supprimer-livre/{nouveau(i)}", livres=1),
+    ]